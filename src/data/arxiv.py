@@ -0,0 +1,602 @@
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http import HTTPStatus
+import io
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from xml.etree import ElementTree
+
+import polars as pl
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import INTERIM_DATA_DIR
+
+ARXIV_API = "http://export.arxiv.org/api/query"
+# Delay between two requests recommended by the terms of use of the arXiv API
+ARXIV_DELAY = 3
+# Results per page, arXiv answers at most 2000 per request but large pages time out more often
+ARXIV_PAGE_SIZE = 500
+ARXIV_TIMEOUT = 60
+ARXIV_MAX_RETRIES = 3
+
+HTTP_CACHE_FILE = INTERIM_DATA_DIR / "arxiv-responses.sqlite"
+ATOM = "{http://www.w3.org/2005/Atom}"
+OPENSEARCH = "{http://a9.com/-/spec/opensearch/1.1/}"
+# Columns of the papers harvested from arXiv, "Published" being the submission time of the first version
+ARXIV_SCHEMA = {
+    "id": pl.String,
+    "Title": pl.String,
+    "Abstract": pl.String,
+    "Author full names": pl.String,
+    "Published": pl.String,
+    "Link": pl.String,
+}
+
+# Age after which a cached response is revalidated, new papers are indexed daily
+HTTP_CACHE_TTL = 24 * 3600
+
+
+class IntervalLimiter:
+    """
+    Thread-safe rate limiter spacing the requests of all the threads by at least `interval` seconds.
+
+    Parameters
+    ----------
+    interval : float
+        The minimum delay in seconds between two requests.
+    clock : Callable[[], float], optional
+        The monotonic clock, by default `time.monotonic`.
+    sleep : Callable[[float], None], optional
+        The function waiting for a number of seconds, by default `time.sleep`.
+    """
+
+    def __init__(
+        self, interval: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep
+    ):
+        if interval < 0:
+            raise ValueError("The interval of a rate limiter cannot be negative")
+
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = float("-inf")
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Wait until the next free slot, reserving it so that concurrent callers wait for the following ones."""
+        with self._lock:
+            now = self.clock()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+
+def date_shards(start: date, end: date, days: int) -> list[tuple[date, date]]:
+    """
+    Split a range of dates into consecutive windows.
+
+    Parameters
+    ----------
+    start : date
+        The first day of the range.
+    end : date
+        The last day of the range, included.
+    days : int
+        The number of days of each window, the last one being shorter if needed.
+
+    Returns
+    -------
+    list[tuple[date, date]]
+        The first and last days of each window.
+
+    Raises
+    ------
+    ValueError
+        If `days` is not positive or `end` is before `start`.
+    """
+    if days < 1:
+        raise ValueError("The windows must last at least one day")
+    if end < start:
+        raise ValueError("The end of the range cannot be before its start")
+
+    shards = []
+    while start <= end:
+        shard_end = min(start + timedelta(days=days - 1), end)
+        shards.append((start, shard_end))
+        start = shard_end + timedelta(days=1)
+    return shards
+
+
+def shard_query(query: str, start: date, end: date) -> str:
+    """Returns the query restricted to the papers submitted between two days, both included."""
+    return f"({query}) AND submittedDate:[{start:%Y%m%d}0000 TO {end:%Y%m%d}2359]"
+
+
+def parse_feed(body: str | bytes) -> tuple[int, pl.DataFrame]:
+    """
+    Parse a page of results of the arXiv API into columns, streaming through its entries.
+
+    Each entry is appended to the columns as soon as its end tag is parsed, then removed from the tree, so the
+    memory does not grow with the XML tree and no intermediate dict is built per entry.
+
+    Parameters
+    ----------
+    body : str | bytes
+        The Atom feed of the page.
+
+    Returns
+    -------
+    tuple[int, pl.DataFrame]
+        The total number of results of the query, and the papers of the page with the columns of ARXIV_SCHEMA.
+
+    Raises
+    ------
+    ValueError
+        If the feed does not have the total number of results.
+    """
+    columns = {name: [] for name in ARXIV_SCHEMA}
+    total = None
+    source = io.BytesIO(body.encode() if isinstance(body, str) else body)
+    root = None
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        if root is None:
+            root = element
+        if event == "start":
+            continue
+        if element.tag == f"{OPENSEARCH}totalResults":
+            total = int(element.text)
+        elif element.tag == f"{ATOM}entry":
+            columns["id"].append(element_text(element, "id"))
+            columns["Title"].append(element_text(element, "title"))
+            columns["Abstract"].append(element_text(element, "summary"))
+            columns["Author full names"].append(
+                "; ".join(element_text(author, "name") or "" for author in element.iterfind(f"{ATOM}author"))
+            )
+            columns["Published"].append(element_text(element, "published"))
+            link = element.find(f"{ATOM}link")
+            columns["Link"].append(link.get("href") if link is not None else None)
+            root.remove(element)
+
+    if total is None:
+        raise ValueError("The arXiv feed does not have the total number of results")
+    return total, pl.DataFrame(columns, schema=ARXIV_SCHEMA)
+
+
+def element_text(element: ElementTree.Element, tag: str) -> str | None:
+    """Returns the text of the first Atom child of an element with a tag, without surrounding whitespace."""
+    child = element.find(f"{ATOM}{tag}")
+    return child.text.strip() if child is not None and child.text is not None else None
+
+
+def is_complete_page(body: str, start: int) -> bool:
+    """Returns whether a page of results is worth caching, i.e. it has entries or is past the end of the results."""
+    total, papers = parse_feed(body)
+    return not papers.is_empty() or start >= total
+
+
+class HTTPCache:
+    """
+    Persistent cache of raw HTTP responses stored in SQLite, to harvest a query again without downloading it again.
+
+    Responses are keyed by the normalized URL and query parameters of the request, see `key`, and stored with their
+    `ETag` and `Last-Modified` headers. An entry younger than `ttl` is used without any request. An older entry is
+    revalidated with a conditional request, and reused if the server answers 304 Not Modified. The cache can be shared
+    by several threads.
+
+    Parameters
+    ----------
+    path : str | os.PathLike[str], optional
+        The path to the SQLite database, by default HTTP_CACHE_FILE in the interim data directory.
+    ttl : float, optional
+        The number of seconds during which an entry is used without revalidation, by default entries never expire.
+    """
+
+    def __init__(self, path: str | os.PathLike[str] = HTTP_CACHE_FILE, ttl: float | None = None):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+
+    @staticmethod
+    def key(url: str, params: dict | None = None) -> str:
+        """
+        Returns the normalized URL of a request, used as its cache key.
+
+        The scheme and host are lower-cased and the query parameters of the URL and of `params` are sorted, so
+        equivalent requests share an entry.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the request.
+        params : dict, optional
+            The query parameters of the request, by default None.
+
+        Returns
+        -------
+        str
+            The normalized URL.
+        """
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True) + [(str(k), str(v)) for k, v in (params or {}).items()]
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(sorted(query)), ""))
+
+    def get(self, key: str) -> tuple[str, dict, bool] | None:
+        """
+        Returns the cached response of a request, or None if there is no entry.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request, see `key`.
+
+        Returns
+        -------
+        tuple[str, dict, bool] | None
+            The body of the response, the headers of a conditional request revalidating it, and whether it is fresh.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        body, etag, last_modified, created_at = row
+        headers = {}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        fresh = self.ttl is None or time.time() - created_at < self.ttl
+        return body, headers, fresh
+
+    def put(self, key: str, response: requests.Response):
+        """
+        Store a response, or renew the entry of a request when the response is 304 Not Modified.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the request, see `key`.
+        response : requests.Response
+            The successful response.
+        """
+        with self._lock, self._connection:
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                self._connection.execute("UPDATE responses SET created_at = ? WHERE key = ?", (time.time(), key))
+                return
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, url, body, etag, last_modified, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.url,
+                    response.text,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    time.time(),
+                ),
+            )
+
+    def record_hit(self, key: str, revalidated: bool = False):
+        """Count a response served from the cache, with or without a conditional request."""
+        with self._lock, self._connection:
+            if revalidated:
+                self.revalidated += 1
+            else:
+                self.hits += 1
+            self._connection.execute("UPDATE responses SET hits = hits + 1 WHERE key = ?", (key,))
+
+    def record_miss(self):
+        """Count a request whose response was downloaded."""
+        with self._lock:
+            self.misses += 1
+
+    def evict(self, max_age: float | None = None) -> int:
+        """
+        Delete the entries older than `max_age` seconds.
+
+        Parameters
+        ----------
+        max_age : float, optional
+            The maximum age of the entries kept, by default the TTL of the cache.
+
+        Returns
+        -------
+        int
+            The number of deleted entries.
+
+        Raises
+        ------
+        ValueError
+            If neither `max_age` nor the TTL of the cache is set.
+        """
+        max_age = max_age if max_age is not None else self.ttl
+        if max_age is None:
+            raise ValueError("Either max_age or the TTL of the cache must be set")
+
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - max_age,)
+            ).rowcount
+
+    def stats(self) -> dict:
+        """
+        Returns the hits, revalidations and misses of this session and the number of stored entries.
+
+        Returns
+        -------
+        dict
+            The "hits", "revalidated", "misses" and "entries" of the cache.
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        """Close the connection to the database."""
+        self._connection.close()
+
+
+class ArxivHarvester:
+    """
+    Harvester of the arXiv API, paging through the results of queries and running independent queries concurrently.
+
+    All the requests share one pooled HTTP session and one `IntervalLimiter`, so the harvester never exceeds the rate
+    recommended by arXiv however many queries run concurrently. The pages of a query are fetched sequentially, as each
+    one needs the previous to be complete, while independent queries, e.g. the date windows of a search built with
+    `date_shards` and `shard_query`, overlap their latencies. Failed requests, HTTP errors and the empty pages the API
+    sometimes returns before the end of the results are retried. With an `HTTPCache`, fresh pages are read from disk
+    without waiting for the rate limiter, so harvesting a query again, even offline, is immediate.
+
+    Parameters
+    ----------
+    url : str, optional
+        The URL of the API, by default ARXIV_API. Set it to a local server to test the harvester offline.
+    delay : float, optional
+        The minimum delay in seconds between two requests, by default ARXIV_DELAY.
+    page_size : int, optional
+        The number of results per request, by default ARXIV_PAGE_SIZE.
+    max_workers : int, optional
+        The maximum number of queries harvested concurrently, by default 4.
+    timeout : float, optional
+        The timeout in seconds of a request, by default ARXIV_TIMEOUT.
+    max_retries : int, optional
+        The maximum number of retries of a failed request, by default ARXIV_MAX_RETRIES.
+    session : requests.Session, optional
+        The HTTP session, by default a new session with a connection pool of `max_workers` connections.
+    limiter : IntervalLimiter, optional
+        The rate limiter, by default one with an interval of `delay`.
+    cache : HTTPCache, optional
+        The cache of the responses, by default None.
+    offline : bool, optional
+        Whether to serve every page from `cache`, even stale ones, without any request, by default False.
+    """
+
+    def __init__(
+        self,
+        url: str = ARXIV_API,
+        delay: float = ARXIV_DELAY,
+        page_size: int = ARXIV_PAGE_SIZE,
+        max_workers: int = 4,
+        timeout: float = ARXIV_TIMEOUT,
+        max_retries: int = ARXIV_MAX_RETRIES,
+        session: requests.Session | None = None,
+        limiter: IntervalLimiter | None = None,
+        cache: HTTPCache | None = None,
+        offline: bool = False,
+    ):
+        if page_size < 1 or max_workers < 1:
+            raise ValueError("The page size and the number of workers must be positive")
+        if offline and cache is None:
+            raise ValueError("A cache must be provided to harvest offline")
+
+        self.url = url
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+        self.offline = offline
+        self.limiter = limiter or IntervalLimiter(delay)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def get(self, params: dict) -> str:
+        """
+        Returns the body of the response of the API to a request, from the cache if possible.
+
+        Parameters
+        ----------
+        params : dict
+            The query parameters of the request.
+
+        Returns
+        -------
+        str
+            The body of the response.
+
+        Raises
+        ------
+        ValueError
+            If the harvester is offline and the response is not cached.
+        requests.RequestException
+            If the request still fails after `max_retries` retries, or fails with a client error other than HTTP 429.
+        """
+        key = cached = None
+        headers = {}
+        if self.cache is not None:
+            key = self.cache.key(self.url, params)
+            cached = self.cache.get(key)
+            if cached is not None and (cached[2] or self.offline):
+                self.cache.record_hit(key)
+                return cached[0]
+            if self.offline:
+                raise ValueError(f"The response to {key} is not cached, harvest it online first")
+            if cached is not None:
+                headers = cached[1]
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait()
+            try:
+                response = self.session.get(self.url, params=params, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
+                break
+            except requests.RequestException as e:
+                # Client errors other than rate limiting, e.g. a malformed query, fail the same way when retried
+                status = e.response.status_code if e.response is not None else None
+                client_error = (
+                    status is not None
+                    and HTTPStatus.BAD_REQUEST <= status < HTTPStatus.INTERNAL_SERVER_ERROR
+                    and status != HTTPStatus.TOO_MANY_REQUESTS
+                )
+                if attempt == self.max_retries or client_error:
+                    raise
+
+        if self.cache is None:
+            return response.text
+        if response.status_code == HTTPStatus.NOT_MODIFIED and cached is not None:
+            self.cache.put(key, response)
+            self.cache.record_hit(key, revalidated=True)
+            return cached[0]
+        self.cache.record_miss()
+        if is_complete_page(response.text, params["start"]):
+            self.cache.put(key, response)
+        return response.text
+
+    def fetch_page(self, query: str, start: int, max_results: int) -> tuple[int, pl.DataFrame]:
+        """
+        Fetch a page of the results of a query.
+
+        Parameters
+        ----------
+        query : str
+            The arXiv search query.
+        start : int
+            The index of the first result of the page.
+        max_results : int
+            The number of results of the page.
+
+        Returns
+        -------
+        tuple[int, pl.DataFrame]
+            The total number of results of the query and the papers of the page, see `parse_feed`.
+
+        Raises
+        ------
+        ValueError
+            If the harvester is offline and the page is not cached.
+        requests.RequestException
+            If the request still fails after `max_retries` retries, or fails with a client error other than HTTP 429.
+        """
+        params = {
+            "search_query": query,
+            "start": start,
+            "max_results": max_results,
+            # A stable order keeps the pages from overlapping if papers are added during the harvest
+            "sortBy": "submittedDate",
+            "sortOrder": "ascending",
+        }
+        return parse_feed(self.get(params))
+
+    def harvest(self, query: str, max_results: int | None = None) -> pl.DataFrame:
+        """
+        Fetch all the results of a query, page by page.
+
+        Parameters
+        ----------
+        query : str
+            The arXiv search query.
+        max_results : int, optional
+            The maximum number of results, by default all of them.
+
+        Returns
+        -------
+        pl.DataFrame
+            The papers, with the columns of ARXIV_SCHEMA.
+
+        Raises
+        ------
+        ValueError
+            If a page before the end of the results stays empty after `max_retries` retries.
+        """
+        pages = []
+        harvested = 0
+        total = None
+        empty_pages = 0
+        while total is None or harvested < total:
+            page_size = self.page_size if max_results is None else min(self.page_size, max_results - harvested)
+            total, page = self.fetch_page(query, harvested, page_size)
+            if max_results is not None:
+                total = min(total, max_results)
+
+            if page.is_empty() and harvested < total:
+                # The API sometimes answers with an empty page before the end of the results
+                empty_pages += 1
+                if empty_pages > self.max_retries:
+                    raise ValueError(f"arXiv returned empty pages at result {harvested} of {total} for {query}")
+                continue
+            empty_pages = 0
+            pages.append(page)
+            harvested += page.height
+        return pl.concat(pages) if pages else pl.DataFrame(schema=ARXIV_SCHEMA)
+
+    def harvest_all(self, queries: Sequence[str], max_results: int | None = None) -> pl.DataFrame:
+        """
+        Fetch the results of independent queries concurrently, see `harvest`.
+
+        Parameters
+        ----------
+        queries : Sequence[str]
+            The arXiv search queries, e.g. the date windows of a search.
+        max_results : int, optional
+            The maximum number of results of each query, by default all of them.
+
+        Returns
+        -------
+        pl.DataFrame
+            The papers, in the order of the queries, without the papers found by several queries.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda query: self.harvest(query, max_results), queries))
+        return pl.concat([pl.DataFrame(schema=ARXIV_SCHEMA), *results]).unique("id", keep="first", maintain_order=True)
+
+    def close(self):
+        """Close the connections of the HTTP session and the cache."""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self) -> "ArxivHarvester":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,335 @@
+from collections.abc import Sequence
+from itertools import combinations
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+import polars as pl
+
+# MinHash signature length and number of LSH bands. With 4 rows per band, pairs with a Jaccard similarity of 0.5 are
+# candidates with a probability of 0.87, and pairs above 0.7 almost surely.
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+# Number of words of the shingles of the abstracts
+SHINGLE_SIZE = 3
+
+# Similarity of the title words, or of the abstract shingles, above which two records are duplicates
+TITLE_THRESHOLD = 0.8
+ABSTRACT_THRESHOLD = 0.8
+# Similarity of the abstracts below which records with similar titles are different papers
+MIN_ABSTRACT_SIMILARITY = 0.3
+# Share of the authors of the shorter author list found in the other below which records are different papers
+MIN_AUTHOR_OVERLAP = 0.5
+
+# Diacritics separated from their letters by the NFKD normalization
+COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+
+# Placeholder of Scopus for the records without an abstract
+MISSING_ABSTRACT = "no abstract available"
+
+
+def normalize_text(text: str | None) -> str:
+    """Returns the text without accents, in lower case, with punctuation removed and whitespace collapsed."""
+    if not text:
+        return ""
+    if not text.isascii():
+        text = COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+    return " ".join(re.sub(r"[^\w\s]", " ", text.casefold()).split())
+
+
+def title_tokens(title: str | None) -> frozenset[str]:
+    """Returns the distinct words of a normalized title."""
+    return frozenset(normalize_text(title).split())
+
+
+def abstract_shingles(abstract: str | None, size: int = SHINGLE_SIZE) -> frozenset[str]:
+    """Returns the distinct `size`-word shingles of a normalized abstract, empty if the abstract is missing."""
+    words = normalize_text(abstract).split()
+    if " ".join(words) == MISSING_ABSTRACT:
+        return frozenset()
+    if len(words) <= size:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(map(" ".join, zip(*(words[i:] for i in range(size)), strict=False)))
+
+
+def author_surnames(authors: str | None) -> frozenset[str]:
+    """
+    Returns the normalized surnames of a list of authors separated by semicolons.
+
+    Both the Scopus format, "Surname, Given names", and the arXiv format, "Given names Surname", are supported. Only
+    the last word of a surname is kept, so that particles like "van der" do not prevent matches.
+    """
+    surnames = set()
+    for author in (authors or "").split(";"):
+        name = author.split(",")[0] if "," in author else author
+        words = normalize_text(name).split()
+        if words:
+            surnames.add(words[-1])
+    return frozenset(surnames)
+
+
+def normalize_doi(doi: str | None) -> str | None:
+    """Returns the DOI in lower case without its resolver prefix, None if missing."""
+    if not doi or not doi.strip():
+        return None
+    return re.sub(r"^(https?://(dx\.)?doi\.org/|doi:)", "", doi.strip().casefold())
+
+
+def jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    """Returns the Jaccard similarity of two sets, 0 if both are empty."""
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def overlap(a: frozenset[str], b: frozenset[str]) -> float:
+    """Returns the share of the elements of the smallest set found in the other, 0 if one is empty."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def minhash_signatures(
+    token_sets: Sequence[frozenset[str]],
+    num_permutations: int = NUM_PERMUTATIONS,
+    seed: int = 0,
+    chunk_size: int = 256,
+) -> np.ndarray:
+    """
+    Returns the MinHash signatures of sets of tokens.
+
+    The tokens are hashed with CRC-32, so the signatures are the same in every run, and permuted with the
+    multiply-shift hash functions `(a * x + b) >> 32` on 64 bits, which avoid a costly modulo. The sets are processed
+    in chunks, vectorized over their tokens and the permutations.
+
+    Parameters
+    ----------
+    token_sets : Sequence[frozenset[str]]
+        The sets of tokens.
+    num_permutations : int, optional
+        The length of the signatures, by default NUM_PERMUTATIONS.
+    seed : int, optional
+        The seed of the permutations, by default 0.
+    chunk_size : int, optional
+        The number of sets processed at once, by default 256.
+
+    Returns
+    -------
+    np.ndarray
+        The signatures, one row per set. The rows of empty sets hold the maximum value and never match other rows
+        except other empty sets.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2**64, size=num_permutations, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**64, size=num_permutations, dtype=np.uint64)
+
+    signatures = np.full((len(token_sets), num_permutations), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for start in range(0, len(token_sets), chunk_size):
+        chunk = token_sets[start : start + chunk_size]
+        lengths = np.array([len(tokens) for tokens in chunk])
+        if lengths.sum() == 0:
+            continue
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode()) for tokens in chunk for token in tokens), dtype=np.uint64, count=lengths.sum()
+        )
+        # The products wrap around on 64 bits, and the high 32 bits are the permuted hashes. Each permutation is a
+        # row, so that the minimum over the tokens of each set reduces contiguous memory.
+        permuted = a[:, None] * hashes[None, :]
+        permuted += b[:, None]
+        permuted >>= np.uint64(32)
+        non_empty = np.flatnonzero(lengths)
+        offsets = (np.cumsum(lengths) - lengths)[non_empty]
+        signatures[start + non_empty] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+
+def lsh_candidates(signatures: np.ndarray, valid: np.ndarray, bands: int = LSH_BANDS) -> set[tuple[int, int]]:
+    """
+    Returns the pairs of rows whose MinHash signatures are identical in at least one band.
+
+    Parameters
+    ----------
+    signatures : np.ndarray
+        The MinHash signatures, see `minhash_signatures`.
+    valid : np.ndarray
+        The boolean mask of the rows to consider, e.g. those of non-empty sets.
+    bands : int, optional
+        The number of bands, which must divide the length of the signatures, by default LSH_BANDS.
+
+    Returns
+    -------
+    set[tuple[int, int]]
+        The candidate pairs of row indices, the lowest first.
+
+    Raises
+    ------
+    ValueError
+        If the number of bands does not divide the length of the signatures.
+    """
+    if signatures.shape[1] % bands != 0:
+        raise ValueError(f"The number of bands ({bands}) must divide the signature length ({signatures.shape[1]})")
+
+    rows = signatures.shape[1] // bands
+    indices = np.flatnonzero(valid)
+    pairs = set()
+    if indices.size == 0:
+        return pairs
+    for band in range(bands):
+        _, buckets = np.unique(signatures[indices, band * rows : (band + 1) * rows], axis=0, return_inverse=True)
+        buckets = buckets.ravel()
+        order = np.argsort(buckets, kind="stable")
+        sorted_buckets = buckets[order]
+        starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+        sizes = np.diff(np.r_[starts, order.size])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1], strict=True):
+            pairs.update(combinations(indices[order[start : start + size]].tolist(), 2))
+    return pairs
+
+
+def find_duplicates(
+    papers: pl.DataFrame,
+    title_threshold: float = TITLE_THRESHOLD,
+    abstract_threshold: float = ABSTRACT_THRESHOLD,
+    min_abstract_similarity: float = MIN_ABSTRACT_SIMILARITY,
+    min_author_overlap: float = MIN_AUTHOR_OVERLAP,
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Find the records of the same paper, e.g. a Scopus record and the arXiv pre-print of the paper.
+
+    Candidate pairs are the records whose normalized titles, or abstracts, fall in the same bucket of a MinHash LSH
+    index, so the records are not compared pairwise. A candidate pair is a match when:
+
+    - both records have the same DOI, or
+    - they do not have different DOIs, at least `min_author_overlap` of the authors of the shorter author list are in
+      the other (when both are known), and either the Jaccard similarity of their title words is at least
+      `title_threshold` and that of their abstract shingles at least `min_abstract_similarity`, or the latter is at
+      least `abstract_threshold`.
+
+    Clusters are the connected components of the matches.
+
+    Parameters
+    ----------
+    papers : pl.DataFrame
+        The records, with the columns 'Title' and 'Abstract', and optionally 'DOI' and 'Author full names'.
+    title_threshold : float, optional
+        The title similarity of a match, by default TITLE_THRESHOLD.
+    abstract_threshold : float, optional
+        The abstract similarity of a match regardless of the titles, by default ABSTRACT_THRESHOLD.
+    min_abstract_similarity : float, optional
+        The minimum abstract similarity of records with similar titles, by default MIN_ABSTRACT_SIMILARITY.
+    min_author_overlap : float, optional
+        The minimum overlap of the author surnames, by default MIN_AUTHOR_OVERLAP.
+
+    Returns
+    -------
+    tuple[pl.DataFrame, pl.DataFrame]
+        The clusters, with the "Record" index of each row of `papers`, its "Cluster" (the index of the first record of
+        the cluster) and the "Cluster Size". The matches, with the "Record" and "Match" indices, the "Title
+        Similarity", "Abstract Similarity" and "Author Overlap" (null when a record misses the field), whether they
+        have the "Same DOI", and their overall "Similarity", the mean of the title and abstract similarities or 1 for
+        the same DOI.
+    """
+    titles = [title_tokens(title) for title in papers.get_column("Title").to_list()]
+    abstracts = [abstract_shingles(abstract) for abstract in papers.get_column("Abstract").to_list()]
+    authors = [
+        author_surnames(names)
+        for names in (
+            papers.get_column("Author full names").to_list()
+            if "Author full names" in papers.columns
+            else [None] * papers.height
+        )
+    ]
+    dois = [normalize_doi(doi) for doi in (papers.get_column("DOI").to_list() if "DOI" in papers.columns else [])]
+    dois = dois or [None] * papers.height
+
+    candidates = lsh_candidates(minhash_signatures(titles), np.array([bool(tokens) for tokens in titles]))
+    candidates |= lsh_candidates(minhash_signatures(abstracts), np.array([bool(shingles) for shingles in abstracts]))
+    # Records with the same DOI match even if their text differs, e.g. a corrected title
+    doi_records = {}
+    for i, doi in enumerate(dois):
+        if doi is not None:
+            candidates.update((j, i) for j in doi_records.get(doi, []))
+            doi_records.setdefault(doi, []).append(i)
+
+    matches = []
+    for i, j in sorted(candidates):
+        same_doi = dois[i] == dois[j] if dois[i] is not None and dois[j] is not None else None
+        title_similarity = jaccard(titles[i], titles[j])
+        abstract_similarity = jaccard(abstracts[i], abstracts[j]) if abstracts[i] and abstracts[j] else None
+        author_overlap = overlap(authors[i], authors[j]) if authors[i] and authors[j] else None
+
+        if same_doi is None:
+            similar = (
+                title_similarity >= title_threshold
+                and (abstract_similarity is None or abstract_similarity >= min_abstract_similarity)
+            ) or (abstract_similarity is not None and abstract_similarity >= abstract_threshold)
+            is_match = similar and (author_overlap is None or author_overlap >= min_author_overlap)
+        else:
+            is_match = same_doi
+        if not is_match:
+            continue
+
+        similarities = [similarity for similarity in (title_similarity, abstract_similarity) if similarity is not None]
+        matches.append(
+            (
+                i,
+                j,
+                title_similarity,
+                abstract_similarity,
+                author_overlap,
+                same_doi,
+                1.0 if same_doi else sum(similarities) / len(similarities),
+            )
+        )
+
+    # Union-find, the root of a cluster being its first record
+    parents = list(range(papers.height))
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    for i, j, *_ in matches:
+        root_i, root_j = find(i), find(j)
+        parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters = pl.DataFrame(
+        {"Record": range(papers.height), "Cluster": [find(i) for i in range(papers.height)]},
+        schema={"Record": pl.UInt32, "Cluster": pl.UInt32},
+    ).with_columns(pl.len().over("Cluster").cast(pl.UInt32).alias("Cluster Size"))
+    matches = pl.DataFrame(
+        matches,
+        schema={
+            "Record": pl.UInt32,
+            "Match": pl.UInt32,
+            "Title Similarity": pl.Float64,
+            "Abstract Similarity": pl.Float64,
+            "Author Overlap": pl.Float64,
+            "Same DOI": pl.Boolean,
+            "Similarity": pl.Float64,
+        },
+        orient="row",
+    )
+    return clusters, matches
+
+
+def drop_duplicates(papers: pl.DataFrame, clusters: pl.DataFrame) -> pl.DataFrame:
+    """
+    Keep the first record of each cluster, see `find_duplicates`.
+
+    Parameters
+    ----------
+    papers : pl.DataFrame
+        The records.
+    clusters : pl.DataFrame
+        The clusters of the records.
+
+    Returns
+    -------
+    pl.DataFrame
+        The first record of each cluster, in the order of `papers`.
+    """
+    return papers.filter(clusters.get_column("Record") == clusters.get_column("Cluster"))
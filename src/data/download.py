@@ -1,61 +1,60 @@
+import argparse
+from datetime import date
+
 import polars as pl
-import requests
-import xmltodict
 
 from src.config import INTERIM_DATA_DIR
+from src.data.arxiv import HTTP_CACHE_TTL, ArxivHarvester, HTTPCache, date_shards, shard_query
+from src.data.dedup import drop_duplicates, find_duplicates
 from src.data.utils import read_scopus_quantization_papers
 
-ARXIV_API = "http://export.arxiv.org/api/query"
-
-
-def download_arxiv_papers(query: str, max_results: int) -> list[dict[str, str]]:
-    """Download papers from arXiv based on the query."""
-    # Prepare the query parameters
-    params = {
-        "search_query": query,
-        "max_results": max_results,
-    }
-    # Make the request
-    response = requests.get(ARXIV_API, params=params)
-
-    # Parse the response
-    parsed_response = xmltodict.parse(response.text)["feed"]
-    print(f"Found {parsed_response['opensearch:totalResults']['#text']} papers on arXiv.")
-    return parsed_response["entry"]
-
-
-def papers_dict_to_polars_df(papers: list[dict[str, str]]) -> pl.DataFrame:
-    """Convert a list of dictionaries to a Polars DataFrame."""
-
-    tmp_list = []
-    for paper in papers:
-        authors = paper["author"]
-        if not isinstance(authors, list):
-            authors = authors["name"]
-        else:
-            authors = "; ".join([author["name"] for author in authors])
-
-        tmp_dict = {
-            "Title": paper["title"],
-            "Abstract": paper["summary"],
-            "Author full names": authors,
-            "Published": paper["published"],
-            "Link": paper["link"][0]["@href"],
-        }
-        tmp_list.append(tmp_dict)
-    df = (
-        pl.from_dicts(tmp_list)
-        .with_columns(
+
+def download_arxiv_papers(
+    query: str,
+    max_results: int | None = None,
+    shards: list[tuple[date, date]] | None = None,
+    harvester: ArxivHarvester | None = None,
+) -> pl.DataFrame:
+    """
+    Download papers from arXiv based on the query.
+
+    Parameters
+    ----------
+    query : str
+        The arXiv search query.
+    max_results : int, optional
+        The maximum number of papers of each shard, by default all of them.
+    shards : list[tuple[date, date]], optional
+        The submission date windows harvested concurrently, see `date_shards`, by default the whole query at once.
+    harvester : ArxivHarvester, optional
+        The arXiv harvester, by default one querying ARXIV_API.
+
+    Returns
+    -------
+    pl.DataFrame
+        The papers, with the columns of ARXIV_SCHEMA.
+    """
+    queries = [query] if shards is None else [shard_query(query, start, end) for start, end in shards]
+    with harvester or ArxivHarvester() as arxiv:
+        papers = arxiv.harvest_all(queries, max_results)
+        if arxiv.cache is not None:
+            print(f"arXiv response cache: {arxiv.cache.stats()}")
+    print(f"Found {papers.height} papers on arXiv.")
+    return papers
+
+
+def format_arxiv_papers(papers: pl.DataFrame) -> pl.DataFrame:
+    """Convert the papers harvested from arXiv to the columns of the Scopus papers."""
+    return (
+        papers.with_columns(
             (pl.col("Published").str.to_datetime(format="%Y-%m-%dT%H:%M:%SZ").dt.year()).alias("Year"),
             pl.lit("Pre-print").alias("Document Type"),
             pl.lit("arXiv").alias("Source"),
         )
-        .drop("Published")
+        .drop("id", "Published")
         .sort("Year", descending=False)
     )
 
-    return df
-
 
 def clean_titles(papers: pl.DataFrame) -> pl.DataFrame:
     """Clean the titles of the papers."""
@@ -76,26 +75,55 @@ def clean_titles(papers: pl.DataFrame) -> pl.DataFrame:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the model quantization papers from Scopus and arXiv.")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Read the arXiv responses from the HTTP cache only, even stale ones, without any request.",
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="Revalidate every cached arXiv response with the server."
+    )
+    args = parser.parse_args()
+
     search_query = '(ti:("machine learning" OR ML OR "deep learning" OR DL OR "large language model?" OR "LLM?" OR "neural network?" OR "?NN?" OR "f?undational model?" OR agent) AND (quantization OR quantize OR quantized) AND ("energy consumption" OR "energy efficien*" OR "sustain*" OR "carbon footprint" OR "carbon emission") ANDNOT ("FL" OR "federated learning")) OR (abs:("machine learning" OR ML OR "deep learning" OR DL OR "large language model?" OR "LLM?" OR "neural network?" OR "?NN?" OR "f?undational model?" OR agent) AND (quantization OR quantize OR quantized) AND ("energy consumption" OR "energy efficien*" OR "sustain*" OR "carbon footprint" OR "carbon emission") ANDNOT ("FL" OR "federated learning")) AND submittedDate:[202201010000 TO 202502040000]'  # noqa: E501
-    max_results = 1000
-    arxiv_papers = download_arxiv_papers(search_query, max_results)
+    # Harvest the submission period of the query in quarters, concurrently
+    harvester = ArxivHarvester(cache=HTTPCache(ttl=0 if args.refresh else HTTP_CACHE_TTL), offline=args.offline)
+    arxiv_papers = download_arxiv_papers(
+        search_query, shards=date_shards(date(2022, 1, 1), date(2025, 2, 4), days=91), harvester=harvester
+    )
 
-    arxiv_papers = papers_dict_to_polars_df(arxiv_papers)
+    arxiv_papers = format_arxiv_papers(arxiv_papers)
 
     scopus_papers = read_scopus_quantization_papers().sort("Year", descending=False)
 
     print(f"Joining {scopus_papers.height} Scopus papers with {arxiv_papers.height} arXiv papers.")
     all_papers = pl.concat([scopus_papers, arxiv_papers], how="diagonal_relaxed")
 
-    # Find pre-prints with Conference or Journal versions
+    # Find pre-prints with Conference or Journal versions, keeping the first record, i.e. the Scopus one
+    all_papers = clean_titles(all_papers)
+    clusters, matches = find_duplicates(all_papers)
+    papers = drop_duplicates(all_papers, clusters)
+    # The later stages identify the papers by title, so records with the same title are dropped even when their DOIs
+    # differ, e.g. the conference and journal versions of a paper
     papers = (
-        clean_titles(all_papers)
-        .with_columns(pl.col("Title").str.to_lowercase().alias("Temp Title"))
+        papers.with_columns(pl.col("Title").str.to_lowercase().alias("Temp Title"))
         .unique("Temp Title", keep="first", maintain_order=True)
         .drop("Temp Title")
     )
     print(f"Found {all_papers.height - papers.height} papers with both pre-print and Conference/Journal versions.")
 
+    duplicates_path = INTERIM_DATA_DIR / "model-quantization-duplicates.csv"
+    print(f"Writing {matches.height} matches to {duplicates_path}.")
+    titles = all_papers.select(pl.int_range(pl.len(), dtype=pl.UInt32).alias("Record"), "Title", "Source")
+    (
+        matches.join(clusters.select("Record", "Cluster"), on="Record")
+        .join(titles, on="Record")
+        .join(titles.rename({"Record": "Match"}), on="Match", suffix=" Match")
+        .sort("Cluster", "Record", "Match")
+        .write_csv(duplicates_path)
+    )
+
     # Write the data to a CSV file
     save_path = INTERIM_DATA_DIR / "model-quantization-papers.csv"
     print(f"Writing {papers.height} papers to {save_path}.")
@@ -5,6 +5,7 @@ from enum import Enum
 import polars as pl
 
 from src.config import EXTERNAL_DATA_DIR
+from src.data.papers.schema import scan_csv_with_schema, validate_csv
 
 
 @dataclass
@@ -70,11 +71,44 @@ class Paper(ABC):
     CORRECTNESS_COLUMNS: CorrectnessMetrics
     GROUPING_COLUMNS: list[str] = None
     EXPERIMENT_RUN_KEY: list[str] = None
+    INPUT_SCHEMA: pl.Schema = None
+    INPUT_FILES: list[str] = None
 
     @abstractmethod
     def read_data(self) -> pl.LazyFrame:
         pass
 
+    def scan_input(self, file_name: str) -> pl.LazyFrame:
+        """
+        Scan one of the paper's CSV files enforcing the input schema.
+
+        Parameters
+        ----------
+        file_name : str
+            The name of the file in the paper's external data directory.
+
+        Returns
+        -------
+        pl.LazyFrame
+            The lazy frame with the columns of the input schema.
+        """
+        return scan_csv_with_schema(EXTERNAL_DATA_DIR / self.KEY / file_name, self.INPUT_SCHEMA)
+
+    def validate_input(self):
+        """
+        Validate the paper's input files against the input schema.
+
+        Raises
+        ------
+        SchemaViolationError
+            If a file does not match the input schema, reporting the file, row and column of the first violation.
+        """
+        if self.INPUT_SCHEMA is None:
+            return
+
+        for file_name in self.INPUT_FILES:
+            validate_csv(EXTERNAL_DATA_DIR / self.KEY / file_name, self.INPUT_SCHEMA)
+
 
 class PaulPaper(Paper):
     KEY = "paulEnergyEfficientRespiratoryAnomaly2022"
@@ -90,9 +124,18 @@ class PaulPaper(Paper):
     )
     CORRECTNESS_COLUMNS = CorrectnessMetrics(accuracy="accuracy")
     GROUPING_COLUMNS = None
+    INPUT_SCHEMA = pl.Schema(
+        {
+            "quantization_precision": pl.String,
+            "accuracy": pl.Float32,
+            "inference_energy": pl.Float32,
+            "model_size_bits": pl.Float32,
+        }
+    )
+    INPUT_FILES = ["paper-data.csv"]
 
     def read_data(self) -> pl.LazyFrame:
-        return pl.scan_csv(EXTERNAL_DATA_DIR / self.KEY / "paper-data.csv")
+        return self.scan_input(self.INPUT_FILES[0])
 
 
 class SathishPaper(Paper):
@@ -109,9 +152,21 @@ class SathishPaper(Paper):
     )
     CORRECTNESS_COLUMNS = CorrectnessMetrics(accuracy="accuracy", dsc="dsc")
     GROUPING_COLUMNS = ["model", "dataset"]
+    INPUT_SCHEMA = pl.Schema(
+        {
+            "quantization_precision": pl.String,
+            "model": pl.String,
+            "dataset": pl.String,
+            "accuracy": pl.Float32,
+            "dsc": pl.Float32,
+            "system_energy_J": pl.Float32,
+            "model_size_MB": pl.Float32,
+        }
+    )
+    INPUT_FILES = ["paper-data.csv"]
 
     def read_data(self) -> pl.LazyFrame:
-        return pl.scan_csv(EXTERNAL_DATA_DIR / self.KEY / "paper-data.csv")
+        return self.scan_input(self.INPUT_FILES[0])
 
 
 class TaoPaper(Paper):
@@ -130,10 +185,25 @@ class TaoPaper(Paper):
     )
     CORRECTNESS_COLUMNS = CorrectnessMetrics(accuracy="accuracy", f1_score="f1_score")
     GROUPING_COLUMNS = None
+    INPUT_SCHEMA = pl.Schema(
+        {
+            "Exp": pl.String,
+            "Pruning Sparsity": pl.String,
+            "Weight Encoding": pl.String,
+            "Activation Encoding": pl.String,
+            "Accuracy (%)": pl.Float32,
+            "F1 Score": pl.Float32,
+            "Model Size (KB)": pl.Float32,
+            "Power Consumption (mW)": pl.Float32,
+            "Inference Time (ms)": pl.Float32,
+            "Energy Consumption (µJ)": pl.Float32,
+        }
+    )
+    INPUT_FILES = ["paper-data.csv"]
 
     def read_data(self) -> pl.LazyFrame:
         return (
-            pl.read_csv(EXTERNAL_DATA_DIR / self.KEY / "paper-data.csv")
+            self.scan_input(self.INPUT_FILES[0])
             .with_columns(
                 ("w-" + pl.col("Weight Encoding") + ", a-" + pl.col("Activation Encoding")).alias(
                     "quantization_precision"
@@ -167,21 +237,29 @@ class GeensPaper(Paper):
     )
     CORRECTNESS_COLUMNS = CorrectnessMetrics()
     GROUPING_COLUMNS = None
+    # Only the y values of the digitized figures are used
+    INPUT_SCHEMA = pl.Schema({"y": pl.Float64})
+    INPUT_FILES = [
+        "w32a32-energy.csv",
+        "w32a32-latency.csv",
+        "w4a16-energy.csv",
+        "w4a16-latency.csv",
+        "w1a32-energy.csv",
+        "w1a32-latency.csv",
+    ]
 
     def read_data(self) -> pl.LazyFrame:
-        baseline_energy = (
-            pl.read_csv(EXTERNAL_DATA_DIR / self.KEY / "w32a32-energy.csv").select(pl.col("y") * 1e14).sum()
-        )
-        baseline_latency = (
-            pl.read_csv(EXTERNAL_DATA_DIR / self.KEY / "w32a32-latency.csv").select(pl.col("y") * 1e10).sum()
+        baseline_energy, baseline_latency, w4a16_energy, w4a16_latency, w1a32_energy, w1a32_latency = pl.collect_all(
+            [
+                self.scan_input("w32a32-energy.csv").select(pl.col("y") * 1e14).sum(),
+                self.scan_input("w32a32-latency.csv").select(pl.col("y") * 1e10).sum(),
+                self.scan_input("w4a16-energy.csv").select(pl.col("y") * 1e14).sum(),
+                self.scan_input("w4a16-latency.csv").select(pl.col("y") * 1e9).sum(),
+                self.scan_input("w1a32-energy.csv").select(pl.col("y") * 1e14).sum(),
+                self.scan_input("w1a32-latency.csv").select(pl.col("y") * 1e9).sum(),
+            ]
         )
 
-        w4a16_energy = pl.read_csv(EXTERNAL_DATA_DIR / self.KEY / "w4a16-energy.csv").select(pl.col("y") * 1e14).sum()
-        w4a16_latency = pl.read_csv(EXTERNAL_DATA_DIR / self.KEY / "w4a16-latency.csv").select(pl.col("y") * 1e9).sum()
-
-        w1a32_energy = pl.read_csv(EXTERNAL_DATA_DIR / self.KEY / "w1a32-energy.csv").select(pl.col("y") * 1e14).sum()
-        w1a32_latency = pl.read_csv(EXTERNAL_DATA_DIR / self.KEY / "w1a32-latency.csv").select(pl.col("y") * 1e9).sum()
-
         return pl.LazyFrame(
             {
                 "quantization_precision": ["w-fp32, a-fp32", "w-int4, a-fp16", "w-int1, a-fp32"],
@@ -211,6 +289,22 @@ class GonzalezPaper(Paper):
     CORRECTNESS_COLUMNS = CorrectnessMetrics(accuracy="accuracy")
     GROUPING_COLUMNS = ["Model", "Datasets"]
     EXPERIMENT_RUN_KEY = ["Experiment", "Image ID"]
+    INPUT_SCHEMA = pl.Schema(
+        {
+            "Experiment": pl.String,
+            "Optimization": pl.String,
+            "Model": pl.String,
+            "Datasets": pl.String,
+            "Image ID": pl.String,
+            "Correct Prediction": pl.UInt8,
+            "Total Time": pl.Float32,
+            "Model Size": pl.UInt32,  # Model size is in bytes
+            "avg_utilization_gpu": pl.Float32,
+            "avg_power_draw": pl.Float32,
+            "avg_load": pl.Float32,
+        }
+    )
+    INPUT_FILES = ["final_ds_image-classification.csv"]
 
     def clean_data(self, raw_data: pl.LazyFrame) -> pl.LazyFrame:
         # Get only quantization data and baseline
@@ -249,39 +343,7 @@ class GonzalezPaper(Paper):
         # )
 
     def read_data(self) -> pl.LazyFrame:
-        data = pl.scan_csv(
-            EXTERNAL_DATA_DIR / self.KEY / "final_ds_image-classification.csv",
-            has_header=True,
-            separator=",",
-            schema_overrides={
-                "Optimization": str,
-                "Model": str,
-                "y_pred": str,
-                "y_true": str,
-                "Correct Prediction": pl.UInt8,
-                "Total Time": pl.Float64,
-                "Model Size": pl.UInt32,  # Model size is in bytes
-                "avg_utilization_gpu": pl.Float64,
-                "avg_power_draw": pl.Float64,
-                "avg_load": pl.Float64,
-            },
-        )
-
-        data = data.select(
-            [
-                "Experiment",
-                "Optimization",
-                "Model",
-                "Datasets",
-                "Image ID",
-                "Correct Prediction",
-                "Total Time",
-                "Model Size",
-                "avg_utilization_gpu",
-                "avg_power_draw",
-                "avg_load",
-            ]
-        )
+        data = self.scan_input(self.INPUT_FILES[0])
 
         clean_df = self.clean_data(data)
         return self.compute_metrics(clean_df)
@@ -47,6 +47,30 @@ class KnowledgeExtractor:
             ]
         ).rename({self.paper.QUANTIZATION_PRECISION_COL: self.PRECISION_COLUMN})
 
+    @classmethod
+    def from_improvement_metrics(cls, improvement_metrics: pl.DataFrame, paper: Paper) -> "KnowledgeExtractor":
+        """
+        Create a knowledge extractor from already computed improvement metrics, skipping the baseline join.
+
+        Parameters
+        ----------
+        improvement_metrics : pl.DataFrame
+            The improvement metrics, as computed by `compute_improvement`.
+        paper : Paper
+            The paper the improvement metrics belong to.
+
+        Returns
+        -------
+        KnowledgeExtractor
+            The knowledge extractor, ready to compute the effects.
+        """
+        knowledge_extractor = cls.__new__(cls)
+        knowledge_extractor.paper = paper
+        knowledge_extractor.correctness_columns = paper.CORRECTNESS_COLUMNS.metrics()
+        knowledge_extractor.resource_efficiency_columns = paper.RESOURCE_EFFICIENCY_COLUMNS.metrics()
+        knowledge_extractor.improvement_metrics = improvement_metrics
+        return knowledge_extractor
+
     def extract_knowledge(self):
         self.compute_improvement()
         self.compute_overall_effect()
@@ -73,19 +97,20 @@ class KnowledgeExtractor:
             )
 
         # Compute the relative improvement for each metric
+        # Note: Input metrics may be read as Float32, so they are widened before computing the improvement.
         # Note: We use the baseline value to compute the improvement, so we need to replace 0 with a small value
         # to avoid division by zero resulting in NaN values or infinite values.
         self.improvement_metrics = quantization_data.with_columns(
             *[
-                ((pl.col(col) - pl.col(f"{col}_baseline")) / pl.col(f"{col}_baseline") * 100)
-                .cast(pl.Float64)
-                .alias(f"{metric}_improvement")
+                ((pl.col(col).cast(pl.Float64) - pl.col(f"{col}_baseline")) / pl.col(f"{col}_baseline") * 100).alias(
+                    f"{metric}_improvement"
+                )
                 for metric, col in self.correctness_columns
             ]
             + [
-                ((pl.col(f"{col}_baseline") - pl.col(col)) / pl.col(f"{col}_baseline") * 100)
-                .cast(pl.Float64)
-                .alias(f"{metric}_improvement")
+                ((pl.col(f"{col}_baseline").cast(pl.Float64) - pl.col(col)) / pl.col(f"{col}_baseline") * 100).alias(
+                    f"{metric}_improvement"
+                )
                 for metric, col in self.resource_efficiency_columns
             ]
         )
@@ -131,6 +156,12 @@ class KnowledgeExtractor:
 
         self.overall_effects = self._enrich_data(self.overall_effects)
 
+        if not hasattr(self, "intensity_bands"):
+            self.compute_intensity_bands()
+        self.overall_effects = self._add_intensity_distribution(
+            self.overall_effects, self.intensity_bands.select(self._intensity_distribution())
+        )
+
         return self.overall_effects
 
     def compute_effects_by_precision(self) -> pl.DataFrame:
@@ -145,7 +176,14 @@ class KnowledgeExtractor:
             ]
         )
 
-        self.effects_by_precision = self._enrich_data(self.effects_by_precision).sort(self.PRECISION_COLUMN)
+        self.effects_by_precision = self._enrich_data(self.effects_by_precision)
+
+        if not hasattr(self, "intensity_bands"):
+            self.compute_intensity_bands()
+        self.effects_by_precision = self._add_intensity_distribution(
+            self.effects_by_precision,
+            self.intensity_bands.group_by(self.PRECISION_COLUMN).agg(self._intensity_distribution()),
+        ).sort(self.PRECISION_COLUMN)
 
         return self.effects_by_precision
 
@@ -278,45 +316,109 @@ class KnowledgeExtractor:
             )
         return df
 
+    def _get_intensity(self, metric: str) -> EffectIntensity:
+        if metric in [correctness_metric for correctness_metric, _ in self.correctness_columns]:
+            return CorrectnessIntensity()
+        elif "energy" in metric:
+            return EnergyIntensity()
+        elif "utilization" in metric:
+            return ResourceUsageIntensity()
+        elif "latency" in metric:
+            return LatencyIntensity()
+        else:
+            return EffectIntensity()
+
     def _add_effect_intensity(self, df: pl.DataFrame) -> pl.DataFrame:
         enriched_df = df.collect() if type(df) is pl.LazyFrame else df
 
-        for metric, _ in self.correctness_columns:
+        for metric, _ in self.correctness_columns + self.resource_efficiency_columns:
+            intensity = self._get_intensity(metric)
             intensities = [
-                CorrectnessIntensity().get_intensity(row[0])
+                intensity.get_intensity(row[0])
                 for row in enriched_df.select(pl.col(metric).struct.field("improvement")).iter_rows()
             ]
-            enriched_df = enriched_df.with_columns(
-                pl.col(metric).struct.with_fields(
-                    intensity=pl.Series(intensities),
-                )
-            )
-
-        for metric, _ in self.resource_efficiency_columns:
-            if "energy" in metric:
-                intensities = [
-                    EnergyIntensity().get_intensity(row[0])
-                    for row in enriched_df.select(pl.col(metric).struct.field("improvement")).iter_rows()
-                ]
-            elif "utilization" in metric:
-                intensities = [
-                    ResourceUsageIntensity().get_intensity(row[0])
-                    for row in enriched_df.select(pl.col(metric).struct.field("improvement")).iter_rows()
-                ]
-            elif "latency" in metric:
-                intensities = [
-                    LatencyIntensity().get_intensity(row[0])
-                    for row in enriched_df.select(pl.col(metric).struct.field("improvement")).iter_rows()
-                ]
-            else:
-                intensities = [
-                    EffectIntensity().get_intensity(row[0])
-                    for row in enriched_df.select(pl.col(metric).struct.field("improvement")).iter_rows()
-                ]
             enriched_df = enriched_df.with_columns(pl.col(metric).struct.with_fields(intensity=pl.Series(intensities)))
 
         return enriched_df
 
+    def _intensity_band(self, metric: str) -> pl.Expr:
+        """
+        Returns an expression with the index of the intensity band of each sample improvement of a metric.
+
+        The bands are the ones returned by `EffectIntensity.get_ranges`, in the same order, and the boundaries are
+        assigned as in `EffectIntensity.get_intensity`.
+
+        Parameters
+        ----------
+        metric : str
+            The name of the metric.
+
+        Returns
+        -------
+        pl.Expr
+            The index of the intensity band, or null when the improvement is null or NaN.
+        """
+        ranges = list(self._get_intensity(metric).get_ranges().values())
+        indiferent_band = len(ranges) // 2
+        thresholds = [lower for lower, _ in ranges[indiferent_band + 1 :]]
+
+        improvement = pl.col(f"{metric}_improvement").fill_nan(None)
+        level = pl.sum_horizontal([improvement.abs() > threshold for threshold in thresholds]).cast(pl.Int8)
+        return (
+            pl.when(improvement.is_null())
+            .then(None)
+            .when(improvement < 0)
+            .then(indiferent_band - level)
+            .otherwise(indiferent_band + level)
+            .cast(pl.UInt8)
+            .alias(f"{metric}_intensity_band")
+        )
+
+    def compute_intensity_bands(self) -> pl.DataFrame:
+        """
+        Assign each sample improvement to its intensity band in a single pass over the improvement metrics.
+
+        Returns
+        -------
+        pl.DataFrame
+            The precision of each sample and the index of the intensity band of each metric.
+        """
+        if not hasattr(self, "improvement_metrics"):
+            self.compute_improvement()
+        self.intensity_bands = self.improvement_metrics.select(
+            pl.col(self.PRECISION_COLUMN),
+            *[
+                self._intensity_band(metric)
+                for metric, _ in self.correctness_columns + self.resource_efficiency_columns
+            ],
+        )
+        return self.intensity_bands
+
+    def _intensity_distribution(self) -> list[pl.Expr]:
+        bands = list(EffectIntensity().get_ranges())
+        return [
+            pl.struct(
+                [
+                    (pl.col(f"{metric}_intensity_band") == i).sum().cast(pl.UInt32).alias(band)
+                    for i, band in enumerate(bands)
+                ]
+            ).alias(f"{metric}_distribution")
+            for metric, _ in self.correctness_columns + self.resource_efficiency_columns
+        ]
+
+    def _add_intensity_distribution(self, df: pl.DataFrame, distribution: pl.DataFrame) -> pl.DataFrame:
+        if self.PRECISION_COLUMN in df.columns:
+            df = df.join(distribution, on=self.PRECISION_COLUMN, how="left")
+        else:
+            df = pl.concat([df, distribution], how="horizontal")
+
+        return df.with_columns(
+            pl.struct(pl.col(metric).struct.unnest(), pl.col(f"{metric}_distribution").alias("distribution")).alias(
+                metric
+            )
+            for metric, _ in self.correctness_columns + self.resource_efficiency_columns
+        ).drop("^*_distribution$")
+
     def write_json(self, file: PathLike):
         """
         Write the extracted knowledge to a JSON file.
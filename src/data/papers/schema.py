@@ -0,0 +1,122 @@
+from os import PathLike
+
+import polars as pl
+
+
+class SchemaViolationError(ValueError):
+    """Raised when an input file does not match the schema declared by its paper."""
+
+    def __init__(self, file: PathLike, column: str, message: str, row: int | None = None):
+        self.file = file
+        self.column = column
+        self.row = row
+        location = f"row {row}, column '{column}'" if row is not None else f"column '{column}'"
+        super().__init__(f"{file}: {location}: {message}")
+
+
+def scan_csv_with_schema(source: PathLike, schema: pl.Schema, **kwargs) -> pl.LazyFrame:
+    """
+    Scan a CSV file enforcing the given schema without any type inference.
+
+    Only the columns in the schema are projected, so the remaining columns of the file are never parsed.
+
+    Parameters
+    ----------
+    source : PathLike
+        Path to the CSV file.
+    schema : pl.Schema
+        The expected columns and their data types.
+    kwargs : dict
+        Additional arguments passed to `polars.scan_csv`.
+
+    Returns
+    -------
+    pl.LazyFrame
+        The lazy frame with the columns in the schema.
+
+    Raises
+    ------
+    SchemaViolationError
+        If a column of the schema is missing from the file header.
+    """
+    data = pl.scan_csv(source, schema_overrides=schema, infer_schema=False, **kwargs)
+
+    # Reading the schema with inference disabled only parses the header
+    header = data.collect_schema().names()
+    for column in schema.names():
+        if column not in header:
+            raise SchemaViolationError(source, column, "column is missing from the file header")
+
+    return data.select(schema.names())
+
+
+def find_schema_violations(source: PathLike, schema: pl.Schema, **kwargs) -> pl.DataFrame:
+    """
+    Find the values of a CSV file that cannot be parsed with the given schema.
+
+    The file is read as text and each column is cast to its expected type, so all the violations are reported at
+    once instead of stopping at the first one.
+
+    Parameters
+    ----------
+    source : PathLike
+        Path to the CSV file.
+    schema : pl.Schema
+        The expected columns and their data types.
+    kwargs : dict
+        Additional arguments passed to `polars.scan_csv`.
+
+    Returns
+    -------
+    pl.DataFrame
+        The violations with the row (1-based, excluding the header), column, value and expected data type.
+    """
+    raw_data = pl.scan_csv(source, infer_schema=False, **kwargs).with_row_index("row", offset=1)
+    header = raw_data.collect_schema().names()
+
+    violations = [
+        raw_data.filter(pl.col(column).is_not_null() & pl.col(column).cast(dtype, strict=False).is_null()).select(
+            pl.col("row"),
+            pl.lit(column).alias("column"),
+            pl.col(column).alias("value"),
+            pl.lit(str(dtype)).alias("expected"),
+        )
+        for column, dtype in schema.items()
+        if column in header and dtype != pl.String
+    ]
+    if not violations:
+        return pl.DataFrame(schema={"row": pl.UInt32, "column": pl.String, "value": pl.String, "expected": pl.String})
+
+    return pl.concat(pl.collect_all(violations)).sort("row", "column")
+
+
+def validate_csv(source: PathLike, schema: pl.Schema, **kwargs) -> None:
+    """
+    Validate a CSV file against the given schema.
+
+    Parameters
+    ----------
+    source : PathLike
+        Path to the CSV file.
+    schema : pl.Schema
+        The expected columns and their data types.
+    kwargs : dict
+        Additional arguments passed to `polars.scan_csv`.
+
+    Raises
+    ------
+    SchemaViolationError
+        If a column is missing or a value cannot be parsed with its expected type. The first violation is reported.
+    """
+    scan_csv_with_schema(source, schema, **kwargs)
+
+    violations = find_schema_violations(source, schema, **kwargs)
+    if violations.height > 0:
+        violation = violations.row(0, named=True)
+        raise SchemaViolationError(
+            source,
+            violation["column"],
+            f"could not parse {violation['value']!r} as {violation['expected']} "
+            f"({violations.height} invalid values in total)",
+            row=violation["row"],
+        )
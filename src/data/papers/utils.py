@@ -1,7 +1,7 @@
 import polars as pl
 
 from src.config import PROCESSED_DATA_DIR
-from src.data.papers.entities import Paper
+from src.data.papers.entities import Paper, Papers
 
 
 def read_paper_metadata(paper: Paper) -> pl.DataFrame:
@@ -65,3 +65,42 @@ def read_paper_metadata(paper: Paper) -> pl.DataFrame:
             }
         ),
     ).with_columns(pl.lit(paper.YEAR).alias("year"))
+
+
+def read_improvement_statistics(
+    papers: list[Paper] | None = None, by_quantization_precision: bool = False
+) -> pl.DataFrame:
+    """
+    Read and consolidate the improvement statistics of several papers.
+
+    The `key` of each paper is converted to a comma-separated string since its fields differ between papers, and its
+    quantization precision is kept in the `precision` column.
+
+    Parameters
+    ----------
+    papers : list[Paper], optional
+        The papers to read the statistics for, by default all the papers.
+    by_quantization_precision : bool, optional
+        Whether to read the statistics aggregated by quantization precision, by default False.
+
+    Returns
+    -------
+    polars.DataFrame
+        The improvement statistics of all the papers.
+    """
+    if papers is None:
+        papers = [paper.value for paper in Papers]
+
+    file_name = (
+        "improvement_statistics_by_precision.parquet" if by_quantization_precision else "improvement_statistics.parquet"
+    )
+    return pl.concat(
+        [
+            pl.read_parquet(PROCESSED_DATA_DIR / paper.KEY / file_name).with_columns(
+                pl.col("key").struct.field("quantization_precision").alias("precision"),
+                pl.concat_str(pl.col("key").struct.unnest(), separator=", ").alias("key"),
+            )
+            for paper in papers
+        ],
+        how="diagonal_relaxed",
+    )
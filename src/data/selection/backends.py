@@ -0,0 +1,339 @@
+from abc import ABC, abstractmethod
+import json
+import time
+
+import anthropic
+from google import genai
+
+from src.data.selection.cache import ResponseCache
+from src.data.selection.fake import FakeGeminiClient
+from src.data.selection.llm import (
+    CLAUDE_MODEL,
+    GEMINI_CONFIG,
+    GEMINI_MODEL,
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_TOKENS_PER_MINUTE,
+    GeminiPrefixCache,
+    claude_config,
+    claude_query,
+    claude_query_async,
+    claude_request,
+    gemini_query,
+    gemini_query_async,
+)
+from src.data.selection.usage import UsageTracker
+
+# Tier 1 limits of the Anthropic API for CLAUDE_MODEL
+CLAUDE_REQUESTS_PER_MINUTE = 50
+CLAUDE_TOKENS_PER_MINUTE = 40_000
+
+
+class MalformedResponseError(ValueError):
+    """Raised when an LLM keeps answering with a response that is not valid JSON."""
+
+
+class LLMBackend(ABC):
+    """
+    Interface of the LLM providers used to screen papers.
+
+    A backend sends a screening query and returns the parsed JSON response. Rate-limited synchronous queries are
+    retried by the backend, while asynchronous queries leave it to the caller (see `AsyncScreeningClient`). Responses
+    that are not valid JSON, e.g. truncated ones, are requested again up to `max_malformed_retries` times.
+
+    Attributes
+    ----------
+    provider : str
+        The name of the provider.
+    model : str
+        The name of the model.
+    requests_per_minute : float
+        The default maximum number of requests per minute.
+    tokens_per_minute : float | None
+        The default maximum number of tokens per minute, None if unlimited.
+    latencies : list[float]
+        The latency in seconds of each successful query.
+    """
+
+    provider: str
+    model: str
+    requests_per_minute: float
+    tokens_per_minute: float | None = None
+
+    def __init__(self, max_malformed_retries: int = 2):
+        self.max_malformed_retries = max_malformed_retries
+        self.latencies = []
+
+    @abstractmethod
+    def _query(self, query: str) -> dict: ...
+
+    def cached(self, query: str) -> dict | None:
+        """
+        Returns the cached response to a query without sending it, so that callers can skip rate limiting for it.
+
+        Parameters
+        ----------
+        query : str
+            The query message.
+
+        Returns
+        -------
+        dict | None
+            The cached response, or None if the backend has no response cache or the query is not in it.
+        """
+        return None
+
+    def discard(self, query: str):
+        """
+        Drop the cached response to a query, so that the query is sent again instead of getting the same response.
+
+        Used for the responses that leave out submitted papers, see `recover_batch`.
+
+        Parameters
+        ----------
+        query : str
+            The query message.
+        """
+        return
+
+    @abstractmethod
+    async def _aquery(self, query: str) -> dict: ...
+
+    def _malformed(self, e: json.JSONDecodeError) -> MalformedResponseError:
+        attempts = self.max_malformed_retries + 1
+        return MalformedResponseError(f"{self.provider} returned malformed JSON {attempts} times: {e}")
+
+    def query(self, query: str) -> dict:
+        """
+        Send a query and return the parsed response.
+
+        Parameters
+        ----------
+        query : str
+            The query message.
+
+        Returns
+        -------
+        dict
+            The parsed response.
+
+        Raises
+        ------
+        MalformedResponseError
+            If the response is not valid JSON after all the retries.
+        """
+        for attempt in range(self.max_malformed_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self._query(query)
+            except json.JSONDecodeError as e:
+                if attempt == self.max_malformed_retries:
+                    raise self._malformed(e) from e
+                continue
+            self.latencies.append(time.perf_counter() - start)
+            return response
+
+    async def aquery(self, query: str) -> dict:
+        """
+        Send a query asynchronously and return the parsed response.
+
+        Parameters
+        ----------
+        query : str
+            The query message.
+
+        Returns
+        -------
+        dict
+            The parsed response.
+
+        Raises
+        ------
+        MalformedResponseError
+            If the response is not valid JSON after all the retries.
+        """
+        for attempt in range(self.max_malformed_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = await self._aquery(query)
+            except json.JSONDecodeError as e:
+                if attempt == self.max_malformed_retries:
+                    raise self._malformed(e) from e
+                continue
+            self.latencies.append(time.perf_counter() - start)
+            return response
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Gemini backend, see `gemini_query`.
+
+    Parameters
+    ----------
+    client : genai.Client
+        The Gemini client.
+    cache : ResponseCache, optional
+        The cache of the responses, by default None.
+    prefix_cache : GeminiPrefixCache, optional
+        The context cache holding `QUERY_CONTEXT`, by default None.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
+    max_malformed_retries : int, optional
+        The maximum number of retries of a malformed response, by default 2.
+    """
+
+    provider = "gemini"
+    model = GEMINI_MODEL
+    requests_per_minute = GEMINI_REQUESTS_PER_MINUTE
+    tokens_per_minute = GEMINI_TOKENS_PER_MINUTE
+
+    def __init__(
+        self,
+        client: genai.Client,
+        cache: ResponseCache | None = None,
+        prefix_cache: GeminiPrefixCache | None = None,
+        usage: UsageTracker | None = None,
+        max_malformed_retries: int = 2,
+    ):
+        super().__init__(max_malformed_retries)
+        self.client = client
+        self.cache = cache
+        self.prefix_cache = prefix_cache
+        self.usage = usage
+
+    def cached(self, query: str) -> dict | None:
+        if self.cache is None:
+            return None
+        json_response = self.cache.get("gemini", GEMINI_MODEL, GEMINI_CONFIG, query, count_miss=False)
+        if json_response is not None and self.usage is not None:
+            self.usage.cache_hit("gemini", GEMINI_MODEL)
+        return json_response
+
+    def discard(self, query: str):
+        if self.cache is not None:
+            self.cache.delete("gemini", GEMINI_MODEL, GEMINI_CONFIG, query)
+
+    def _query(self, query: str) -> dict:
+        return gemini_query(self.client, query, cache=self.cache, prefix_cache=self.prefix_cache, usage=self.usage)
+
+    async def _aquery(self, query: str) -> dict:
+        return await gemini_query_async(
+            self.client, query, cache=self.cache, prefix_cache=self.prefix_cache, usage=self.usage
+        )
+
+
+class ClaudeBackend(LLMBackend):
+    """
+    Claude backend, see `claude_query`.
+
+    Parameters
+    ----------
+    client : anthropic.Anthropic, optional
+        The Claude client used by `query`, by default None.
+    async_client : anthropic.AsyncAnthropic, optional
+        The asynchronous Claude client used by `aquery`, by default None.
+    cache : ResponseCache, optional
+        The cache of the responses, by default None.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
+    max_malformed_retries : int, optional
+        The maximum number of retries of a malformed response, by default 2.
+    """
+
+    provider = "claude"
+    model = CLAUDE_MODEL
+    requests_per_minute = CLAUDE_REQUESTS_PER_MINUTE
+    tokens_per_minute = CLAUDE_TOKENS_PER_MINUTE
+
+    def __init__(
+        self,
+        client: anthropic.Anthropic | None = None,
+        async_client: anthropic.AsyncAnthropic | None = None,
+        cache: ResponseCache | None = None,
+        usage: UsageTracker | None = None,
+        max_malformed_retries: int = 2,
+    ):
+        if client is None and async_client is None:
+            raise ValueError("At least one of client and async_client must be provided")
+
+        super().__init__(max_malformed_retries)
+        self.client = client
+        self.async_client = async_client
+        self.cache = cache
+        self.usage = usage
+
+    def cached(self, query: str) -> dict | None:
+        if self.cache is None:
+            return None
+        json_response = self.cache.get(
+            "claude", CLAUDE_MODEL, claude_config(claude_request(query)), query, count_miss=False
+        )
+        if json_response is not None and self.usage is not None:
+            self.usage.cache_hit("claude", CLAUDE_MODEL)
+        return json_response
+
+    def discard(self, query: str):
+        if self.cache is not None:
+            self.cache.delete("claude", CLAUDE_MODEL, claude_config(claude_request(query)), query)
+
+    def _query(self, query: str) -> dict:
+        if self.client is None:
+            raise ValueError("The synchronous Claude client was not provided")
+        return claude_query(self.client, query, cache=self.cache, usage=self.usage)
+
+    async def _aquery(self, query: str) -> dict:
+        if self.async_client is None:
+            raise ValueError("The asynchronous Claude client was not provided")
+        return await claude_query_async(self.async_client, query, cache=self.cache, usage=self.usage)
+
+
+class FakeBackend(GeminiBackend):
+    """
+    Deterministic offline backend going through the Gemini code path with a `FakeGeminiClient`.
+
+    Its responses are never stored in a response cache, so they cannot be mistaken for real ones.
+
+    Parameters
+    ----------
+    latency : float, optional
+        The median latency of a request in seconds, by default 0.
+    rate_limit_probability : float, optional
+        The probability that an attempt is rejected with a rate-limit error, by default 0.
+    malformed_probability : float, optional
+        The probability that an attempt returns truncated JSON, by default 0.
+    omit_probability : float, optional
+        The probability that a paper is left out of a response, by default 0.
+    mangle_probability : float, optional
+        The probability that the title or ratings of a paper are mangled in a response, by default 0.
+    seed : int, optional
+        The seed of the simulated latencies and failures, by default 0.
+    prefix_cache : bool, optional
+        Whether to send `QUERY_CONTEXT` through a context cache, by default True.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
+    """
+
+    provider = "fake"
+    model = "fake"
+    requests_per_minute = 60_000
+    tokens_per_minute = None
+
+    def __init__(
+        self,
+        latency: float = 0,
+        rate_limit_probability: float = 0,
+        malformed_probability: float = 0,
+        omit_probability: float = 0,
+        mangle_probability: float = 0,
+        seed: int = 0,
+        prefix_cache: bool = True,
+        usage: UsageTracker | None = None,
+    ):
+        client = FakeGeminiClient(
+            latency=latency,
+            rate_limit_probability=rate_limit_probability,
+            malformed_probability=malformed_probability,
+            omit_probability=omit_probability,
+            mangle_probability=mangle_probability,
+            seed=seed,
+        )
+        super().__init__(client, prefix_cache=GeminiPrefixCache(client) if prefix_cache else None, usage=usage)
@@ -0,0 +1,255 @@
+import argparse
+from collections.abc import Sequence
+import random
+import time
+
+import numpy as np
+import polars as pl
+
+from src.data.selection.backends import FakeBackend
+from src.data.selection.client import AsyncScreeningClient
+from src.data.selection.llm import (
+    MAX_BATCH_INPUT_TOKENS,
+    MAX_BATCH_OUTPUT_TOKENS,
+    MODEL_PRICES,
+    build_batched_query,
+)
+from src.data.selection.rate_limit import RateLimiter
+from src.data.selection.select_papers import make_queries
+from src.data.selection.usage import ModelPrice, UsageTracker
+
+WORDS = [
+    "quantization",
+    "model",
+    "inference",
+    "energy",
+    "efficiency",
+    "latency",
+    "memory",
+    "accuracy",
+    "neural",
+    "network",
+    "deep",
+    "learning",
+    "compression",
+    "pruning",
+    "integer",
+    "precision",
+    "bit",
+    "weights",
+    "activations",
+    "hardware",
+    "accelerator",
+    "edge",
+    "device",
+    "mobile",
+    "transformer",
+    "language",
+    "vision",
+    "benchmark",
+    "evaluation",
+    "performance",
+    "throughput",
+    "training",
+    "calibration",
+]
+
+
+def synthetic_papers(n: int, seed: int = 0) -> pl.DataFrame:
+    """
+    Returns a corpus of random papers with the columns used in the screening queries.
+
+    Parameters
+    ----------
+    n : int
+        The number of papers.
+    seed : int, optional
+        The seed of the random words, by default 0.
+
+    Returns
+    -------
+    pl.DataFrame
+        The papers, with a unique "Title" and an "Abstract" of 100 to 300 words.
+    """
+    rng = random.Random(seed)
+    return pl.DataFrame(
+        {
+            "Title": [f"Paper {i}: {' '.join(rng.choices(WORDS, k=8)).capitalize()}" for i in range(n)],
+            "Abstract": [" ".join(rng.choices(WORDS, k=rng.randint(100, 300))) for _ in range(n)],
+            "Author Keywords": ["; ".join(rng.sample(WORDS, k=5)) for _ in range(n)],
+        }
+    )
+
+
+def run_benchmark(
+    papers: pl.DataFrame,
+    batched: bool,
+    backend: FakeBackend,
+    requests_per_minute: float | None = None,
+    max_in_flight: int = 8,
+    batch_size: int | None = None,
+    max_input_tokens: int = MAX_BATCH_INPUT_TOKENS,
+    max_output_tokens: int = MAX_BATCH_OUTPUT_TOKENS,
+    prices: dict[str, ModelPrice] | None = None,
+) -> dict:
+    """
+    Screen the papers with a backend and measure the throughput and latency.
+
+    Parameters
+    ----------
+    papers : pl.DataFrame
+        The papers to screen.
+    batched : bool
+        Whether to send several papers per query, see `build_batched_query`, or one paper per query with
+        `make_queries`.
+    backend : FakeBackend
+        The backend, which should not have answered any query yet.
+    requests_per_minute : float, optional
+        The maximum number of requests per minute, by default the limit of the backend.
+    max_in_flight : int, optional
+        The maximum number of requests waiting for a response, by default 8.
+    batch_size : int, optional
+        The maximum number of papers per batched query, by default unlimited.
+    max_input_tokens : int, optional
+        The maximum number of input tokens of a batched query, by default MAX_BATCH_INPUT_TOKENS.
+    max_output_tokens : int, optional
+        The maximum number of expected output tokens of a batched query, by default MAX_BATCH_OUTPUT_TOKENS.
+    prices : dict[str, ModelPrice], optional
+        The prices of the models by name, to estimate the cost of the run, by default `MODEL_PRICES`.
+
+    Returns
+    -------
+    dict
+        The number of papers, papers with valid ratings, queries and attempts, the elapsed seconds, the papers per
+        second and the 50th, 95th and 99th percentiles of the query latency in seconds. If the backend has a usage
+        tracker, also the prompt, cached and output tokens and the estimated cost in USD.
+    """
+    prices = MODEL_PRICES if prices is None else prices
+    start = time.perf_counter()
+    if batched:
+        screening_client = AsyncScreeningClient(
+            backend.aquery,
+            RateLimiter(requests_per_minute or backend.requests_per_minute, backend.tokens_per_minute),
+            max_in_flight=max_in_flight,
+            cached_fn=backend.cached,
+            discard_fn=backend.discard,
+        )
+        queries = build_batched_query(papers, batch_size, max_input_tokens, max_output_tokens)
+        scored = sum(len(result) for result in screening_client.iter_results(queries, batched=True))
+    else:
+        results = make_queries(backend, papers, requests_per_minute, max_in_flight=max_in_flight, progress=False)
+        scored = sum(len(result) for result in results)
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(backend.latencies, [50, 95, 99])
+    report = {
+        "mode": "batched" if batched else "single",
+        "papers": len(papers),
+        "scored": scored,
+        "queries": len(backend.latencies),
+        "attempts": backend.client.requests,
+        "seconds": elapsed,
+        "papers_per_second": len(papers) / elapsed,
+        "p50_latency": p50,
+        "p95_latency": p95,
+        "p99_latency": p99,
+    }
+    if backend.usage is not None:
+        usage = backend.usage.report(prices)
+        report |= {key: usage[key] for key in ("prompt_tokens", "cached_tokens", "output_tokens", "cost")}
+    return report
+
+
+def main(argv: Sequence[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the screening pipeline offline against a simulated LLM provider."
+    )
+    parser.add_argument(
+        "-n", "--papers", type=int, nargs="+", default=[100, 1000], help="Corpus sizes (default: 100 1000)."
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["single", "batched", "both"],
+        default="both",
+        help="Send one paper per query, batches of papers, or both (default: both).",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="Median latency of a request in seconds (default: 0.2)."
+    )
+    parser.add_argument(
+        "--rate-limit-probability",
+        type=float,
+        default=0.02,
+        help="Probability that a request is rejected with HTTP 429 (default: 0.02).",
+    )
+    parser.add_argument(
+        "--malformed-probability",
+        type=float,
+        default=0.01,
+        help="Probability that a response is truncated JSON (default: 0.01).",
+    )
+    parser.add_argument(
+        "--omit-probability",
+        type=float,
+        default=0.01,
+        help="Probability that a paper is left out of a batched response (default: 0.01).",
+    )
+    parser.add_argument(
+        "--mangle-probability",
+        type=float,
+        default=0.01,
+        help="Probability that the title or ratings of a paper are mangled in a response (default: 0.01).",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=6000,
+        help="Requests per minute allowed by the rate limiter (default: 6000).",
+    )
+    parser.add_argument(
+        "--max-in-flight", type=int, default=16, help="Maximum number of concurrent requests (default: 16)."
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=None, help="Maximum number of papers per batched query (default: none)."
+    )
+    parser.add_argument(
+        "--max-input-tokens",
+        type=int,
+        default=MAX_BATCH_INPUT_TOKENS,
+        help=f"Input token budget of a batched query (default: {MAX_BATCH_INPUT_TOKENS}).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus and simulation (default: 0).")
+    args = parser.parse_args(argv)
+
+    modes = [False, True] if args.mode == "both" else [args.mode == "batched"]
+    reports = []
+    for n in args.papers:
+        papers = synthetic_papers(n, args.seed)
+        for batched in modes:
+            backend = FakeBackend(
+                latency=args.latency,
+                rate_limit_probability=args.rate_limit_probability,
+                malformed_probability=args.malformed_probability,
+                omit_probability=args.omit_probability,
+                mangle_probability=args.mangle_probability,
+                seed=args.seed,
+                usage=UsageTracker(),
+            )
+            reports.append(
+                run_benchmark(
+                    papers,
+                    batched,
+                    backend,
+                    requests_per_minute=args.requests_per_minute,
+                    max_in_flight=args.max_in_flight,
+                    batch_size=args.batch_size,
+                    max_input_tokens=args.max_input_tokens,
+                )
+            )
+
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, float_precision=3):
+        print(pl.DataFrame(reports))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.config import INTERIM_DATA_DIR
+
+CACHE_FILE = INTERIM_DATA_DIR / "llm-responses.sqlite"
+
+
+def hash_text(text: str) -> str:
+    """Returns the SHA-256 digest of a text."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses stored in SQLite.
+
+    Responses are keyed by a hash of the provider, model, generation config and full prompt, so any change to the
+    request is a miss. Each entry also records the hash of the instructions (e.g. `QUERY_CONTEXT`) its prompt started
+    with, so that the responses to outdated instructions can be dropped with `invalidate`.
+
+    The cache can be shared by several threads.
+
+    Parameters
+    ----------
+    path : str | os.PathLike[str], optional
+        The path to the SQLite database, by default CACHE_FILE in the interim data directory.
+    ttl : float, optional
+        The number of seconds after which an entry is stale and ignored, by default entries never expire.
+    """
+
+    def __init__(self, path: str | os.PathLike[str] = CACHE_FILE, ttl: float | None = None):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    context TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+
+    @staticmethod
+    def key(provider: str, model: str, config: dict, prompt: str) -> str:
+        """
+        Returns the cache key of a request.
+
+        Parameters
+        ----------
+        provider : str
+            The LLM provider, e.g. "gemini".
+        model : str
+            The model name.
+        config : dict
+            The generation config of the request.
+        prompt : str
+            The full prompt.
+
+        Returns
+        -------
+        str
+            The hexadecimal digest of the request.
+        """
+        request = json.dumps([provider, model, config, prompt], sort_keys=True, default=str)
+        return hash_text(request)
+
+    def get(self, provider: str, model: str, config: dict, prompt: str, count_miss: bool = True) -> dict | None:
+        """
+        Returns the cached response of a request, or None if there is no fresh entry.
+
+        Parameters
+        ----------
+        provider : str
+            The LLM provider.
+        model : str
+            The model name.
+        config : dict
+            The generation config of the request.
+        prompt : str
+            The full prompt.
+        count_miss : bool, optional
+            Whether a miss is counted in `misses`, by default True. A lookup followed on a miss by a request that looks
+            the cache up again, e.g. `LLMBackend.cached`, does not count it, so that the miss is counted once.
+
+        Returns
+        -------
+        dict | None
+            The parsed response.
+        """
+        key = self.key(provider, model, config, prompt)
+        min_created_at = time.time() - self.ttl if self.ttl is not None else float("-inf")
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?", (key, min_created_at)
+            ).fetchone()
+            if row is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute("UPDATE responses SET hits = hits + 1 WHERE key = ?", (key,))
+        return json.loads(row[0])
+
+    def put(self, provider: str, model: str, config: dict, prompt: str, response: dict, context: str | None = None):
+        """
+        Store the response of a request.
+
+        Parameters
+        ----------
+        provider : str
+            The LLM provider.
+        model : str
+            The model name.
+        config : dict
+            The generation config of the request.
+        prompt : str
+            The full prompt.
+        response : dict
+            The parsed response.
+        context : str, optional
+            The instructions the prompt starts with, used by `invalidate`, by default None.
+        """
+        key = self.key(provider, model, config, prompt)
+        context_hash = hash_text(context) if context is not None else None
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, context, response, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, context_hash, json.dumps(response), time.time()),
+            )
+
+    def delete(self, provider: str, model: str, config: dict, prompt: str) -> bool:
+        """
+        Delete the response of a request, e.g. one that left out some of the submitted papers.
+
+        Parameters
+        ----------
+        provider : str
+            The LLM provider.
+        model : str
+            The model name.
+        config : dict
+            The generation config of the request.
+        prompt : str
+            The full prompt.
+
+        Returns
+        -------
+        bool
+            Whether the request had a response in the cache.
+        """
+        key = self.key(provider, model, config, prompt)
+        with self._lock, self._connection:
+            return self._connection.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount > 0
+
+    def evict(self, max_age: float | None = None) -> int:
+        """
+        Delete the entries older than `max_age` seconds.
+
+        Parameters
+        ----------
+        max_age : float, optional
+            The maximum age of the entries kept, by default the TTL of the cache.
+
+        Returns
+        -------
+        int
+            The number of deleted entries.
+
+        Raises
+        ------
+        ValueError
+            If neither `max_age` nor the TTL of the cache is set.
+        """
+        max_age = max_age if max_age is not None else self.ttl
+        if max_age is None:
+            raise ValueError("Either max_age or the TTL of the cache must be set")
+
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - max_age,)
+            ).rowcount
+
+    def invalidate(self, context: str | None = None, provider: str | None = None, model: str | None = None) -> int:
+        """
+        Delete the entries of outdated instructions, or of a provider or model.
+
+        Parameters
+        ----------
+        context : str, optional
+            The current instructions. Entries recorded with other instructions are deleted.
+        provider : str, optional
+            The provider whose entries are deleted.
+        model : str, optional
+            The model whose entries are deleted.
+
+        Returns
+        -------
+        int
+            The number of deleted entries. Without any argument, all the entries are deleted.
+        """
+        conditions, parameters = [], []
+        if context is not None:
+            conditions.append("context IS NOT NULL AND context != ?")
+            parameters.append(hash_text(context))
+        if provider is not None:
+            conditions.append("provider = ?")
+            parameters.append(provider)
+        if model is not None:
+            conditions.append("model = ?")
+            parameters.append(model)
+        where = " AND ".join(f"({condition})" for condition in conditions) or "1"
+
+        with self._lock, self._connection:
+            return self._connection.execute(f"DELETE FROM responses WHERE {where}", parameters).rowcount
+
+    def stats(self) -> dict:
+        """
+        Returns the hits and misses of this session and the number of stored entries.
+
+        Returns
+        -------
+        dict
+            The "hits", "misses", "hit_rate" and "entries" of the cache.
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        """Close the connection to the database."""
+        self._connection.close()
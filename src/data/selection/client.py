@@ -0,0 +1,196 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator
+from itertools import islice
+import random
+
+from src.data.selection.llm import arecover_batch
+from src.data.selection.rate_limit import RateLimiter, is_rate_limit_error
+from src.data.utils import estimate_tokens
+
+
+class AsyncScreeningClient:
+    """
+    Asynchronous client sending screening queries to an LLM within the rate limits of the provider.
+
+    All the queries share a `RateLimiter`, so the requests are spread evenly over time instead of being sent in bursts
+    until the provider rejects them. Queries answered by `cached_fn` are returned right away, without waiting for the
+    limiter or taking a request slot. The number of requests waiting for a response is capped by `max_in_flight`. When
+    a request is rejected anyway (HTTP 429), the limiter is emptied and the request is retried with an exponential
+    backoff.
+
+    Parameters
+    ----------
+    query_fn : Callable[[str], Awaitable[dict]]
+        The coroutine function sending a query and returning the parsed response, e.g. `LLMBackend.aquery`.
+    limiter : RateLimiter
+        The rate limiter of the provider.
+    max_in_flight : int, optional
+        The maximum number of requests waiting for a response, by default 8.
+    count_tokens : Callable[[str], int], optional
+        The function counting the input tokens of a query, by default `src.data.utils.estimate_tokens`.
+    expected_output_tokens : int, optional
+        The number of output tokens expected per query, counted against the tokens per minute, by default 64.
+    max_retries : int, optional
+        The maximum number of retries of a rate-limited query, by default 5.
+    retry_delay : float, optional
+        The delay in seconds before the first retry, doubled on each retry, by default 1.
+    cached_fn : Callable[[str], dict | None], optional
+        The function returning the cached response to a query or None, e.g. `LLMBackend.cached`, by default None.
+    discard_fn : Callable[[str], None], optional
+        The function dropping the cached response to a batched query that left out papers, e.g.
+        `LLMBackend.discard`, by default None.
+    """
+
+    def __init__(
+        self,
+        query_fn: Callable[[str], Awaitable[dict]],
+        limiter: RateLimiter,
+        max_in_flight: int = 8,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+        expected_output_tokens: int = 64,
+        max_retries: int = 5,
+        retry_delay: float = 1,
+        cached_fn: Callable[[str], dict | None] | None = None,
+        discard_fn: Callable[[str], None] | None = None,
+    ):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.query_fn = query_fn
+        self.limiter = limiter
+        self.max_in_flight = max_in_flight
+        self.count_tokens = count_tokens
+        self.expected_output_tokens = expected_output_tokens
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.cached_fn = cached_fn
+        self.discard_fn = discard_fn
+        self._in_flight = None
+        self._loop = None
+
+    async def query(self, query: str) -> dict:
+        """
+        Send a query once the rate limits allow it, unless its response is cached.
+
+        Parameters
+        ----------
+        query : str
+            The query message.
+
+        Returns
+        -------
+        dict
+            The parsed response.
+
+        Raises
+        ------
+        Exception
+            The error of the last attempt if the query is still rate-limited after `max_retries` retries, or any other
+            error raised by `query_fn`.
+        """
+        if self.cached_fn is not None and (response := self.cached_fn(query)) is not None:
+            return response
+
+        # Semaphores are bound to the event loop they are first used in, and the client may outlive a loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._in_flight, self._loop = asyncio.Semaphore(self.max_in_flight), loop
+
+        tokens = self.count_tokens(query) + self.expected_output_tokens
+        async with self._in_flight:
+            for attempt in range(self.max_retries + 1):
+                await self.limiter.acquire(tokens)
+                try:
+                    return await self.query_fn(query)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == self.max_retries:
+                        raise
+                    self.limiter.backoff()
+                    # The jitter keeps the rejected requests from being retried all at once
+                    await asyncio.sleep(self.retry_delay * 2**attempt * random.uniform(1, 1.5))
+
+    async def query_batch(self, query: str) -> dict:
+        """
+        Send a batched query and query again only the papers missing from the response, see `recover_batch`.
+
+        Each follow-up query waits for the rate limits like any other query.
+
+        Parameters
+        ----------
+        query : str
+            The batched query message.
+
+        Returns
+        -------
+        dict
+            The ratings by submitted title. Papers still without valid ratings after the follow-up queries are left out.
+        """
+        results, _ = await arecover_batch(self.query, query, discard=self.discard_fn)
+        return results
+
+    async def stream(self, queries: Iterable[str], batched: bool = False) -> AsyncIterator[dict]:
+        """
+        Send the queries concurrently and yield the responses as they arrive.
+
+        The queries are drawn lazily from `queries`, at most `max_in_flight` at a time, so a generator of queries is
+        never materialized and only the queries in flight are held in memory.
+
+        Parameters
+        ----------
+        queries : Iterable[str]
+            The query messages.
+        batched : bool, optional
+            Whether the queries hold several papers and are sent with `query_batch`, by default False.
+
+        Yields
+        ------
+        dict
+            The parsed responses, in completion order.
+        """
+        query_fn = self.query_batch if batched else self.query
+        queries = iter(queries)
+        tasks = set()
+        try:
+            while True:
+                tasks.update(
+                    asyncio.ensure_future(query_fn(query)) for query in islice(queries, self.max_in_flight - len(tasks))
+                )
+                if not tasks:
+                    break
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def iter_results(self, queries: Iterable[str], batched: bool = False) -> Iterator[dict]:
+        """
+        Send the queries concurrently from synchronous code and yield the responses as they arrive.
+
+        The event loop only runs while the next response is awaited, which is enough to keep the requests going as
+        long as the responses are consumed promptly.
+
+        Parameters
+        ----------
+        queries : Iterable[str]
+            The query messages.
+        batched : bool, optional
+            Whether the queries hold several papers and are sent with `query_batch`, by default False.
+
+        Yields
+        ------
+        dict
+            The parsed responses, in completion order.
+        """
+        loop = asyncio.new_event_loop()
+        results = self.stream(queries, batched)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(anext(results))
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.close()
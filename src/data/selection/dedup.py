@@ -0,0 +1,103 @@
+import polars as pl
+
+from src.data.dedup import abstract_shingles, find_duplicates, jaccard, title_tokens
+from src.data.selection.llm import SCORES_SCHEMA
+
+
+def cluster_duplicates(papers: pl.DataFrame, **match_kwargs) -> pl.DataFrame:
+    """
+    Cluster the duplicate and near-duplicate papers, e.g. the pre-print and published versions of a paper.
+
+    The papers are matched with `src.data.dedup.find_duplicates`, the engine that drops the duplicate records when the
+    corpus is downloaded, so the same rules apply to a corpus downloaded before it existed. The first paper of each
+    cluster, in the order of `papers`, is its representative.
+
+    Parameters
+    ----------
+    papers : pl.DataFrame
+        The papers, with unique 'Title' and an 'Abstract', and optionally 'DOI' and 'Author full names'.
+    **match_kwargs
+        The thresholds of `find_duplicates`, e.g. `title_threshold`.
+
+    Returns
+    -------
+    pl.DataFrame
+        The "Title" of each paper, with the "Representative" title of its cluster and the "Title Similarity" and
+        "Abstract Similarity" to it (1 for the representatives, null when an abstract is missing).
+
+    Raises
+    ------
+    ValueError
+        If the titles are not unique.
+    """
+    if papers.get_column("Title").n_unique() != papers.height:
+        raise ValueError("The titles of the papers must be unique")
+
+    clusters, _ = find_duplicates(papers, **match_kwargs)
+    titles = papers.get_column("Title").to_list()
+    title_words = [title_tokens(title) for title in titles]
+    abstracts = [abstract_shingles(abstract) for abstract in papers.get_column("Abstract").to_list()]
+    roots = clusters.get_column("Cluster").to_list()
+    return pl.DataFrame(
+        {
+            "Title": titles,
+            "Representative": [titles[root] for root in roots],
+            "Title Similarity": [
+                jaccard(title_words[i], title_words[root]) if i != root else 1.0 for i, root in enumerate(roots)
+            ],
+            "Abstract Similarity": [
+                (jaccard(abstracts[i], abstracts[root]) if abstracts[i] and abstracts[root] else None)
+                if i != root
+                else 1.0
+                for i, root in enumerate(roots)
+            ],
+        },
+        schema={
+            "Title": pl.String,
+            "Representative": pl.String,
+            "Title Similarity": pl.Float64,
+            "Abstract Similarity": pl.Float64,
+        },
+    )
+
+
+def representatives(papers: pl.DataFrame, clusters: pl.DataFrame) -> pl.DataFrame:
+    """
+    Returns the representative papers of the clusters, to screen one paper per cluster.
+
+    Parameters
+    ----------
+    papers : pl.DataFrame
+        The papers.
+    clusters : pl.DataFrame
+        The clusters of the papers, see `cluster_duplicates`.
+
+    Returns
+    -------
+    pl.DataFrame
+        The papers that represent their cluster, in their original order.
+    """
+    return papers.filter(pl.col("Title").is_in(clusters.get_column("Representative").unique()))
+
+
+def propagate_scores(scores: pl.DataFrame, clusters: pl.DataFrame) -> pl.DataFrame:
+    """
+    Copy the scores of the representative of each cluster to the other papers of the cluster.
+
+    Parameters
+    ----------
+    scores : pl.DataFrame
+        The scores of the representatives, with the "Title" and the ratings of each inclusion criterion.
+    clusters : pl.DataFrame
+        The clusters of the papers, see `cluster_duplicates`.
+
+    Returns
+    -------
+    pl.DataFrame
+        The scores of every paper whose representative was scored, in the order of `clusters`.
+    """
+    return (
+        clusters.select("Title", "Representative")
+        .join(scores.rename({"Title": "Representative"}), on="Representative", how="inner", maintain_order="left")
+        .select(SCORES_SCHEMA.keys())
+    )
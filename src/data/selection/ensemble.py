@@ -0,0 +1,176 @@
+import polars as pl
+
+from src.data.selection.backends import LLMBackend
+from src.data.selection.llm import (
+    INCLUSION_CRITERIA,
+    SCORES_SCHEMA,
+    LikertScale,
+    combine_llm_scores,
+)
+from src.data.selection.select_papers import make_queries
+
+
+def clear_decision(margin: int = 0) -> pl.Expr:
+    """
+    Returns the expression of the clear inclusion decision of a paper, following the thresholds of `assign_inclusion`.
+
+    A paper is clearly excluded ("n") when one of its ratings is below `NEITHER_AGREE_NOR_DISAGREE - margin`, and
+    clearly included ("y") when all its ratings are above `NEITHER_AGREE_NOR_DISAGREE + margin`. Otherwise, the
+    decision is null.
+
+    Parameters
+    ----------
+    margin : int, optional
+        The distance to `NEITHER_AGREE_NOR_DISAGREE` below or above which a rating is clear, by default 0.
+
+    Returns
+    -------
+    pl.Expr
+        The decision, "y", "n" or null.
+    """
+    lowest = pl.min_horizontal(INCLUSION_CRITERIA)
+    return (
+        pl.when(lowest < LikertScale.NEITHER_AGREE_NOR_DISAGREE - margin)
+        .then(pl.lit("n"))
+        .when(lowest > LikertScale.NEITHER_AGREE_NOR_DISAGREE + margin)
+        .then(pl.lit("y"))
+        .otherwise(pl.lit(None, dtype=pl.String))
+    )
+
+
+def backend_name(backend: LLMBackend) -> str:
+    """Returns the name of the provider and model of a backend, e.g. "gemini:gemini-2.0-flash-exp"."""
+    return f"{backend.provider}:{backend.model}"
+
+
+def screen_scores(backend: LLMBackend, papers: pl.DataFrame, **query_kwargs) -> pl.DataFrame:
+    """
+    Screen the papers with a backend and return the valid ratings of the submitted papers.
+
+    Parameters
+    ----------
+    backend : LLMBackend
+        The LLM backend.
+    papers : pl.DataFrame
+        The papers to screen.
+    **query_kwargs
+        The keyword arguments of `make_queries`, e.g. `max_in_flight`.
+
+    Returns
+    -------
+    pl.DataFrame
+        The "Title" and the ratings of each inclusion criterion of the papers with valid ratings.
+    """
+    # The results are keyed by the submitted titles, see `make_queries`, so altered titles are not dropped here
+    rows = [
+        [title, *ratings]
+        for result in make_queries(backend, papers, **query_kwargs)
+        for title, ratings in result.items()
+    ]
+    return pl.DataFrame(rows, schema=SCORES_SCHEMA, orient="row").unique("Title", keep="last", maintain_order=True)
+
+
+def screen_with_ensemble(
+    backends: list[LLMBackend],
+    papers: pl.DataFrame,
+    margin: int = 0,
+    min_votes: int = 2,
+    **query_kwargs,
+) -> tuple[pl.DataFrame, dict]:
+    """
+    Screen the papers with several LLMs, querying the next LLM only for the papers the previous ones left ambiguous.
+
+    The backends are queried in order, so the cheapest should come first. A paper is settled as soon as at least
+    `min_votes` LLMs scored it and all of them reached the same clear decision, see `clear_decision`. By default, two
+    LLMs must agree, so no single model settles a paper and calls are saved from the third backend on. With
+    `min_votes=1`, the first LLM that is clear about a paper settles it. Only the other papers, i.e. those with ratings
+    close to `NEITHER_AGREE_NOR_DISAGREE`, disagreements and papers without valid ratings, are sent to the next
+    backend. Compared to scoring every paper with every LLM before combining the scores
+    with `combine_llm_scores`, this saves the calls for the settled papers.
+
+    Parameters
+    ----------
+    backends : list[LLMBackend]
+        The LLM backends, in the order in which they are queried.
+    papers : pl.DataFrame
+        The papers to screen, with the columns 'Title', 'Abstract', and 'Author Keywords'.
+    margin : int, optional
+        The distance to `NEITHER_AGREE_NOR_DISAGREE` below or above which a rating is clear, by default 0 for the
+        thresholds of `assign_inclusion`.
+    min_votes : int, optional
+        The number of LLMs that must agree to settle a paper, by default 2.
+    **query_kwargs
+        The keyword arguments of `make_queries`, e.g. `max_in_flight`.
+
+    Returns
+    -------
+    tuple[pl.DataFrame, dict]
+        The scores of the papers combined with `combine_llm_scores`, with the number of LLMs that scored each paper in
+        "Models" and the agreed decision in "Decision" (null if the LLMs did not settle the paper), and a report of the
+        papers sent to each backend and the calls it made to its model, in order, including the follow-up queries and
+        excluding the responses read from a cache, compared to one call per paper and backend for the full ensemble.
+
+    Raises
+    ------
+    ValueError
+        If there are no backends or `min_votes` is not between 1 and the number of backends.
+    """
+    if not backends:
+        raise ValueError("At least one backend must be provided")
+    if not 1 <= min_votes <= len(backends):
+        raise ValueError(f"min_votes must be between 1 and the number of backends ({len(backends)})")
+
+    pending = papers
+    model_scores = []
+    settled = pl.DataFrame(schema={"Title": pl.String, "Decision": pl.String})
+    calls = []
+    for backend in backends:
+        # Each query answered by the model records its latency, unlike the responses read from a cache
+        sent_calls = len(backend.latencies)
+        if not pending.is_empty():
+            model_scores.append(
+                screen_scores(backend, pending, **query_kwargs).with_columns(
+                    pl.lit(backend_name(backend)).alias("Model")
+                )
+            )
+        calls.append(
+            {"model": backend_name(backend), "papers": pending.height, "calls": len(backend.latencies) - sent_calls}
+        )
+        if not model_scores:
+            continue
+
+        newly_settled = (
+            pl.concat(model_scores)
+            .filter(pl.col("Title").is_in(pending.get_column("Title")))
+            .with_columns(clear_decision(margin).alias("Decision"))
+            .group_by("Title", maintain_order=True)
+            .agg(
+                pl.len().alias("votes"),
+                pl.col("Decision").null_count().alias("unclear"),
+                pl.col("Decision").n_unique().alias("decisions"),
+                pl.col("Decision").first(),
+            )
+            .filter((pl.col("votes") >= min_votes) & (pl.col("unclear") == 0) & (pl.col("decisions") == 1))
+            .select("Title", "Decision")
+        )
+        settled = pl.concat([settled, newly_settled])
+        pending = pending.filter(~pl.col("Title").is_in(newly_settled.get_column("Title")))
+
+    all_scores = pl.concat(model_scores) if model_scores else pl.DataFrame(schema=SCORES_SCHEMA | {"Model": pl.String})
+    scores = (
+        combine_llm_scores([all_scores.drop("Model")])
+        .join(all_scores.group_by("Title").agg(pl.len().alias("Models")), on="Title")
+        .join(settled, on="Title", how="left")
+    )
+
+    total_calls = sum(model_calls["calls"] for model_calls in calls)
+    full_calls = papers.height * len(backends)
+    report = {
+        "papers": papers.height,
+        "settled": settled.height,
+        "calls": calls,
+        "total_calls": total_calls,
+        "full_ensemble_calls": full_calls,
+        "calls_saved": full_calls - total_calls,
+    }
+    return scores, report
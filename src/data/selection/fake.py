@@ -0,0 +1,267 @@
+import asyncio
+from collections import Counter
+from collections.abc import Callable
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from src.data.selection.llm import QUERY_CONTEXT
+from src.data.utils import estimate_tokens
+
+TITLE_PATTERN = re.compile(r"<BOI>\s*Title: (.*?)\s*\n")
+
+
+class FakeAPIError(Exception):
+    """Error raised by the fake client, with the HTTP status code in its message like the provider SDKs."""
+
+    def __init__(self, code: int, message: str):
+        self.code = code
+        super().__init__(f"{code} {message}")
+
+
+def fake_ratings(title: str) -> list[int]:
+    """
+    Returns the deterministic ratings of a paper in the fake responses, derived from a hash of its title.
+
+    Parameters
+    ----------
+    title : str
+        The title of the paper.
+
+    Returns
+    -------
+    list[int]
+        The five ratings, between 1 and 7.
+    """
+    digest = hashlib.sha256(title.encode()).digest()
+    return [1 + byte % 7 for byte in digest[:5]]
+
+
+class FakeGeminiClient:
+    """
+    Offline stand-in for `google.genai.Client` covering the calls used in the screening pipeline.
+
+    It answers `models.generate_content` with the ratings of each `<BOI>` paper block in the prompt, see
+    `fake_ratings`, and supports context caches through `caches.create` and the `cached_content` config. Both APIs are
+    also available under `aio`. Bulk jobs are supported through `files.upload`, `batches.create`, `batches.get` and
+    `files.download`, the jobs completing `batch_latency` seconds of the clock after their creation. Everything sent
+    to the fake is recorded in `transmitted`, so that tests can check how often the instructions are uploaded.
+
+    The fake can also simulate the latency of the provider, rate-limit errors (HTTP 429), malformed JSON responses and
+    the flaws of batched responses: papers left out, and mangled titles or ratings.
+    Whether an attempt fails and how long it takes only depend on the seed, the prompt and the number of previous
+    attempts with the same prompt, so runs are reproducible regardless of the order in which concurrent requests
+    arrive.
+
+    Parameters
+    ----------
+    clock : Callable[[], float], optional
+        The clock used to expire the context caches, by default `time.time`.
+    latency : float, optional
+        The median latency of a request in seconds, by default 0. Latencies follow a log-normal distribution.
+    latency_sigma : float, optional
+        The standard deviation of the logarithm of the latency, controlling the tail, by default 0.5.
+    rate_limit_probability : float, optional
+        The probability that an attempt is rejected with a rate-limit error, by default 0.
+    malformed_probability : float, optional
+        The probability that an attempt returns truncated JSON, by default 0.
+    omit_probability : float, optional
+        The probability that a paper is left out of a response, by default 0.
+    mangle_probability : float, optional
+        The probability that the title of a paper is changed in a response, or that it gets the wrong number of
+        ratings, by default 0.
+    batch_latency : float, optional
+        The number of seconds a batch job runs, by default 0.
+    seed : int, optional
+        The seed of the simulated latencies and failures, by default 0.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.time,
+        latency: float = 0,
+        latency_sigma: float = 0.5,
+        rate_limit_probability: float = 0,
+        malformed_probability: float = 0,
+        omit_probability: float = 0,
+        mangle_probability: float = 0,
+        batch_latency: float = 0,
+        seed: int = 0,
+    ):
+        self.clock = clock
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.rate_limit_probability = rate_limit_probability
+        self.malformed_probability = malformed_probability
+        self.omit_probability = omit_probability
+        self.mangle_probability = mangle_probability
+        self.batch_latency = batch_latency
+        self.seed = seed
+        self.attempts = Counter()
+        self.transmitted = []
+        self.cached_contents = {}
+        self.requests = 0
+        self.uploaded_files = {}
+        self.batch_jobs = {}
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        self.caches = SimpleNamespace(create=self._create_cache)
+        self.files = SimpleNamespace(upload=self._upload_file, download=self._download_file)
+        self.batches = SimpleNamespace(create=self._create_batch, get=self._get_batch)
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self._agenerate_content),
+            caches=SimpleNamespace(create=self._acreate_cache),
+        )
+
+    def count_transmissions(self, text: str = QUERY_CONTEXT) -> int:
+        """
+        Returns how many times a text was sent to the fake, either in a prompt or in a context cache.
+
+        Parameters
+        ----------
+        text : str, optional
+            The text to count, by default QUERY_CONTEXT.
+
+        Returns
+        -------
+        int
+            The number of transmissions containing the text.
+        """
+        return sum(text in transmitted for transmitted in self.transmitted)
+
+    @staticmethod
+    def _text(contents) -> str:
+        if isinstance(contents, str):
+            return contents
+        return "".join(part["text"] for content in contents for part in content["parts"])
+
+    def _create_cache(self, model: str, config: dict) -> SimpleNamespace:
+        text = self._text(config["contents"])
+        self.transmitted.append(text)
+
+        name = f"cachedContents/{len(self.cached_contents)}"
+        ttl = float(config.get("ttl", "3600s").removesuffix("s"))
+        self.cached_contents[name] = (text, self.clock() + ttl)
+        return SimpleNamespace(name=name, model=model, display_name=config.get("display_name"))
+
+    def _simulate(self, text: str) -> tuple[float, bool, bool, random.Random]:
+        # Draw the latency and failures of the attempt from its own random generator, seeded by the prompt
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        self.attempts[digest] += 1
+        rng = random.Random(f"{self.seed}-{digest}-{self.attempts[digest]}")
+
+        latency = self.latency * math.exp(rng.gauss(0, self.latency_sigma)) if self.latency > 0 else 0
+        rate_limited = rng.random() < self.rate_limit_probability
+        malformed = rng.random() < self.malformed_probability
+        return latency, rate_limited, malformed, rng
+
+    def _ratings(self, papers: str, rng: random.Random) -> dict[str, list[int]]:
+        ratings = {}
+        for title in TITLE_PATTERN.findall(papers):
+            if rng.random() < self.omit_probability:
+                continue
+            returned_title, paper_ratings = title, fake_ratings(title)
+            if rng.random() < self.mangle_probability:
+                flaw = rng.randrange(3)
+                if flaw == 0:
+                    returned_title = title.upper()
+                elif flaw == 1:
+                    i = rng.randrange(len(title))
+                    returned_title = title[:i] + title[i + 1 :]
+                else:
+                    paper_ratings = paper_ratings[:-1]
+            ratings[returned_title] = paper_ratings
+        return ratings
+
+    def _generate_content(
+        self,
+        model: str,
+        contents,
+        config: dict | None = None,
+        simulation: tuple[float, bool, bool, random.Random] | None = None,
+    ) -> SimpleNamespace:
+        config = config or {}
+        text = self._text(contents)
+        latency, rate_limited, malformed, rng = simulation or self._simulate(text)
+        if simulation is None and latency > 0:
+            time.sleep(latency)
+
+        self.transmitted.append(text)
+        self.requests += 1
+        if rate_limited:
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED: Resource has been exhausted (e.g. check quota).")
+
+        cached_text = ""
+        if config.get("cached_content") is not None:
+            cached_text, expires_at = self.cached_contents.get(config["cached_content"], (None, float("-inf")))
+            if cached_text is None or self.clock() >= expires_at:
+                raise FakeAPIError(404, f"CachedContent not found (or expired): {config['cached_content']}")
+
+        prompt = cached_text + text
+        papers = prompt.removeprefix(QUERY_CONTEXT)
+        response = json.dumps(self._ratings(papers, rng))
+        if malformed:
+            response = response[: len(response) // 2]
+
+        return SimpleNamespace(
+            text=response,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=estimate_tokens(prompt),
+                cached_content_token_count=estimate_tokens(cached_text) if cached_text else None,
+                candidates_token_count=estimate_tokens(response),
+            ),
+        )
+
+    def _upload_file(self, file: str | os.PathLike[str], config: dict | None = None) -> SimpleNamespace:
+        name = f"files/{len(self.uploaded_files)}"
+        self.uploaded_files[name] = Path(file).read_bytes()
+        return SimpleNamespace(name=name, display_name=(config or {}).get("display_name"))
+
+    def _download_file(self, file: str) -> bytes:
+        return self.uploaded_files[file]
+
+    def _create_batch(self, model: str, src: str, config: dict | None = None) -> SimpleNamespace:
+        # Batch requests are neither delayed nor rate-limited individually, but their responses can still be flawed
+        lines = []
+        for line in self.uploaded_files[src].decode().splitlines():
+            entry = json.loads(line)
+            contents, request_config = entry["request"]["contents"], entry["request"].get("generation_config")
+            _, _, malformed, rng = self._simulate(self._text(contents))
+            response = self._generate_content(model, contents, request_config, (0, False, malformed, rng))
+            candidate = {"content": {"role": "model", "parts": [{"text": response.text}]}, "finishReason": "STOP"}
+            lines.append(json.dumps({"key": entry["key"], "response": {"candidates": [candidate]}}))
+
+        name = f"batches/{len(self.batch_jobs)}"
+        output = f"files/batch-{len(self.batch_jobs)}-output"
+        self.uploaded_files[output] = "\n".join(lines).encode()
+        self.batch_jobs[name] = (
+            SimpleNamespace(
+                name=name,
+                display_name=(config or {}).get("display_name"),
+                model=model,
+                state=SimpleNamespace(name="JOB_STATE_RUNNING"),
+                dest=SimpleNamespace(file_name=output),
+            ),
+            self.clock() + self.batch_latency,
+        )
+        return self.batch_jobs[name][0]
+
+    def _get_batch(self, name: str) -> SimpleNamespace:
+        job, completes_at = self.batch_jobs[name]
+        if self.clock() >= completes_at:
+            job.state = SimpleNamespace(name="JOB_STATE_SUCCEEDED")
+        return job
+
+    async def _acreate_cache(self, model: str, config: dict) -> SimpleNamespace:
+        return self._create_cache(model, config)
+
+    async def _agenerate_content(self, model: str, contents, config: dict | None = None) -> SimpleNamespace:
+        simulation = self._simulate(self._text(contents))
+        if simulation[0] > 0:
+            await asyncio.sleep(simulation[0])
+        return self._generate_content(model, contents, config, simulation)
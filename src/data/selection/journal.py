@@ -0,0 +1,178 @@
+import json
+import os
+from pathlib import Path
+import time
+
+import polars as pl
+
+from src.data.selection.cache import hash_text
+from src.data.selection.llm import INCLUSION_CRITERIA, SCORES_SCHEMA, parse_ratings
+
+JOURNAL_FILE = "journal.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+
+class ScreeningJournal:
+    """
+    Durable record of a screening run, so that the run can be resumed after a crash or quota exhaustion.
+
+    Each scored paper is appended to a JSON lines journal as soon as its response arrives and flushed to disk, so at
+    most the responses in flight are lost. A line torn by a crash while it was being written is dropped when the
+    journal is opened again. The manifest records the provider, model and instructions of the run. Resuming it with
+    other ones raises an error rather than mixing their scores.
+
+    Parameters
+    ----------
+    run_dir : str | os.PathLike[str]
+        The directory of the run, created if it does not exist.
+    provider : str
+        The LLM provider, e.g. "gemini".
+    model : str
+        The model name.
+    context : str
+        The instructions the queries start with, e.g. `QUERY_CONTEXT`.
+    fsync : bool, optional
+        Whether to wait for each append to reach the disk, by default True.
+
+    Raises
+    ------
+    ValueError
+        If the run directory holds a run with another provider, model or instructions.
+    """
+
+    def __init__(self, run_dir: str | os.PathLike[str], provider: str, model: str, context: str, fsync: bool = True):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.run_dir / JOURNAL_FILE
+        self.manifest_path = self.run_dir / MANIFEST_FILE
+        self.fsync = fsync
+
+        run = {"provider": provider, "model": model, "context": hash_text(context)}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text())
+            for key, value in run.items():
+                if self.manifest[key] != value:
+                    raise ValueError(
+                        f"The run in {self.run_dir} was started with another {key}, use a new run directory or start "
+                        "it over"
+                    )
+            self.manifest["status"] = "running"
+        else:
+            self.manifest = run | {"created_at": time.time(), "status": "running"}
+        self._save_manifest()
+
+        self._repair()
+        self.scored = self._read_titles()
+
+    def _save_manifest(self):
+        self.manifest["updated_at"] = time.time()
+        self.manifest_path.write_text(json.dumps(self.manifest, indent=2))
+
+    def _repair(self):
+        # Drop the last line if the run crashed while writing it
+        if not self.path.exists():
+            return
+        content = self.path.read_bytes()
+        if content and not content.endswith(b"\n"):
+            with open(self.path, "r+b") as f:
+                f.truncate(content.rfind(b"\n") + 1)
+
+    def _read_titles(self) -> set[str]:
+        if not self.path.exists():
+            return set()
+        with open(self.path, encoding="utf8") as f:
+            return {json.loads(line)["Title"] for line in f}
+
+    def pending(self, papers: pl.DataFrame) -> pl.DataFrame:
+        """
+        Returns the papers that have not been scored in the run yet.
+
+        Parameters
+        ----------
+        papers : pl.DataFrame
+            The papers to screen, with a "Title" column.
+
+        Returns
+        -------
+        pl.DataFrame
+            The papers whose title is not in the journal.
+        """
+        return papers.filter(~pl.col("Title").is_in(list(self.scored)))
+
+    def append(self, result: dict) -> int:
+        """
+        Record the ratings of a response.
+
+        Entries without valid ratings, see `parse_ratings`, are not recorded, so the paper is queried again when
+        the run is resumed.
+
+        Parameters
+        ----------
+        result : dict
+            The response, mapping the title of each paper to its ratings.
+
+        Returns
+        -------
+        int
+            The number of recorded papers.
+        """
+        parsed = {title: parse_ratings(ratings) for title, ratings in result.items()}
+        valid = {title: ratings for title, ratings in parsed.items() if ratings is not None}
+        entries = [
+            {"Title": title} | dict(zip(INCLUSION_CRITERIA, ratings, strict=True)) for title, ratings in valid.items()
+        ]
+        with open(self.path, "a", encoding="utf8") as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+        self.scored.update(valid)
+        return len(valid)
+
+    def read(self) -> pl.DataFrame:
+        """
+        Returns the scores recorded in the journal, keeping the last ones of papers scored several times.
+
+        Returns
+        -------
+        pl.DataFrame
+            The "Title" and the ratings of each inclusion criterion of the scored papers.
+        """
+        if not self.scored:
+            return pl.DataFrame(schema=SCORES_SCHEMA)
+        return pl.read_ndjson(self.path, schema=SCORES_SCHEMA).unique("Title", keep="last", maintain_order=True)
+
+    def compact(self, output_path: str | os.PathLike[str]) -> pl.DataFrame:
+        """
+        Write the scores recorded in the journal to a parquet file and mark the run as compacted in the manifest.
+
+        The journal is kept, so the run can still be resumed to score the papers it misses.
+
+        Parameters
+        ----------
+        output_path : str | os.PathLike[str]
+            The path of the parquet file.
+
+        Returns
+        -------
+        pl.DataFrame
+            The scores, see `read`.
+        """
+        scores = self.read()
+        scores.write_parquet(output_path)
+
+        self.manifest |= {"status": "compacted", "scores": str(output_path), "papers": scores.height}
+        self._save_manifest()
+        return scores
+
+    def close(self):
+        """Record the number of scored papers in the manifest."""
+        self.manifest["scored"] = len(self.scored)
+        self._save_manifest()
+
+    def __enter__(self) -> "ScreeningJournal":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
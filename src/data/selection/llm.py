@@ -1,15 +1,28 @@
-from collections.abc import Generator
+import asyncio
+from collections.abc import Awaitable, Callable, Generator
+import difflib
 from enum import IntEnum
+from functools import partial
+from itertools import product
 import json
 import os
 from pathlib import Path
+import re
+import threading
 import time
+from typing import TypeVar
 
 import anthropic
 from google import genai
 import polars as pl
 
 from src.config import INTERIM_DATA_DIR
+from src.data.selection.cache import ResponseCache
+from src.data.selection.rate_limit import is_rate_limit_error
+from src.data.selection.usage import ModelPrice, UsageTracker, track
+from src.data.utils import estimate_tokens
+
+T = TypeVar("T")
 
 
 class LikertScale(IntEnum):
@@ -22,8 +35,44 @@ class LikertScale(IntEnum):
     STRONGLY_AGREE = 7
 
 
+# Inclusion criteria rated in each response, in the order of the ratings
+INCLUSION_CRITERIA = ["IC1", "IC2", "IC3", "IC4", "IC5"]
+
+SCORES_SCHEMA = {"Title": pl.String} | {criterion: pl.Int64 for criterion in INCLUSION_CRITERIA}
+
 GEMINI_MODEL = "gemini-2.0-flash-exp"
 
+# Free tier limits of the Gemini API for GEMINI_MODEL
+GEMINI_REQUESTS_PER_MINUTE = 10
+GEMINI_TOKENS_PER_MINUTE = 4_000_000
+
+CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+
+# Paid tier prices of the models, used to estimate the cost of a run. GEMINI_MODEL is billed like gemini-2.0-flash.
+MODEL_PRICES = {
+    GEMINI_MODEL: ModelPrice(input=0.10, cached_input=0.025, output=0.40),
+    CLAUDE_MODEL: ModelPrice(input=3.00, cached_input=0.30, output=15.00),
+}
+
+# Lifetime in seconds of the Gemini context cache holding QUERY_CONTEXT
+GEMINI_CACHE_TTL = 3600
+
+# Token budgets of a batched query. The output budget leaves a margin below max_output_tokens so that a batch whose
+# ratings are longer than expected is not truncated mid-JSON.
+MAX_BATCH_INPUT_TOKENS = 32_000
+MAX_BATCH_OUTPUT_TOKENS = 6_000
+
+# Minimum similarity for a title returned in a batched response to be matched to a submitted title
+TITLE_MATCH_CUTOFF = 0.85
+
+# Maximum number of follow-up queries for the papers missing from a batched response
+MAX_BATCH_FOLLOWUPS = 2
+
+# Seconds between two polls of a bulk batch job, and the longest a job may run (the providers complete jobs within
+# 24 hours)
+BATCH_POLL_INTERVAL = 60
+BATCH_TIMEOUT = 24 * 3600
+
 
 GEMINI_CONFIG = {
     "temperature": 0,
@@ -128,11 +177,263 @@ The list of papers you must process starts below. ENSURE YOU PROCESS ALL THE PAP
 """  # noqa: E501
 
 
-def gemini_query(client: genai.Client, query: str, json_file: str | os.PathLike[str] | None = None) -> dict:
+def retry_on_rate_limit(send: Callable[[], T], delay: float = 60) -> T:
+    """
+    Call a function sending a request to an LLM, waiting and retrying while the request is rate-limited.
+
+    Parameters
+    ----------
+    send : Callable[[], T]
+        The function sending the request.
+    delay : float, optional
+        The number of seconds to wait before retrying, by default 60.
+
+    Returns
+    -------
+    T
+        The return value of `send`.
+    """
+    while True:
+        try:
+            return send()
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise e
+            print(f"Requests per minute rate limit exceeded, waiting {delay:g} seconds to retry...")
+            time.sleep(delay)
+
+
+def claude_request(query: str) -> dict:
+    """
+    Returns the arguments of a Claude messages request for the query.
+
+    When the query starts with `QUERY_CONTEXT`, the instructions are sent as a system prompt marked for prompt caching,
+    so that they are only billed and processed in full once per cache window, and the paper blocks as the message.
+
+    Parameters
+    ----------
+    query : str
+        The query message.
+
+    Returns
+    -------
+    dict
+        The keyword arguments of `messages.create`.
+    """
+    context, papers = split_query(query)
+    request = {
+        "model": CLAUDE_MODEL,
+        "max_tokens": 8192,
+        "temperature": 0,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": papers,
+                    }
+                ],
+            }
+        ],
+    }
+    if context is not None:
+        request["system"] = [{"type": "text", "text": context, "cache_control": {"type": "ephemeral"}}]
+    return request
+
+
+def claude_config(request: dict) -> dict:
+    """Returns the generation config of a Claude request, i.e. the request without the model and prompt."""
+    return {key: value for key, value in request.items() if key not in ("model", "messages", "system")}
+
+
+def query_context(query: str) -> str | None:
+    """Returns `QUERY_CONTEXT` if the query starts with it, so that cached responses can be invalidated with it."""
+    return QUERY_CONTEXT if query.startswith(QUERY_CONTEXT) else None
+
+
+def split_query(query: str) -> tuple[str | None, str]:
+    """
+    Split a query into the shared `QUERY_CONTEXT` instructions and the paper blocks.
+
+    Parameters
+    ----------
+    query : str
+        The query message.
+
+    Returns
+    -------
+    tuple[str | None, str]
+        The instructions, or None if the query does not start with them, and the rest of the query.
+    """
+    context = query_context(query)
+    if context is None:
+        return None, query
+    return context, query[len(context) :].lstrip("\n")
+
+
+class GeminiPrefixCache:
+    """
+    Gemini context cache holding the `QUERY_CONTEXT` instructions shared by all the screening queries.
+
+    The instructions are uploaded once per cache window and the queries only send the paper blocks, referencing the
+    cached content. The cache is recreated shortly before it expires. If the model does not support context caching
+    (e.g. the instructions are below its minimum cacheable size), the queries fall back to sending the full prompt.
+
+    Parameters
+    ----------
+    client : genai.Client
+        The Gemini client.
+    context : str, optional
+        The instructions to cache, by default QUERY_CONTEXT.
+    model : str, optional
+        The model the cache is created for, by default GEMINI_MODEL.
+    ttl : int, optional
+        The lifetime of the cache in seconds, by default GEMINI_CACHE_TTL.
+    clock : Callable[[], float], optional
+        The clock used to track the expiration of the cache, by default `time.time`.
+    """
+
+    # Seconds before the expiration at which the cache is recreated, so that in-flight queries do not reference it
+    REFRESH_MARGIN = 60
+
+    def __init__(
+        self,
+        client: genai.Client,
+        context: str = QUERY_CONTEXT,
+        model: str = GEMINI_MODEL,
+        ttl: int = GEMINI_CACHE_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.client = client
+        self.context = context
+        self.model = model
+        self.ttl = ttl
+        self.clock = clock
+        self.name = None
+        self.expires_at = float("-inf")
+        self.disabled = False
+        self._lock = threading.Lock()
+        self._async_lock = None
+        self._loop = None
+
+    def _config(self) -> dict:
+        return {
+            "contents": [{"role": "user", "parts": [{"text": self.context}]}],
+            "ttl": f"{self.ttl}s",
+            "display_name": "screening-instructions",
+        }
+
+    def _needs_refresh(self) -> bool:
+        return not self.disabled and self.clock() >= self.expires_at - self.REFRESH_MARGIN
+
+    def _store(self, cached_content):
+        self.name = cached_content.name
+        self.expires_at = self.clock() + self.ttl
+
+    def _disable(self, e: Exception):
+        if is_rate_limit_error(e):
+            raise e
+        print(f"Context caching is not available, sending the full prompt instead: {e}")
+        self.disabled = True
+        self.name = None
+
+    def get(self) -> str | None:
+        """
+        Returns the name of the cached content, creating it if it does not exist or is about to expire.
+
+        Returns
+        -------
+        str | None
+            The name of the cached content, or None if context caching is not available.
+        """
+        with self._lock:
+            if self._needs_refresh():
+                try:
+                    self._store(self.client.caches.create(model=self.model, config=self._config()))
+                except Exception as e:
+                    self._disable(e)
+            return self.name
+
+    async def aget(self) -> str | None:
+        """
+        Returns the name of the cached content like `get`, creating it with the asynchronous client.
+
+        Returns
+        -------
+        str | None
+            The name of the cached content, or None if context caching is not available.
+        """
+        # Locks are bound to the event loop they are first used in, and the cache may outlive a loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._async_lock, self._loop = asyncio.Lock(), loop
+
+        async with self._async_lock:
+            if self._needs_refresh():
+                try:
+                    self._store(await self.client.aio.caches.create(model=self.model, config=self._config()))
+                except Exception as e:
+                    self._disable(e)
+            return self.name
+
+
+def gemini_request(query: str, cached_content: str | None = None) -> tuple[str, dict]:
+    """
+    Returns the contents and config of a Gemini request for the query.
+
+    Parameters
+    ----------
+    query : str
+        The query message.
+    cached_content : str, optional
+        The name of the cached content holding `QUERY_CONTEXT`, see `GeminiPrefixCache`, by default None.
+
+    Returns
+    -------
+    tuple[str, dict]
+        The contents and the config of the request. With cached content, the contents only hold the paper blocks.
+    """
+    context, papers = split_query(query)
+    if cached_content is None or context is None:
+        return query, GEMINI_CONFIG
+    return papers, GEMINI_CONFIG | {"cached_content": cached_content}
+
+
+def gemini_usage(response) -> tuple[int | None, int | None, int | None]:
+    """Returns the prompt, cached and output tokens reported in a Gemini response, None if not reported."""
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return None, None, None
+    return metadata.prompt_token_count, metadata.cached_content_token_count, metadata.candidates_token_count
+
+
+def claude_usage(message) -> tuple[int | None, int | None, int | None]:
+    """Returns the prompt, cached and output tokens reported in a Claude message, None if not reported."""
+    usage = getattr(message, "usage", None)
+    if usage is None:
+        return None, None, None
+    # The input tokens exclude the ones read from and written to the prompt cache
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_creation = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return usage.input_tokens + cache_read + cache_creation, cache_read, usage.output_tokens
+
+
+def gemini_query(
+    client: genai.Client,
+    query: str,
+    json_file: str | os.PathLike[str] | None = None,
+    cache: ResponseCache | None = None,
+    prefix_cache: GeminiPrefixCache | None = None,
+    usage: UsageTracker | None = None,
+) -> dict:
     """
     Query a Gemini model. If the query fails due to rate limiting, the function will wait 60 seconds before retrying.
 
-    When a json file is provided, the results are saved to the file.
+    When a json file is provided, the results are saved to the file. When a cache is provided, it is consulted before
+    querying the model and the response is stored in it. When a prefix cache is provided, `QUERY_CONTEXT` is
+    referenced from it instead of being sent with the query. When a usage tracker is provided, every attempt is
+    recorded in it.
 
     Parameters
     ----------
@@ -142,6 +443,12 @@ def gemini_query(client: genai.Client, query: str, json_file: str | os.PathLike[
         The query message.
     json_file : str, optional
         The path to a json file to save the results to, by default None.
+    cache : ResponseCache, optional
+        The cache of the responses, by default None.
+    prefix_cache : GeminiPrefixCache, optional
+        The context cache holding `QUERY_CONTEXT`, by default None.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
 
     Returns
     -------
@@ -149,19 +456,23 @@ def gemini_query(client: genai.Client, query: str, json_file: str | os.PathLike[
         The response from the Gemini model.
     """
 
-    query_completed = False
-    while not query_completed:
-        try:
-            response = client.models.generate_content(model=GEMINI_MODEL, contents=query, config=GEMINI_CONFIG)
-            query_completed = True
-        except Exception as e:
-            if "429" in str(e):
-                print("Requests per minute rate limit exceeded, waiting 60 seconds to retry...")
-                time.sleep(60)
-            else:
-                raise e
+    json_response = cache.get("gemini", GEMINI_MODEL, GEMINI_CONFIG, query) if cache is not None else None
+    if json_response is not None and usage is not None:
+        usage.cache_hit("gemini", GEMINI_MODEL)
 
-    json_response = json.loads(response.text)
+    if json_response is None:
+
+        def send():
+            contents, config = gemini_request(query, prefix_cache.get() if prefix_cache is not None else None)
+            with track(usage, "gemini", GEMINI_MODEL, query) as record:
+                response = client.models.generate_content(model=GEMINI_MODEL, contents=contents, config=config)
+                record.set_usage(*gemini_usage(response), response.text)
+            return response
+
+        response = retry_on_rate_limit(send)
+        json_response = json.loads(response.text)
+        if cache is not None:
+            cache.put("gemini", GEMINI_MODEL, GEMINI_CONFIG, query, json_response, context=query_context(query))
 
     if json_file:
         with open(json_file, "w") as f:
@@ -170,11 +481,19 @@ def gemini_query(client: genai.Client, query: str, json_file: str | os.PathLike[
     return json_response
 
 
-def gemini_batched_query(client: genai.Client, batch_number: int, query: str) -> pl.DataFrame:
+def gemini_batched_query(
+    client: genai.Client,
+    batch_number: int,
+    query: str,
+    cache: ResponseCache | None = None,
+    prefix_cache: GeminiPrefixCache | None = None,
+    usage: UsageTracker | None = None,
+) -> pl.DataFrame:
     """
     Query a Gemini model in batches.
 
-    The results are saved to a parquet file in the interim data directory.
+    The response is validated against the submitted papers and the papers missing from it are queried again, see
+    `recover_batch`. The results are saved to a parquet file in the interim data directory.
 
     Parameters
     ----------
@@ -184,27 +503,46 @@ def gemini_batched_query(client: genai.Client, batch_number: int, query: str) ->
         The batch number.
     query : str
         The query message.
+    cache : ResponseCache, optional
+        The cache of the responses, by default None.
+    prefix_cache : GeminiPrefixCache, optional
+        The context cache holding `QUERY_CONTEXT`, by default None.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
 
     Returns
     -------
     pl.DataFrame
         The results of the query in a polars DataFrame.
     """
-    results = gemini_query(client, query)
-    result_df = pl.from_dict(results).transpose(
-        include_header=True,
-        header_name="Title",
-        column_names=["IC1", "IC2", "IC3", "IC4", "IC5"],
+    results, missing = recover_batch(
+        partial(gemini_query, client, cache=cache, prefix_cache=prefix_cache, usage=usage),
+        query,
+        discard=partial(cache.delete, "gemini", GEMINI_MODEL, GEMINI_CONFIG) if cache is not None else None,
+    )
+    if missing:
+        print(f"Batch {batch_number}: no valid ratings for {len(missing)} papers: {missing}")
+
+    result_df = pl.DataFrame(
+        [[title, *ratings] for title, ratings in results.items()], schema=SCORES_SCHEMA, orient="row"
     )
     result_df.write_parquet(INTERIM_DATA_DIR / f"{GEMINI_MODEL}-batch-{batch_number}-results.parquet")
     return result_df
 
 
-def claude_query(client: anthropic.Anthropic, query: str, json_file: str | os.PathLike[str] | None = None) -> dict:
+def claude_query(
+    client: anthropic.Anthropic,
+    query: str,
+    json_file: str | os.PathLike[str] | None = None,
+    cache: ResponseCache | None = None,
+    usage: UsageTracker | None = None,
+) -> dict:
     """
     Query a Claude model. If the query fails due to rate limiting, the function will wait 60 seconds before retrying.
 
-    When a json file is provided, the results are saved to the file.
+    When a json file is provided, the results are saved to the file. When a cache is provided, it is consulted before
+    querying the model and the response is stored in it. When a usage tracker is provided, every attempt is recorded
+    in it.
 
     Parameters
     ----------
@@ -214,6 +552,10 @@ def claude_query(client: anthropic.Anthropic, query: str, json_file: str | os.Pa
         The query message.
     json_file : str, optional
         The path to a json file to save the results to, by default None.
+    cache : ResponseCache, optional
+        The cache of the responses, by default None.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
 
     Returns
     -------
@@ -221,36 +563,25 @@ def claude_query(client: anthropic.Anthropic, query: str, json_file: str | os.Pa
         The response from the Claude model.
     """
 
-    query_completed = False
+    request = claude_request(query)
+    config = claude_config(request)
+    json_response = cache.get("claude", CLAUDE_MODEL, config, query) if cache is not None else None
+    if json_response is not None and usage is not None:
+        usage.cache_hit("claude", CLAUDE_MODEL)
 
-    while not query_completed:
-        try:
-            message = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=8192,
-                temperature=0,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": query,
-                            }
-                        ],
-                    }
-                ],
-            )
-            json_response = message.to_json()
-            response = json.loads(json_response)["content"][0]["text"]
-            query_completed = True
-        except Exception as e:
-            if "429" in str(e):
-                print("Requests per minute rate limit exceeded, waiting 60 seconds to retry...")
-                time.sleep(60)
-            else:
-                raise e
-    json_response = json.loads(response)
+    if json_response is None:
+
+        def send():
+            with track(usage, "claude", CLAUDE_MODEL, query) as record:
+                message = client.messages.create(**request)
+                record.set_usage(*claude_usage(message), message.content[0].text)
+            return message
+
+        message = retry_on_rate_limit(send)
+        response = json.loads(message.to_json())["content"][0]["text"]
+        json_response = json.loads(response)
+        if cache is not None:
+            cache.put("claude", CLAUDE_MODEL, config, query, json_response, context=query_context(query))
 
     if json_file:
         with open(json_file, "w") as f:
@@ -259,6 +590,90 @@ def claude_query(client: anthropic.Anthropic, query: str, json_file: str | os.Pa
     return json_response
 
 
+async def gemini_query_async(
+    client: genai.Client,
+    query: str,
+    cache: ResponseCache | None = None,
+    prefix_cache: GeminiPrefixCache | None = None,
+    usage: UsageTracker | None = None,
+) -> dict:
+    """
+    Query a Gemini model asynchronously. Rate limiting is left to the caller, see `AsyncScreeningClient`.
+
+    Parameters
+    ----------
+    client : genai.Client
+        The Gemini client.
+    query : str
+        The query message.
+    cache : ResponseCache, optional
+        The cache of the responses, by default None.
+    prefix_cache : GeminiPrefixCache, optional
+        The context cache holding `QUERY_CONTEXT`, by default None.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
+
+    Returns
+    -------
+    dict
+        The response from the Gemini model.
+    """
+    if cache is not None and (json_response := cache.get("gemini", GEMINI_MODEL, GEMINI_CONFIG, query)) is not None:
+        if usage is not None:
+            usage.cache_hit("gemini", GEMINI_MODEL)
+        return json_response
+
+    contents, config = gemini_request(query, await prefix_cache.aget() if prefix_cache is not None else None)
+    with track(usage, "gemini", GEMINI_MODEL, query) as record:
+        response = await client.aio.models.generate_content(model=GEMINI_MODEL, contents=contents, config=config)
+        record.set_usage(*gemini_usage(response), response.text)
+    json_response = json.loads(response.text)
+    if cache is not None:
+        cache.put("gemini", GEMINI_MODEL, GEMINI_CONFIG, query, json_response, context=query_context(query))
+    return json_response
+
+
+async def claude_query_async(
+    client: anthropic.AsyncAnthropic,
+    query: str,
+    cache: ResponseCache | None = None,
+    usage: UsageTracker | None = None,
+) -> dict:
+    """
+    Query a Claude model asynchronously. Rate limiting is left to the caller, see `AsyncScreeningClient`.
+
+    Parameters
+    ----------
+    client : anthropic.AsyncAnthropic
+        The asynchronous Claude client.
+    query : str
+        The query message.
+    cache : ResponseCache, optional
+        The cache of the responses, by default None.
+    usage : UsageTracker, optional
+        The tracker of the token usage and latency of the calls, by default None.
+
+    Returns
+    -------
+    dict
+        The response from the Claude model.
+    """
+    request = claude_request(query)
+    config = claude_config(request)
+    if cache is not None and (json_response := cache.get("claude", CLAUDE_MODEL, config, query)) is not None:
+        if usage is not None:
+            usage.cache_hit("claude", CLAUDE_MODEL)
+        return json_response
+
+    with track(usage, "claude", CLAUDE_MODEL, query) as record:
+        message = await client.messages.create(**request)
+        record.set_usage(*claude_usage(message), message.content[0].text)
+    json_response = json.loads(message.content[0].text)
+    if cache is not None:
+        cache.put("claude", CLAUDE_MODEL, config, query, json_response, context=query_context(query))
+    return json_response
+
+
 def combine_llm_scores(llm_scores: list[pl.DataFrame]) -> pl.DataFrame:
     """
     Combine the scores of the LLMs. The scores are concatenated and then the mean of the inclusion criteria
@@ -407,6 +822,57 @@ def get_manual_review_papers(
     return paper_scores.filter(~pl.col("Title").is_in(processed_papers.get_column("Title")))
 
 
+def is_included(
+    conservative: bool | pl.Expr = True,
+    exclude_below: int | pl.Expr = LikertScale.NEITHER_AGREE_NOR_DISAGREE,
+    include_above: int | pl.Expr = LikertScale.NEITHER_AGREE_NOR_DISAGREE,
+) -> pl.Expr:
+    """
+    Returns the boolean expression of the inclusion of the papers, see `inclusion_decision`.
+
+    The settings are either constants or expressions, e.g. columns holding one setting per row.
+    """
+    lowest = pl.min_horizontal(INCLUSION_CRITERIA)
+    complete = ~pl.any_horizontal(pl.col(INCLUSION_CRITERIA).is_null())
+    return (
+        pl.when(lowest < exclude_below)
+        .then(False)
+        .when(complete & (lowest > include_above))
+        .then(True)
+        .otherwise(conservative)
+    )
+
+
+def inclusion_decision(
+    conservative: bool = True,
+    exclude_below: int = LikertScale.NEITHER_AGREE_NOR_DISAGREE,
+    include_above: int = LikertScale.NEITHER_AGREE_NOR_DISAGREE,
+) -> pl.Expr:
+    """
+    Returns the expression of the inclusion status of the papers, computed in a single pass over the scores.
+
+    Papers with a rating below `exclude_below` in any inclusion criterion are excluded ("n"). Otherwise, papers with
+    a rating above `include_above` in all the inclusion criteria are included ("y"). The remaining papers, including
+    those with missing ratings, require a manual review and are marked "y" when `conservative` and "n" otherwise.
+    The default thresholds are those of `get_excluded_papers` and `get_included_papers`.
+
+    Parameters
+    ----------
+    conservative : bool, optional
+        Whether the papers requiring a manual review are marked as included, by default True.
+    exclude_below : int, optional
+        The rating below which a criterion excludes a paper, by default NEITHER_AGREE_NOR_DISAGREE.
+    include_above : int, optional
+        The rating above which all the criteria include a paper, by default NEITHER_AGREE_NOR_DISAGREE.
+
+    Returns
+    -------
+    pl.Expr
+        The inclusion status, "y" or "n".
+    """
+    return pl.when(is_included(conservative, exclude_below, include_above)).then(pl.lit("y")).otherwise(pl.lit("n"))
+
+
 def assign_inclusion(paper_scores: pl.DataFrame, conservative=True) -> pl.DataFrame:
     """
     Assign the inclusion status to the papers based on the inclusion criteria.
@@ -423,19 +889,90 @@ def assign_inclusion(paper_scores: pl.DataFrame, conservative=True) -> pl.DataFr
     Returns
     -------
     pl.DataFrame
-        The input DataFrame with the inclusion status assigned in the "Included" column.
-    """
-    excluded_papers = get_excluded_papers(paper_scores)
-    included_papers = get_included_papers(paper_scores)
-    manual_review_papers = get_manual_review_papers(paper_scores, excluded_papers, included_papers)
-
-    manual_review_label = "y" if conservative else "n"
-    return pl.concat(
-        [
-            excluded_papers.with_columns(pl.lit("n").alias("Included")),
-            included_papers.with_columns(pl.lit("y").alias("Included")),
-            manual_review_papers.with_columns(pl.lit(manual_review_label).alias("Included")),
-        ]
+        The input DataFrame with the inclusion status assigned in the "Included" column, see `inclusion_decision`.
+    """
+    return paper_scores.with_columns(inclusion_decision(conservative).alias("Included"))
+
+
+def evaluate_inclusion_thresholds(
+    paper_scores: pl.DataFrame,
+    exclude_below: list[int] | None = None,
+    include_above: list[int] | None = None,
+    conservative: list[bool] | None = None,
+) -> pl.DataFrame:
+    """
+    Evaluate the inclusion status of every combination of thresholds against the manual inclusion decisions.
+
+    All the settings are evaluated in one query over the cross join of the papers and the settings, see
+    `is_included`. As in `simplify_inclusion_results`, the papers marked as included have to be reviewed
+    manually, so the workload is the share of papers marked as included.
+
+    Parameters
+    ----------
+    paper_scores : pl.DataFrame
+        The paper scores assigned by the LLM(s), with the manual decisions in the "Manually Included" column, either
+        "y" and "n" or booleans.
+    exclude_below : list[int], optional
+        The exclusion thresholds to evaluate, by default every rating of the Likert scale but the lowest.
+    include_above : list[int], optional
+        The inclusion thresholds to evaluate, by default every rating of the Likert scale but the highest.
+    conservative : list[bool], optional
+        The settings of `conservative` to evaluate, by default both.
+
+    Returns
+    -------
+    pl.DataFrame
+        One row per setting with the "exclude_below", "include_above" and "conservative" settings, the "included"
+        papers, the true positives "tp", false positives "fp" and false negatives "fn", and the "precision", "recall"
+        and "workload".
+
+    Raises
+    ------
+    ValueError
+        If the "Manually Included" column is missing.
+    """
+    if "Manually Included" not in paper_scores.columns:
+        raise ValueError("Missing column: Manually Included")
+
+    ratings = [int(rating) for rating in LikertScale]
+    settings = pl.DataFrame(
+        list(
+            product(
+                exclude_below if exclude_below is not None else ratings[1:],
+                include_above if include_above is not None else ratings[:-1],
+                conservative if conservative is not None else [True, False],
+            )
+        ),
+        schema={"exclude_below": pl.Int64, "include_above": pl.Int64, "conservative": pl.Boolean},
+        orient="row",
+    )
+
+    manually_included = pl.col("Manually Included")
+    if paper_scores.schema["Manually Included"] != pl.Boolean:
+        manually_included = manually_included == "y"
+
+    papers = paper_scores.lazy().select(*INCLUSION_CRITERIA, manually_included.fill_null(False).alias("relevant"))
+    included = is_included(pl.col("conservative"), pl.col("exclude_below"), pl.col("include_above"))
+
+    return (
+        papers.join(settings.lazy(), how="cross")
+        .with_columns(included.alias("included"))
+        .group_by(settings.columns, maintain_order=True)
+        .agg(
+            pl.col("included").sum(),
+            (pl.col("included") & pl.col("relevant")).sum().alias("tp"),
+            (pl.col("included") & ~pl.col("relevant")).sum().alias("fp"),
+            (~pl.col("included") & pl.col("relevant")).sum().alias("fn"),
+            pl.len().alias("papers"),
+        )
+        .with_columns(
+            (pl.col("tp") / (pl.col("tp") + pl.col("fp"))).alias("precision"),
+            (pl.col("tp") / (pl.col("tp") + pl.col("fn"))).alias("recall"),
+            (pl.col("included") / pl.col("papers")).alias("workload"),
+        )
+        .drop("papers")
+        .sort(settings.columns)
+        .collect()
     )
 
 
@@ -470,16 +1007,100 @@ def build_query(papers: pl.DataFrame) -> str:
     return f"{QUERY_CONTEXT}\n\n{papers_context_message}"
 
 
-def build_batched_query(papers: pl.DataFrame, batch_size: int) -> Generator[str, None, None]:
+def expected_output_tokens(title: str, count_tokens: Callable[[str], int] = estimate_tokens) -> int:
+    """
+    Returns the number of tokens the ratings of a paper take in the JSON response.
+
+    Parameters
+    ----------
+    title : str
+        The title of the paper.
+    count_tokens : Callable[[str], int], optional
+        The function counting the tokens of a text, by default `src.data.utils.estimate_tokens`.
+
+    Returns
+    -------
+    int
+        The expected number of output tokens.
+    """
+    return count_tokens(json.dumps({title: [LikertScale.NEITHER_AGREE_NOR_DISAGREE] * 5}, indent=2))
+
+
+def pack_batches(
+    papers: pl.DataFrame,
+    max_input_tokens: int = MAX_BATCH_INPUT_TOKENS,
+    max_output_tokens: int = MAX_BATCH_OUTPUT_TOKENS,
+    batch_size: int | None = None,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> Generator[pl.DataFrame, None, None]:
+    """
+    Split the papers into batches that fit the input and expected output token budgets of a request.
+
+    The papers are packed in order, each batch being filled until the next paper would exceed one of the budgets, so
+    long abstracts get smaller batches and short ones larger batches. A paper exceeding a budget on its own is sent in
+    a batch of its own.
+
+    Parameters
+    ----------
+    papers : pl.DataFrame
+        The papers to split, with the columns 'Title', 'Abstract', and 'Author Keywords'.
+    max_input_tokens : int, optional
+        The maximum number of input tokens of a request, including `QUERY_CONTEXT`, by default MAX_BATCH_INPUT_TOKENS.
+    max_output_tokens : int, optional
+        The maximum number of expected output tokens of a request, by default MAX_BATCH_OUTPUT_TOKENS.
+    batch_size : int, optional
+        The maximum number of papers per batch, by default unlimited.
+    count_tokens : Callable[[str], int], optional
+        The function counting the tokens of a text, by default `src.data.utils.estimate_tokens`. Use e.g.
+        `functools.partial(count_tokens_for_openai_model, "gpt-4o")` for an exact tokenizer.
+
+    Yields
+    ------
+    pl.DataFrame
+        The batches of papers.
+    """
+    context_tokens = count_tokens(f"{QUERY_CONTEXT}\n\n")
+    input_tokens = [count_tokens(create_paper_context_message(paper) + "\n\n") for paper in papers.to_dicts()]
+    output_tokens = [expected_output_tokens(title, count_tokens) for title in papers.get_column("Title")]
+
+    start, batch_input, batch_output = 0, context_tokens, 0
+    for i, (paper_input, paper_output) in enumerate(zip(input_tokens, output_tokens, strict=True)):
+        full = batch_size is not None and i - start == batch_size
+        over_budget = batch_input + paper_input > max_input_tokens or batch_output + paper_output > max_output_tokens
+        if i > start and (full or over_budget):
+            yield papers.slice(start, i - start)
+            start, batch_input, batch_output = i, context_tokens, 0
+        batch_input += paper_input
+        batch_output += paper_output
+
+    if start < papers.height:
+        yield papers.slice(start)
+
+
+def build_batched_query(
+    papers: pl.DataFrame,
+    batch_size: int | None = None,
+    max_input_tokens: int = MAX_BATCH_INPUT_TOKENS,
+    max_output_tokens: int = MAX_BATCH_OUTPUT_TOKENS,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> Generator[str, None, None]:
     """
     Returns a generator of query messages for the papers.
 
+    The papers are packed into batches that fit the token budgets, see `pack_batches`.
+
     Parameters
     ----------
     papers : pl.DataFrame
         The papers to build the query for.
-    batch_size : int
-        The batch size.
+    batch_size : int, optional
+        The maximum number of papers per batch, by default unlimited.
+    max_input_tokens : int, optional
+        The maximum number of input tokens of a query, by default MAX_BATCH_INPUT_TOKENS.
+    max_output_tokens : int, optional
+        The maximum number of expected output tokens of a query, by default MAX_BATCH_OUTPUT_TOKENS.
+    count_tokens : Callable[[str], int], optional
+        The function counting the tokens of a text, by default `src.data.utils.estimate_tokens`.
 
     Yields
     ------
@@ -493,12 +1114,388 @@ def build_batched_query(papers: pl.DataFrame, batch_size: int) -> Generator[str,
 
     relevant_data = papers.select([pl.col("Title"), pl.col("Abstract"), pl.col("Author Keywords")])
 
-    for i in range(0, len(relevant_data), batch_size):
-        batch = relevant_data.slice(i, batch_size)
+    for batch in pack_batches(relevant_data, max_input_tokens, max_output_tokens, batch_size, count_tokens):
         papers_context_message = "\n\n".join(create_paper_context_message(paper) for paper in batch.to_dicts())
         yield f"{QUERY_CONTEXT}\n\n{papers_context_message}"
 
 
+PAPER_BLOCK_PATTERN = re.compile(r"<BOI>\nTitle: (.*?)\n.*?<EOI>", re.DOTALL)
+
+
+def normalize_title(title: str) -> str:
+    """Returns the title in lower case, with punctuation removed and whitespace collapsed, for comparisons."""
+    return " ".join(re.sub(r"[^\w\s]", " ", title.casefold()).split())
+
+
+def paper_blocks(query: str) -> dict[str, str]:
+    """Returns the paper blocks of a query after the instructions, see `create_paper_context_message`, by title."""
+    _, papers = split_query(query)
+    return {match.group(1): match.group(0) for match in PAPER_BLOCK_PATTERN.finditer(papers)}
+
+
+def followup_query(query: str, titles: list[str]) -> str:
+    """
+    Returns the query for a subset of the papers of a batched query.
+
+    The follow-up query starts with the same instructions as the original one, so it can use the same context cache.
+
+    Parameters
+    ----------
+    query : str
+        The batched query.
+    titles : list[str]
+        The titles of the papers to keep.
+
+    Returns
+    -------
+    str
+        The query message.
+    """
+    _, papers = split_query(query)
+    blocks = paper_blocks(query)
+    return query[: len(query) - len(papers)] + "\n\n".join(blocks[title] for title in titles)
+
+
+def parse_ratings(value) -> list[int] | None:
+    """
+    Returns the ratings of a paper in a response, or None if they are invalid.
+
+    The ratings are either a list with one rating per inclusion criterion or a mapping from the criteria to the
+    ratings. Integral floats and numeric strings are accepted, but every rating must be on the Likert scale.
+
+    Parameters
+    ----------
+    value : Any
+        The ratings of the paper in the response.
+
+    Returns
+    -------
+    list[int] | None
+        The ratings in the order of `INCLUSION_CRITERIA`.
+    """
+    if isinstance(value, dict):
+        value = [value.get(criterion) for criterion in INCLUSION_CRITERIA]
+    if not isinstance(value, list) or len(value) != len(INCLUSION_CRITERIA):
+        return None
+
+    ratings = []
+    for rating in value:
+        if isinstance(rating, bool):
+            return None
+        try:
+            number = float(rating)
+        except (TypeError, ValueError):
+            return None
+        if not number.is_integer() or not LikertScale.STRONGLY_DISAGREE <= number <= LikertScale.STRONGLY_AGREE:
+            return None
+        ratings.append(int(number))
+    return ratings
+
+
+def validate_batch_response(
+    titles: list[str], response: dict, cutoff: float = TITLE_MATCH_CUTOFF
+) -> tuple[dict[str, list[int]], list[str]]:
+    """
+    Match the entries of a batched response to the submitted papers.
+
+    Entries are matched by exact title first, then by normalized title (see `normalize_title`), and finally by
+    similarity, so titles whose case, punctuation or a few characters were changed by the model are repaired. Each
+    submitted paper is matched at most once, to the most similar entry. Entries with invalid ratings (see
+    `parse_ratings`) or without a submitted paper above the similarity cutoff are discarded.
+
+    Parameters
+    ----------
+    titles : list[str]
+        The titles of the submitted papers.
+    response : dict
+        The response, mapping titles to ratings.
+    cutoff : float, optional
+        The minimum similarity ratio between the normalized titles, by default TITLE_MATCH_CUTOFF.
+
+    Returns
+    -------
+    tuple[dict[str, list[int]], list[str]]
+        The ratings by submitted title, and the titles of the papers without valid ratings in submission order.
+    """
+    normalized = {normalize_title(title): title for title in titles}
+    results, unmatched = {}, []
+    for title, value in response.items():
+        ratings = parse_ratings(value)
+        if ratings is None:
+            continue
+        submitted = title if title in titles else normalized.get(normalize_title(title))
+        if submitted is not None and submitted not in results:
+            results[submitted] = ratings
+        else:
+            unmatched.append((normalize_title(title), ratings))
+
+    remaining = [title for title in titles if title not in results]
+    if unmatched and remaining:
+        candidates = sorted(
+            (
+                (difflib.SequenceMatcher(None, entry, normalize_title(title)).ratio(), i, title)
+                for i, (entry, _) in enumerate(unmatched)
+                for title in remaining
+            ),
+            reverse=True,
+        )
+        matched_entries = set()
+        for ratio, i, title in candidates:
+            if ratio < cutoff:
+                break
+            if i not in matched_entries and title not in results:
+                results[title] = unmatched[i][1]
+                matched_entries.add(i)
+
+    return results, [title for title in titles if title not in results]
+
+
+def recover_batch(
+    send: Callable[[str], dict],
+    query: str,
+    max_followups: int = MAX_BATCH_FOLLOWUPS,
+    cutoff: float = TITLE_MATCH_CUTOFF,
+    discard: Callable[[str], None] | None = None,
+) -> tuple[dict[str, list[int]], list[str]]:
+    """
+    Send a batched query and query again only the papers missing from the response or with invalid ratings.
+
+    The cached response to a query that leaves out papers is discarded, otherwise the follow-up query of a single
+    paper, which is the same query, and the queries of a resumed run would get the same response from the cache.
+
+    Parameters
+    ----------
+    send : Callable[[str], dict]
+        The function sending a query and returning the parsed response, e.g. `LLMBackend.query`.
+    query : str
+        The batched query.
+    max_followups : int, optional
+        The maximum number of follow-up queries, by default MAX_BATCH_FOLLOWUPS.
+    cutoff : float, optional
+        The minimum similarity to repair a title, see `validate_batch_response`, by default TITLE_MATCH_CUTOFF.
+    discard : Callable[[str], None], optional
+        The function dropping the cached response to a query, e.g. `LLMBackend.discard`, by default None.
+
+    Returns
+    -------
+    tuple[dict[str, list[int]], list[str]]
+        The ratings by submitted title, and the titles of the papers still without valid ratings.
+    """
+    results, missing = {}, list(paper_blocks(query))
+    for _ in range(max_followups + 1):
+        valid, missing = validate_batch_response(missing, send(query), cutoff)
+        results |= valid
+        if not missing:
+            break
+        if discard is not None:
+            discard(query)
+        query = followup_query(query, missing)
+    return results, missing
+
+
+async def arecover_batch(
+    send: Callable[[str], Awaitable[dict]],
+    query: str,
+    max_followups: int = MAX_BATCH_FOLLOWUPS,
+    cutoff: float = TITLE_MATCH_CUTOFF,
+    discard: Callable[[str], None] | None = None,
+) -> tuple[dict[str, list[int]], list[str]]:
+    """Asynchronous version of `recover_batch`, e.g. with `AsyncScreeningClient.query` as `send`."""
+    results, missing = {}, list(paper_blocks(query))
+    for _ in range(max_followups + 1):
+        valid, missing = validate_batch_response(missing, await send(query), cutoff)
+        results |= valid
+        if not missing:
+            break
+        if discard is not None:
+            discard(query)
+        query = followup_query(query, missing)
+    return results, missing
+
+
+class GeminiBatchJobs:
+    """
+    Bulk screening jobs with Gemini batch prediction.
+
+    The requests are written to a JSON lines file, uploaded with the Files API and processed asynchronously at a
+    discount, outside of the per-minute rate limits. See `run_batch_job`.
+
+    Parameters
+    ----------
+    client : genai.Client
+        The Gemini client.
+    """
+
+    provider = "gemini"
+    DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+    FAILED_STATES = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+    def __init__(self, client: genai.Client):
+        self.client = client
+
+    def write(self, queries: dict[str, str], path: str | os.PathLike[str]) -> Path:
+        """Write the requests of the queries, by key, to a batch file and return its path."""
+        with open(path, "w", encoding="utf8") as f:
+            for key, query in queries.items():
+                contents, config = gemini_request(query)
+                request = {"contents": [{"role": "user", "parts": [{"text": contents}]}], "generation_config": config}
+                f.write(json.dumps({"key": key, "request": request}) + "\n")
+        return Path(path)
+
+    def submit(self, path: str | os.PathLike[str]) -> str:
+        """Upload a batch file, create the job processing it and return the name of the job."""
+        display_name = Path(path).stem
+        uploaded = self.client.files.upload(file=path, config={"mime_type": "jsonl", "display_name": display_name})
+        job = self.client.batches.create(model=GEMINI_MODEL, src=uploaded.name, config={"display_name": display_name})
+        return job.name
+
+    def done(self, job: str) -> bool:
+        """Returns whether the job has completed, raising a ValueError if it failed."""
+        state = self.client.batches.get(name=job).state.name
+        if state in self.FAILED_STATES:
+            raise ValueError(f"Gemini batch job {job} ended in state {state}")
+        return state in self.DONE_STATES
+
+    def results(self, job: str) -> dict[str, str]:
+        """Returns the text of the successful responses of a completed job, by key."""
+        output = self.client.files.download(file=self.client.batches.get(name=job).dest.file_name)
+        texts = {}
+        for line in output.decode().splitlines():
+            entry = json.loads(line)
+            try:
+                texts[entry["key"]] = entry["response"]["candidates"][0]["content"]["parts"][0]["text"]
+            except (KeyError, IndexError):
+                continue
+        return texts
+
+
+class ClaudeBatchJobs:
+    """
+    Bulk screening jobs with the Anthropic Message Batches API.
+
+    The requests are written to a JSON lines file for the record, then sent in one batch processed asynchronously at
+    a discount, outside of the per-minute rate limits. See `run_batch_job`.
+
+    Parameters
+    ----------
+    client : anthropic.Anthropic
+        The Claude client.
+    """
+
+    provider = "claude"
+
+    def __init__(self, client: anthropic.Anthropic):
+        self.client = client
+
+    def write(self, queries: dict[str, str], path: str | os.PathLike[str]) -> Path:
+        """Write the requests of the queries, by key, to a batch file and return its path."""
+        with open(path, "w", encoding="utf8") as f:
+            for key, query in queries.items():
+                f.write(json.dumps({"custom_id": key, "params": claude_request(query)}) + "\n")
+        return Path(path)
+
+    def submit(self, path: str | os.PathLike[str]) -> str:
+        """Create the batch of the requests in a batch file and return its ID."""
+        with open(path, encoding="utf8") as f:
+            requests = [json.loads(line) for line in f]
+        return self.client.messages.batches.create(requests=requests).id
+
+    def done(self, job: str) -> bool:
+        """Returns whether the processing of the batch has ended."""
+        return self.client.messages.batches.retrieve(job).processing_status == "ended"
+
+    def results(self, job: str) -> dict[str, str]:
+        """Returns the text of the successful responses of an ended batch, by custom ID."""
+        return {
+            entry.custom_id: entry.result.message.content[0].text
+            for entry in self.client.messages.batches.results(job)
+            if entry.result.type == "succeeded"
+        }
+
+
+def run_batch_job(
+    jobs: GeminiBatchJobs | ClaudeBatchJobs,
+    queries: list[str],
+    directory: str | os.PathLike[str],
+    poll_interval: float = BATCH_POLL_INTERVAL,
+    timeout: float = BATCH_TIMEOUT,
+    max_followups: int = MAX_BATCH_FOLLOWUPS,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> tuple[dict[str, list[int]], list[str]]:
+    """
+    Screen batched queries in a bulk job and map the responses back to the papers.
+
+    All the queries are written to one batch file in `directory`, submitted as one job and polled until the job
+    completes. Each response is matched to the papers of its query like in `gemini_batched_query`, see
+    `validate_batch_response`, and the papers missing from the responses are submitted again in a smaller follow-up
+    job.
+
+    Parameters
+    ----------
+    jobs : GeminiBatchJobs | ClaudeBatchJobs
+        The batch jobs of the provider.
+    queries : list[str]
+        The batched queries, see `build_batched_query`.
+    directory : str | os.PathLike[str]
+        The directory of the batch files.
+    poll_interval : float, optional
+        The number of seconds between two polls of a job, by default BATCH_POLL_INTERVAL.
+    timeout : float, optional
+        The maximum number of seconds to wait for a job, by default BATCH_TIMEOUT.
+    max_followups : int, optional
+        The maximum number of follow-up jobs, by default MAX_BATCH_FOLLOWUPS.
+    sleep : Callable[[float], None], optional
+        The function waiting between two polls, by default `time.sleep`.
+    clock : Callable[[], float], optional
+        The clock measuring the timeout, by default `time.monotonic`.
+
+    Returns
+    -------
+    tuple[dict[str, list[int]], list[str]]
+        The ratings by submitted title, and the titles of the papers still without valid ratings.
+
+    Raises
+    ------
+    TimeoutError
+        If a job does not complete within `timeout` seconds.
+    ValueError
+        If a job fails.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    pending = {f"query-{i}": query for i, query in enumerate(queries)}
+    for attempt in range(max_followups + 1):
+        job = jobs.submit(jobs.write(pending, directory / f"{jobs.provider}-batch-{attempt}.jsonl"))
+        deadline = clock() + timeout
+        while not jobs.done(job):
+            if clock() >= deadline:
+                raise TimeoutError(f"The {jobs.provider} batch job {job} did not complete within {timeout:g} seconds")
+            sleep(poll_interval)
+
+        texts = jobs.results(job)
+        followups = {}
+        for key, query in pending.items():
+            try:
+                response = json.loads(texts.get(key, "{}"))
+            except json.JSONDecodeError:
+                response = {}
+            valid, missing = validate_batch_response(
+                list(paper_blocks(query)), response if isinstance(response, dict) else {}
+            )
+            results |= valid
+            if missing:
+                followups[key] = followup_query(query, missing)
+
+        pending = followups
+        if not pending:
+            break
+
+    return results, [title for query in pending.values() for title in paper_blocks(query)]
+
+
 def simplify_inclusion_results(inclusion_results: pl.DataFrame) -> pl.DataFrame:
     """
     Simplify the inclusion results DataFrame for evaluation purposes.
@@ -0,0 +1,119 @@
+import asyncio
+from collections.abc import Callable
+import time
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """Returns whether an exception raised by an LLM client is due to rate limiting (HTTP 429)."""
+    return "429" in str(e)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a constant rate.
+
+    Waiters are served in arrival order, so a large request is not starved by smaller ones.
+
+    Parameters
+    ----------
+    capacity : float
+        The maximum number of tokens in the bucket, i.e. the largest burst allowed.
+    rate : float
+        The number of tokens added to the bucket per second.
+    clock : Callable[[], float], optional
+        The monotonic clock used to refill the bucket, by default `time.monotonic`.
+    """
+
+    def __init__(self, capacity: float, rate: float, clock: Callable[[], float] = time.monotonic):
+        if capacity <= 0 or rate <= 0:
+            raise ValueError("The capacity and rate of a token bucket must be positive")
+
+        self.capacity = capacity
+        self.rate = rate
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+        self._lock = None
+        self._loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Locks are bound to the event loop they are first used in, and the bucket may outlive a loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        return self._lock
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        """
+        Wait until the bucket holds `amount` tokens and take them.
+
+        Requests larger than the capacity wait for a full bucket and leave it empty.
+
+        Parameters
+        ----------
+        amount : float, optional
+            The number of tokens to take, by default 1.
+        """
+        amount = min(amount, self.capacity)
+        async with self._get_lock():
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider rejected a request for exceeding its rate limit."""
+        self._refill()
+        self.tokens = 0
+
+
+class RateLimiter:
+    """
+    Rate limiter for an LLM provider limiting both the requests and the tokens per minute.
+
+    The buckets only hold the allowance of `burst_seconds`, so the requests are spread over the minute instead of
+    being sent in a burst at the start of it.
+
+    Parameters
+    ----------
+    requests_per_minute : float
+        The maximum number of requests per minute.
+    tokens_per_minute : float, optional
+        The maximum number of tokens (input and output) per minute, by default unlimited.
+    burst_seconds : float, optional
+        The number of seconds of allowance that can be spent at once, by default 6.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float | None = None, burst_seconds: float = 6):
+        self.requests = self._bucket(requests_per_minute, burst_seconds)
+        self.tokens = self._bucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+
+    @staticmethod
+    def _bucket(per_minute: float, burst_seconds: float) -> TokenBucket:
+        rate = per_minute / 60
+        return TokenBucket(max(1, rate * burst_seconds), rate)
+
+    async def acquire(self, tokens: float = 0):
+        """
+        Wait until a request of the given number of tokens can be sent without exceeding the limits.
+
+        Parameters
+        ----------
+        tokens : float, optional
+            The number of tokens of the request, by default 0.
+        """
+        await self.requests.acquire(1)
+        if self.tokens is not None and tokens > 0:
+            await self.tokens.acquire(tokens)
+
+    def backoff(self):
+        """Empty the buckets so that no request is sent until they refill."""
+        self.requests.drain()
+        if self.tokens is not None:
+            self.tokens.drain()
@@ -1,49 +1,127 @@
-from collections.abc import Generator
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from contextlib import ExitStack
+import argparse
+from collections.abc import Generator, Sequence
+import json
 import os
+from pathlib import Path
+import shutil
+import time
 
-import google.generativeai as genai
+from google import genai
 import polars as pl
 from tqdm import tqdm
 
 from src.config import INTERIM_DATA_DIR
+from src.data.selection.backends import GeminiBackend, LLMBackend
+from src.data.selection.cache import ResponseCache
+from src.data.selection.client import AsyncScreeningClient
+from src.data.selection.dedup import cluster_duplicates, propagate_scores, representatives
+from src.data.selection.journal import ScreeningJournal
 from src.data.selection.llm import (
-    GEMINI_CONFIG,
     GEMINI_MODEL,
+    MODEL_PRICES,
     QUERY_CONTEXT,
+    GeminiBatchJobs,
+    GeminiPrefixCache,
+    build_batched_query,
     create_paper_context_message,
-    gemini_query,
+    run_batch_job,
 )
+from src.data.selection.rate_limit import RateLimiter
+from src.data.selection.usage import UsageTracker
 
+RUN_DIR = INTERIM_DATA_DIR / f"{GEMINI_MODEL}-screening"
 
-def make_queries(model: genai.GenerativeModel, papers: pl.DataFrame) -> Generator[list[dict], None, None]:
+
+def make_queries(
+    backend: LLMBackend,
+    papers: pl.DataFrame,
+    requests_per_minute: float | None = None,
+    tokens_per_minute: float | None = None,
+    max_in_flight: int = 8,
+    progress: bool = True,
+) -> Generator[dict, None, None]:
     """
-    Make queries to the Gemini model for each paper in the DataFrame.
+    Make queries to the LLM backend for each paper in the DataFrame.
+
+    The queries share a token-bucket rate limiter, so they are sent at the rate allowed by the provider instead of
+    in bursts followed by one-minute waits. Each query is built when a slot among the `max_in_flight` requests frees
+    up, and the results are yielded as they arrive, so they can be written incrementally, e.g. to a
+    `ScreeningJournal`, with memory that does not grow with the number of papers.
+
+    Each response is matched to the submitted paper like a batched one, see `AsyncScreeningClient.query_batch`, so a
+    title altered by the model is repaired and a paper missing from the response is queried again instead of being
+    recorded under a title that is not in `papers`.
 
     Parameters
     ----------
-    model : genai.GenerativeModel
-        The Gemini model to use for the queries.
+    backend : LLMBackend
+        The LLM backend to use for the queries, e.g. a `GeminiBackend`.
     papers : pl.DataFrame
         The DataFrame containing the papers to query.
+    requests_per_minute : float, optional
+        The maximum number of requests per minute, by default the limit of the backend.
+    tokens_per_minute : float, optional
+        The maximum number of tokens per minute, by default the limit of the backend.
+    max_in_flight : int, optional
+        The maximum number of requests waiting for a response, by default 8.
+    progress : bool, optional
+        Whether to display a progress bar, by default True.
 
     Yields
     ------
-    Generator[list[dict], None, None]
-        A generator that yields the results of the queries.
+    Generator[dict, None, None]
+        A generator that yields the ratings by submitted title of each query, empty if the paper has no valid ratings
+        after the follow-up queries.
     """
-    with ExitStack() as stack:
-        executor = stack.enter_context(ThreadPoolExecutor())
-        pbar = stack.enter_context(tqdm(total=len(papers)))
-        queries = (f"{QUERY_CONTEXT}\n\n{create_paper_context_message(paper)}" for paper in papers.to_dicts())
-        futures = [executor.submit(gemini_query, model, query) for query in queries]
-        for future in as_completed(futures):
+    screening_client = AsyncScreeningClient(
+        backend.aquery,
+        RateLimiter(requests_per_minute or backend.requests_per_minute, tokens_per_minute or backend.tokens_per_minute),
+        max_in_flight=max_in_flight,
+        cached_fn=backend.cached,
+        discard_fn=backend.discard,
+    )
+    queries = (f"{QUERY_CONTEXT}\n\n{create_paper_context_message(paper)}" for paper in papers.iter_rows(named=True))
+    with tqdm(total=len(papers), disable=not progress) as pbar:
+        for result in screening_client.iter_results(queries, batched=True):
             pbar.update(1)
-            yield future.result()
+            yield result
 
 
-def main():
+def main(argv: Sequence[str] | None = None):
+    parser = argparse.ArgumentParser(description="Screen the model quantization papers with the Gemini model.")
+    parser.add_argument(
+        "--run-dir",
+        type=Path,
+        default=RUN_DIR,
+        help="Directory of the journal and manifest of the run, resumed if it exists (default: %(default)s).",
+    )
+    parser.add_argument("--fresh", action="store_true", help="Discard the journal of the run and start it over.")
+    parser.add_argument(
+        "--compact-only",
+        action="store_true",
+        help="Write the scores recorded in the journal without querying the model.",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Screen the pending papers in batches with a Gemini batch prediction job instead of one request each.",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=8,
+        help="Maximum number of requests waiting for a response (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Screen every paper instead of one paper per cluster of near-duplicates.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.fresh:
+        shutil.rmtree(args.run_dir, ignore_errors=True)
+
     print("Loading data...")
     papers = pl.read_csv(INTERIM_DATA_DIR / "model-quantization-papers.csv", encoding="utf8")
     sample_papers = pl.read_excel(INTERIM_DATA_DIR / "model-quantization-papers-50-sample.xlsx")
@@ -52,29 +130,63 @@ def main():
     papers = papers.filter(~pl.col("Title").is_in(sample_papers["Title"]))
     relevant_data = papers.select(["Title", "Abstract", "Author Keywords"])
 
-    # Load the Gemini model
-    print("Loading Gemini model...")
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-
-    model = genai.GenerativeModel(
-        model_name=GEMINI_MODEL,
-        generation_config=GEMINI_CONFIG,
-    )
-
-    # Query the model for one paper at a time
-    print("Querying Gemini model...")
-    results = {}
-    for result in make_queries(model, relevant_data):
-        results = results | result
-
-    scores_df = pl.from_dict(results).transpose(
-        include_header=True,
-        header_name="Title",
-        column_names=["IC1", "IC2", "IC3", "IC4", "IC5"],
-    )
-
-    # Save the results
-    scores_df.write_parquet(INTERIM_DATA_DIR / f"{GEMINI_MODEL}-scores.parquet")
+    # Screen one paper per cluster of duplicates, e.g. the pre-print and published versions of a paper
+    if args.no_dedup:
+        clusters = relevant_data.select("Title", pl.col("Title").alias("Representative"))
+    else:
+        clusters = cluster_duplicates(papers)
+    screened_data = representatives(relevant_data, clusters)
+    print(f"Screening {screened_data.height} of {relevant_data.height} papers, the others are near-duplicates")
+
+    with ScreeningJournal(args.run_dir, "gemini", GEMINI_MODEL, QUERY_CONTEXT) as journal:
+        clusters.write_parquet(args.run_dir / "duplicates.parquet")
+        pending = journal.pending(screened_data)
+        print(f"{len(journal.scored)} papers already scored in {args.run_dir}, {len(pending)} pending")
+
+        if not args.compact_only and not pending.is_empty():
+            # Load the Gemini client
+            print("Loading Gemini client...")
+            client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+
+            if args.bulk:
+                print("Running Gemini batch job...")
+                results, missing = run_batch_job(
+                    GeminiBatchJobs(client), list(build_batched_query(pending)), args.run_dir / "batches"
+                )
+                journal.append(results)
+                if missing:
+                    print(f"No valid ratings for {len(missing)} papers, resume the run to query them again")
+            else:
+                # Query the model for one paper at a time
+                print("Querying Gemini model...")
+                # Responses of previous runs are reused, the model runs at temperature 0
+                cache = ResponseCache()
+                cache.invalidate(context=QUERY_CONTEXT)
+
+                usage = UsageTracker()
+                backend = GeminiBackend(client, cache=cache, prefix_cache=GeminiPrefixCache(client), usage=usage)
+                for result in make_queries(backend, pending, max_in_flight=args.max_in_flight):
+                    journal.append(result)
+                print(f"Response cache: {cache.stats()}")
+
+                report = usage.report(MODEL_PRICES)
+                (args.run_dir / f"usage-{time.strftime('%Y%m%d-%H%M%S')}.json").write_text(json.dumps(report, indent=2))
+                print(
+                    f"Usage: {report['completed']} calls, {report['prompt_tokens']} prompt tokens "
+                    f"({report['cached_tokens']} cached), {report['output_tokens']} output tokens, "
+                    f"estimated cost ${report['cost']:.4f}"
+                )
+
+        # Save the results, unless the run has none, e.g. compacting a new run directory
+        scores_path = INTERIM_DATA_DIR / f"{GEMINI_MODEL}-scores.parquet"
+        if not journal.scored:
+            print(f"No scores recorded in {args.run_dir}, {scores_path} was left unchanged")
+            return
+
+        screened_scores = journal.compact(args.run_dir / "scores.parquet")
+        scores_df = propagate_scores(screened_scores, clusters)
+        scores_df.write_parquet(scores_path)
+        print(f"Saved the scores of {scores_df.height} papers, {screened_scores.height} of them screened")
 
 
 if __name__ == "__main__":
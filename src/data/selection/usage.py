@@ -0,0 +1,226 @@
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+import threading
+import time
+
+import numpy as np
+
+from src.data.selection.rate_limit import is_rate_limit_error
+from src.data.utils import estimate_tokens
+
+
+@dataclass
+class ModelPrice:
+    """
+    Prices of a model in USD per million tokens.
+
+    Attributes
+    ----------
+    input : float
+        Price of the input tokens read from the prompt.
+    cached_input : float
+        Price of the input tokens read from a context or prompt cache.
+    output : float
+        Price of the output tokens.
+    """
+
+    input: float
+    cached_input: float
+    output: float
+
+    def cost(self, prompt_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+        """Returns the cost in USD of a call, the prompt tokens including the cached ones."""
+        uncached_tokens = prompt_tokens - cached_tokens
+        return (
+            uncached_tokens * self.input + cached_tokens * self.cached_input + output_tokens * self.output
+        ) / 1_000_000
+
+
+@dataclass
+class CallRecord:
+    """
+    Usage of one call to an LLM, i.e. one attempt of a request.
+
+    Attributes
+    ----------
+    provider : str
+        The LLM provider, e.g. "gemini".
+    model : str
+        The model name.
+    status : str
+        "ok" for a response, "cached" for a response read from a `ResponseCache`, "rate_limited" for a request
+        rejected with HTTP 429 and "error" for any other failure.
+    prompt_tokens : int, optional
+        The number of input tokens, including the cached ones. None until the call completes.
+    cached_tokens : int
+        The number of input tokens read from a context or prompt cache.
+    output_tokens : int, optional
+        The number of output tokens. None until the call completes.
+    estimated : bool
+        Whether the token counts were estimated with a local tokenizer because the provider did not report them.
+    started_at : float
+        The time the call started at.
+    latency : float
+        The duration of the call in seconds.
+    """
+
+    provider: str
+    model: str
+    status: str = "ok"
+    prompt_tokens: int | None = None
+    cached_tokens: int = 0
+    output_tokens: int | None = None
+    estimated: bool = False
+    started_at: float = 0
+    latency: float = 0
+    prompt: str = field(default="", repr=False)
+    response_text: str = field(default="", repr=False)
+
+    def set_usage(self, prompt_tokens: int | None, cached_tokens: int | None, output_tokens: int | None, text: str):
+        """Record the token counts reported by the provider, and the text of the response to estimate missing ones."""
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens or 0
+        self.output_tokens = output_tokens
+        self.response_text = text
+
+
+class UsageTracker:
+    """
+    Thread-safe record of the token usage and latency of the LLM calls of a run.
+
+    Token counts come from the usage metadata of the responses. When a provider does not report them, they are
+    estimated from the prompt and response with `count_tokens`.
+
+    Parameters
+    ----------
+    count_tokens : Callable[[str], int], optional
+        The function counting the tokens of a text, by default `src.data.utils.estimate_tokens`.
+    clock : Callable[[], float], optional
+        The clock measuring the latency, by default `time.perf_counter`.
+    """
+
+    def __init__(
+        self, count_tokens: Callable[[str], int] = estimate_tokens, clock: Callable[[], float] = time.perf_counter
+    ):
+        self.count_tokens = count_tokens
+        self.clock = clock
+        self.records = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, provider: str, model: str, prompt: str) -> Iterator[CallRecord]:
+        """
+        Record a call to an LLM, timing the body of the `with` statement.
+
+        The body sets the token counts of the response with `CallRecord.set_usage`. An exception raised in the body
+        marks the call as rate-limited or failed.
+
+        Parameters
+        ----------
+        provider : str
+            The LLM provider.
+        model : str
+            The model name.
+        prompt : str
+            The full prompt, to estimate the input tokens if the provider does not report them.
+
+        Yields
+        ------
+        CallRecord
+            The record of the call.
+        """
+        record = CallRecord(provider, model, prompt=prompt, started_at=self.clock())
+        try:
+            yield record
+        except Exception as e:
+            record.status = "rate_limited" if is_rate_limit_error(e) else "error"
+            raise
+        finally:
+            record.latency = self.clock() - record.started_at
+            self._add(record)
+
+    def cache_hit(self, provider: str, model: str):
+        """Record a response read from a `ResponseCache` instead of calling the LLM."""
+        self._add(CallRecord(provider, model, status="cached", started_at=self.clock()))
+
+    def _add(self, record: CallRecord):
+        if record.status == "ok" and (record.prompt_tokens is None or record.output_tokens is None):
+            record.estimated = True
+            if record.prompt_tokens is None:
+                record.prompt_tokens = self.count_tokens(record.prompt)
+            if record.output_tokens is None:
+                record.output_tokens = self.count_tokens(record.response_text)
+        # The texts are only kept until the tokens are counted
+        record.prompt = record.response_text = ""
+        with self._lock:
+            self.records.append(record)
+
+    def report(self, prices: dict[str, ModelPrice] | None = None) -> dict:
+        """
+        Returns the usage of the run, in total and by model.
+
+        Parameters
+        ----------
+        prices : dict[str, ModelPrice], optional
+            The prices of the models by name, to estimate the cost of the run. Models without a price cost nothing.
+
+        Returns
+        -------
+        dict
+            The number of calls by status, the prompt, cached and output tokens, the estimated cost in USD, the
+            elapsed seconds between the start of the first call and the end of the last one, the completed calls and
+            output tokens per second, the 50th, 95th and 99th percentiles of the latency of the completed calls, and
+            the same figures for each model under "models".
+        """
+        with self._lock:
+            records = list(self.records)
+
+        report = self._summarize(records, prices or {})
+        models = sorted({record.model for record in records})
+        report["models"] = {
+            model: self._summarize([record for record in records if record.model == model], prices or {})
+            for model in models
+        }
+        return report
+
+    @staticmethod
+    def _summarize(records: list[CallRecord], prices: dict[str, ModelPrice]) -> dict:
+        completed = [record for record in records if record.status == "ok"]
+        latencies = [record.latency for record in completed]
+        elapsed = (
+            max(record.started_at + record.latency for record in records) - min(record.started_at for record in records)
+            if records
+            else 0
+        )
+        output_tokens = sum(record.output_tokens for record in completed)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (None, None, None)
+        return {
+            "calls": len(records),
+            "completed": len(completed),
+            "cache_hits": sum(record.status == "cached" for record in records),
+            "rate_limited": sum(record.status == "rate_limited" for record in records),
+            "errors": sum(record.status == "error" for record in records),
+            "estimated": sum(record.estimated for record in completed),
+            "prompt_tokens": sum(record.prompt_tokens for record in completed),
+            "cached_tokens": sum(record.cached_tokens for record in completed),
+            "output_tokens": output_tokens,
+            "cost": sum(
+                prices[record.model].cost(record.prompt_tokens, record.cached_tokens, record.output_tokens)
+                for record in completed
+                if record.model in prices
+            ),
+            "elapsed": elapsed,
+            "calls_per_second": len(completed) / elapsed if elapsed > 0 else None,
+            "output_tokens_per_second": output_tokens / elapsed if elapsed > 0 else None,
+            "p50_latency": p50,
+            "p95_latency": p95,
+            "p99_latency": p99,
+        }
+
+
+def track(usage: UsageTracker | None, provider: str, model: str, prompt: str) -> AbstractContextManager[CallRecord]:
+    """Returns `usage.track(provider, model, prompt)`, or a context yielding a discarded record without a tracker."""
+    if usage is None:
+        return nullcontext(CallRecord(provider, model))
+    return usage.track(provider, model, prompt)
@@ -97,3 +97,20 @@ def read_scopus_quantization_papers() -> pl.DataFrame:
 def count_tokens_for_openai_model(model: str, promt: str) -> int:
     enc = tiktoken.encoding_for_model(model)
     return len(enc.encode(promt))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without a tokenizer, assuming four characters per token.
+
+    Parameters
+    ----------
+    text : str
+        The text to estimate the tokens of.
+
+    Returns
+    -------
+    int
+        The estimated number of tokens.
+    """
+    return -(-len(text) // 4)
@@ -37,7 +37,8 @@ class EffectIntensity:
     _instance = None
 
     def __new__(cls, *args, **kwargs):
-        if not cls._instance:
+        # Each subclass has its own instance, the one of a parent class must not be inherited
+        if cls.__dict__.get("_instance") is None:
             cls._instance = super(EffectIntensity, cls).__new__(cls)
         return cls._instance
 
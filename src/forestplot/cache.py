@@ -0,0 +1,151 @@
+from dataclasses import asdict
+import hashlib
+import io
+import json
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+from src.effect_intensity import CorrectnessIntensity, EffectIntensity
+from src.forestplot.utils import intensity_colors, intensity_labels
+
+MANIFEST_FILE = ".forestplot-cache.json"
+
+# Changes to the drawing code must invalidate the cached figures as well
+DRAWING_MODULES = [Path(__file__).with_name(name) for name in ["render.py", "collection_utils.py", "utils.py"]]
+
+
+def hash_frame(df: pl.DataFrame) -> str:
+    """
+    Returns the SHA-256 digest of the content and schema of a DataFrame.
+
+    Parameters
+    ----------
+    df : pl.DataFrame
+        The DataFrame to hash.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+    """
+    buffer = io.BytesIO()
+    df.write_ipc(buffer, compression="uncompressed")
+    return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+def styling_fingerprint(layout: Any) -> dict[str, Any]:
+    """
+    Returns everything that affects how a figure looks, apart from its data.
+
+    This covers the layout parameters, the content of the style file, the intensity thresholds, colors and labels,
+    and the source of the drawing modules. The output formats are left out since they do not change the drawing.
+
+    Parameters
+    ----------
+    layout : ForestPlotLayout
+        The layout of the figures.
+
+    Returns
+    -------
+    dict[str, Any]
+        The JSON-serializable fingerprint.
+    """
+    parameters = {key: value for key, value in asdict(layout).items() if key not in ("figures", "formats")}
+    style = Path(layout.style) if layout.style is not None else None
+    parameters["style"] = style.read_text() if style is not None and style.exists() else None
+
+    return {
+        "layout": parameters,
+        "intensity_ranges": {
+            "effect": repr(EffectIntensity().get_ranges()),
+            "correctness": repr(CorrectnessIntensity().get_ranges()),
+        },
+        "intensity_colors": intensity_colors,
+        "intensity_labels": intensity_labels,
+        "code": [hashlib.sha256(module.read_bytes()).hexdigest() for module in DRAWING_MODULES],
+    }
+
+
+def figure_key(statistics: pl.DataFrame, effects: list[str], fingerprint: dict[str, Any]) -> str:
+    """
+    Returns the content address of a figure, i.e. the hash of everything it is rendered from.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The labelled statistics drawn in the figure.
+    effects : list[str]
+        The effects drawn in the figure, in order.
+    fingerprint : dict[str, Any]
+        The styling fingerprint, see `styling_fingerprint`.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+    """
+    content = {"statistics": hash_frame(statistics), "effects": effects, "styling": fingerprint}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class FigureCache:
+    """
+    Manifest of the figures rendered in a directory and the content address they were rendered from.
+
+    A figure is fresh when it was rendered from the same content address and all its files still exist.
+
+    Parameters
+    ----------
+    output_dir : Path
+        The directory the figures are saved in.
+    """
+
+    def __init__(self, output_dir: Path):
+        self.path = Path(output_dir) / MANIFEST_FILE
+        self.entries = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    def get(self, name: str, key: str, paths: list[Path]) -> list[Path] | None:
+        """
+        Returns the files of a fresh figure, or None if the figure must be rendered.
+
+        Parameters
+        ----------
+        name : str
+            The name of the figure.
+        key : str
+            The content address of the figure.
+        paths : list[Path]
+            The files the figure is expected to be saved in.
+
+        Returns
+        -------
+        list[Path] | None
+            The files of the figure if it is fresh.
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry["key"] != key:
+            return None
+        if not all(path.name in entry["files"] and path.exists() for path in paths):
+            return None
+        return paths
+
+    def put(self, name: str, key: str, paths: list[Path]):
+        """
+        Record the content address of a rendered figure.
+
+        Parameters
+        ----------
+        name : str
+            The name of the figure.
+        key : str
+            The content address of the figure.
+        paths : list[Path]
+            The files the figure was saved in.
+        """
+        self.entries[name] = {"key": key, "files": sorted(path.name for path in paths)}
+
+    def save(self):
+        """Write the manifest to the output directory."""
+        self.path.write_text(json.dumps(self.entries, indent=2, sort_keys=True))
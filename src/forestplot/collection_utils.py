@@ -0,0 +1,217 @@
+from collections.abc import Sequence
+from typing import Any
+
+from matplotlib.axes import Axes
+from matplotlib.collections import LineCollection, PolyCollection
+import numpy as np
+import polars as pl
+
+from src.effect_intensity import CorrectnessIntensity, EffectIntensity
+from src.forestplot.utils import intensity_colors, intensity_labels
+
+
+def get_visible_intensity_ranges(metric: str, x_min: float, x_max: float) -> list[tuple[str, float, float, float]]:
+    """
+    Returns the intensity ranges of a metric clipped to the x-axis limits.
+
+    Ranges that are not visible, or that span the whole x-axis, are skipped as in `src.forestplot.utils`.
+
+    Parameters
+    ----------
+    metric : str
+        The name of the metric.
+    x_min : float
+        The lower limit of the x-axis.
+    x_max : float
+        The upper limit of the x-axis.
+
+    Returns
+    -------
+    list[tuple[str, float, float, float]]
+        The key, the clipped lower and upper bounds, and the x-tick of each visible range.
+    """
+    intensities = CorrectnessIntensity() if metric in ["Accuracy", "F1 Score"] else EffectIntensity()
+
+    visible_ranges = []
+    for key, (lower, upper) in intensities.get_ranges().items():
+        if x_min < lower and upper < x_max:
+            visible_ranges.append((key, lower, upper, lower))
+        elif lower < x_min < upper < x_max:
+            visible_ranges.append((key, x_min, upper, upper))
+        elif x_min < lower < x_max < upper:
+            visible_ranges.append((key, lower, x_max, lower))
+    return visible_ranges
+
+
+def draw_ci(
+    data: pl.DataFrame, estimate: str, y_tick_label: str, lower_ci_col: str, higher_ci_col: str, ax: Axes, **kwargs: Any
+) -> Axes:
+    """
+    Draws all the confidence intervals on the given axis as a single `LineCollection`.
+
+    Parameters
+    ----------
+    data : pl.DataFrame
+        The data frame containing the estimates and confidence intervals.
+    estimate : str
+        The column name for the estimate.
+    y_tick_label : str
+        The label for the y-tick.
+    lower_ci_col : str
+        The column name for the lower confidence interval.
+    higher_ci_col : str
+        The column name for the higher confidence interval.
+    ax : Axes
+        The axis to draw on.
+
+    Returns
+    -------
+    Axes
+        The axis with the confidence intervals drawn.
+    """
+    ecolor = kwargs.get("ecolor", "black")
+
+    estimate = data.get_column(estimate).to_numpy()
+    lower_ci = data.get_column(lower_ci_col).fill_null(np.nan).to_numpy()
+    upper_ci = data.get_column(higher_ci_col).fill_null(np.nan).to_numpy()
+    y_tick_label = data.get_column(y_tick_label).to_numpy()
+
+    # Register the labels as categories so that the markers drawn later share the same positions
+    ax.yaxis.update_units(y_tick_label)
+    y = np.asarray(ax.yaxis.convert_units(y_tick_label), dtype=float)
+
+    lower_ci = np.where(np.isnan(lower_ci), estimate, lower_ci)
+    upper_ci = np.where(np.isnan(upper_ci), estimate, upper_ci)
+    segments = np.stack([np.column_stack([lower_ci, y]), np.column_stack([upper_ci, y])], axis=1)
+
+    ax.add_collection(LineCollection(segments, colors=ecolor, linewidths=1.4, zorder=0), autolim=True)
+    ax.autoscale_view()
+
+    return ax
+
+
+def draw_texts(
+    x: Sequence[float], y: Sequence[float], texts: Sequence[str], ax: Axes, rotation: float = 0, **kwargs: Any
+) -> Axes:
+    """
+    Draws the texts on the given axis in a single pass, skipping repeated texts at the same coordinates.
+
+    The texts are kept as text artists, which are smaller than glyph paths in vector outputs, and are styled as in
+    `src.forestplot.utils.draw_text`.
+
+    Parameters
+    ----------
+    x : Sequence[float]
+        The x-coordinates of the texts.
+    y : Sequence[float]
+        The y-coordinates of the texts.
+    texts : Sequence[str]
+        The texts to draw.
+    ax : Axes
+        The axis to draw on.
+    rotation : float, optional
+        The rotation of the texts in degrees, by default 0.
+
+    Returns
+    -------
+    Axes
+        The axis with the texts drawn.
+    """
+    text_kwargs = {
+        "fontfamily": kwargs.get("fontfamily", "monospace"),
+        "fontsize": kwargs.get("fontsize", 11),
+        "color": kwargs.get("color", "black"),
+        "ha": "center",
+        "va": "center" if rotation == 0 else "bottom",
+        "rotation": rotation,
+    }
+
+    for text, text_x, text_y in dict.fromkeys(zip(texts, x, y, strict=True)):
+        ax.text(x=text_x, y=text_y, s=text, **text_kwargs)
+
+    return ax
+
+
+def draw_intensity_labels(ax: Axes, metric: str, y: float, x_min: float, x_max: float, **kwargs: Any) -> Axes:
+    """
+    Draws the labels of the visible intensity areas above them.
+
+    Parameters
+    ----------
+    ax : Axes
+        The axis to draw on.
+    metric : str
+        The name of the metric.
+    y : float
+        The y-coordinate below the labels.
+    x_min : float
+        The lower limit of the x-axis.
+    x_max : float
+        The upper limit of the x-axis.
+
+    Returns
+    -------
+    Axes
+        The axis with the labels drawn.
+    """
+    offset = 0.5
+    default_rotation = 0 if metric in ["Accuracy", "F1 Score"] else 90
+    visible_ranges = get_visible_intensity_ranges(metric, x_min, x_max)
+
+    return draw_texts(
+        x=[(lower + upper) / 2 for _, lower, upper, _ in visible_ranges],
+        y=[y + offset] * len(visible_ranges),
+        texts=[intensity_labels[key] for key, *_ in visible_ranges],
+        ax=ax,
+        rotation=kwargs.get("rotation", default_rotation),
+    )
+
+
+def draw_intensity_areas(ax: Axes, metric: str, y: np.array, x_min: float, x_max: float) -> Axes:
+    """
+    Draws the intensity areas as a single `PolyCollection` and adds their boundaries to the x-ticks.
+
+    Parameters
+    ----------
+    ax : Axes
+        The axis to draw on.
+    metric : str
+        The name of the metric.
+    y : np.array
+        The y-coordinates spanned by the areas.
+    x_min : float
+        The lower limit of the x-axis.
+    x_max : float
+        The upper limit of the x-axis.
+
+    Returns
+    -------
+    Axes
+        The axis with the areas drawn.
+    """
+    visible_ranges = get_visible_intensity_ranges(metric, x_min, x_max)
+    if not visible_ranges:
+        return ax
+
+    y_min, y_max = np.min(y), np.max(y)
+    areas = PolyCollection(
+        [[(lower, y_min), (upper, y_min), (upper, y_max), (lower, y_max)] for _, lower, upper, _ in visible_ranges],
+        facecolors=[intensity_colors[key] for key, *_ in visible_ranges],
+        edgecolors="face",
+        alpha=0.8,
+        zorder=-1,
+    )
+    ax.add_collection(areas, autolim=True)
+
+    x_ticks = [x_tick for *_, x_tick in visible_ranges]
+    current_xticks = np.array(ax.get_xticks())
+
+    # Keep the current x-ticks outside the intensity areas and add the boundaries of the areas
+    current_xticks = current_xticks[(current_xticks < min(x_ticks)) | (current_xticks > max(x_ticks))]
+    x_ticks = np.unique(np.concat([current_xticks, x_ticks]))
+
+    # Remove the x-ticks that are outside the x-axis limits
+    x_ticks = x_ticks[(x_ticks >= x_min) & (x_ticks <= x_max)]
+    ax.set_xticks(x_ticks)
+
+    return ax
@@ -0,0 +1,337 @@
+from collections.abc import Sequence
+
+import altair as alt
+import polars as pl
+
+from src.effect_intensity import CorrectnessIntensity, EffectIntensity
+from src.forestplot.utils import intensity_colors, intensity_labels
+
+MAX_ROWS = 40
+DRILLDOWN_PARAM = "drilldown"
+
+
+def filter_statistics(
+    statistics: pl.DataFrame,
+    papers: Sequence[str] | None = None,
+    precisions: Sequence[str] | None = None,
+    effects: Sequence[str] | None = None,
+) -> pl.DataFrame:
+    """
+    Filter the consolidated improvement statistics by paper, precision and effect.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The consolidated improvement statistics, see `src.data.papers.utils.read_improvement_statistics`.
+    papers : Sequence[str], optional
+        The IDs of the papers to keep, by default all.
+    precisions : Sequence[str], optional
+        The quantization precisions to keep, by default all.
+    effects : Sequence[str], optional
+        The effects to keep, by default all.
+
+    Returns
+    -------
+    pl.DataFrame
+        The filtered statistics.
+    """
+    predicates = [pl.lit(True)]
+    if papers is not None:
+        predicates.append(pl.col("id").is_in(papers))
+    if precisions is not None:
+        predicates.append(pl.col("precision").is_in(precisions))
+    if effects is not None:
+        predicates.append(pl.col("effect").is_in(effects))
+    return statistics.filter(predicates)
+
+
+def summarize_by_precision(statistics: pl.DataFrame) -> pl.DataFrame:
+    """
+    Collapse the statistics of each effect and precision into a single summary row.
+
+    The mean of the summary is the mean of the collapsed rows weighted by their number of observations. Its interval
+    is the range spanned by all their confidence intervals, not a confidence interval of the mean, since the rows
+    come from different studies and setups. The "interval" column says which kind of interval a row has.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The statistics to summarize.
+
+    Returns
+    -------
+    pl.DataFrame
+        One summary row per effect and precision, with the range of the confidence intervals in "lower" and "upper".
+    """
+    return statistics.group_by("effect", "precision").agg(
+        ((pl.col("mean") * pl.col("nobs")).sum() / pl.col("nobs").sum()).alias("mean"),
+        pl.col("lower_ci").cast(pl.Float64).fill_null(pl.col("mean")).min().alias("lower"),
+        pl.col("upper_ci").cast(pl.Float64).fill_null(pl.col("mean")).max().alias("upper"),
+        pl.lit("range of the 95% CIs").alias("interval"),
+        pl.col("nobs").sum(),
+        pl.len().alias("rows"),
+        pl.col("id").unique().sort().str.join(", ").alias("id"),
+        pl.format("{} ({} rows)", pl.col("precision").first(), pl.len()).alias("label"),
+        pl.lit("summary").alias("level"),
+    )
+
+
+def level_of_detail(statistics: pl.DataFrame, max_rows: int = MAX_ROWS, expanded: Sequence[str] = ()) -> pl.DataFrame:
+    """
+    Select the rows to display for each effect.
+
+    Effects with more than `max_rows` rows are collapsed into one summary row per precision, except for the expanded
+    precisions, whose rows are shown in detail.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The statistics to display.
+    max_rows : int, optional
+        The maximum number of rows shown in detail for an effect, by default MAX_ROWS.
+    expanded : Sequence[str], optional
+        The precisions shown in detail even if the effect is collapsed, by default none.
+
+    Returns
+    -------
+    pl.DataFrame
+        The rows to display, with their label, level ("summary" or "detail") and the bounds of their "interval", a
+        confidence interval for the detail rows and a range for the summary rows, in "lower" and "upper".
+    """
+    detail = statistics.select(
+        "effect",
+        "precision",
+        "mean",
+        pl.col("lower_ci").cast(pl.Float64).fill_null(pl.col("mean")).alias("lower"),
+        pl.col("upper_ci").cast(pl.Float64).fill_null(pl.col("mean")).alias("upper"),
+        pl.lit("95% CI").alias("interval"),
+        "nobs",
+        pl.lit(1, pl.UInt32).alias("rows"),
+        "id",
+        pl.format("{} ({})", pl.col("id"), pl.col("key")).alias("label"),
+        pl.lit("detail").alias("level"),
+    )
+
+    collapse = (pl.len().over("effect") > max_rows) & ~pl.col("precision").is_in(list(expanded))
+    summary = summarize_by_precision(statistics.filter(collapse))
+
+    return pl.concat([detail.filter(~collapse), summary], how="vertical_relaxed").sort(
+        "effect", "precision", "level", "label"
+    )
+
+
+def intensity_areas(effect: str, x_min: float, x_max: float) -> pl.DataFrame:
+    """
+    Returns the intensity ranges of an effect clipped to the given limits.
+
+    Parameters
+    ----------
+    effect : str
+        The name of the effect.
+    x_min : float
+        The lower limit.
+    x_max : float
+        The upper limit.
+
+    Returns
+    -------
+    pl.DataFrame
+        The label, color and clipped bounds of each visible range.
+    """
+    intensities = CorrectnessIntensity() if effect in ["Accuracy", "F1 Score"] else EffectIntensity()
+    return pl.DataFrame(
+        [
+            {
+                "intensity": intensity_labels[key],
+                "color": intensity_colors[key],
+                "start": max(lower, x_min),
+                "end": min(upper, x_max),
+            }
+            for key, (lower, upper) in intensities.get_ranges().items()
+            if lower < x_max and upper > x_min
+        ]
+    )
+
+
+def forest_chart(
+    view: pl.DataFrame, effect: str, width: int = 500, drilldown_param: str = DRILLDOWN_PARAM
+) -> alt.LayerChart:
+    """
+    Build the interactive forest plot of an effect.
+
+    Clicking a summary row selects its precision in the `drilldown_param` parameter, see `ForestPlotExplorer`.
+
+    Parameters
+    ----------
+    view : pl.DataFrame
+        The rows to display, see `level_of_detail`.
+    effect : str
+        The effect to plot.
+    width : int, optional
+        The width of the chart in pixels, by default 500.
+    drilldown_param : str, optional
+        The name of the selection parameter, unique among the concatenated charts, by default DRILLDOWN_PARAM.
+
+    Returns
+    -------
+    alt.LayerChart
+        The forest plot.
+    """
+    data = view.filter(pl.col("effect") == effect)
+    x_min = min(data.get_column("lower").min(), 0) - 1
+    x_max = max(data.get_column("upper").max(), 0) + 1
+    x_scale = alt.Scale(domain=[x_min, x_max], nice=False)
+    y = alt.Y("label:N", title=None, sort=data.get_column("label").to_list())
+    drilldown = alt.selection_point(name=drilldown_param, fields=["precision"], on="click")
+
+    areas = (
+        alt.Chart(intensity_areas(effect, x_min, x_max))
+        .mark_rect(opacity=0.6)
+        .encode(
+            x="start:Q",
+            x2="end:Q",
+            color=alt.Color("color:N", scale=None),
+            tooltip=["intensity:N"],
+        )
+    )
+    reference = alt.Chart(pl.DataFrame({"x": [0]})).mark_rule(color="#333333").encode(x="x:Q")
+
+    base = alt.Chart(data).encode(y=y)
+    # The ranges of the summary rows are dashed, to tell them apart from confidence intervals
+    intervals = base.mark_rule(color="black").encode(
+        x=alt.X("lower:Q", title="Improvement (%)", scale=x_scale),
+        x2="upper:Q",
+        strokeDash=alt.StrokeDash(
+            "level:N", scale=alt.Scale(domain=["detail", "summary"], range=[[1, 0], [4, 2]]), legend=None
+        ),
+    )
+    points = (
+        base.mark_point(filled=True, color="darkslategray", opacity=0.8)
+        .encode(
+            x=alt.X("mean:Q", title="Improvement (%)", scale=x_scale),
+            shape=alt.Shape("level:N", scale=alt.Scale(domain=["detail", "summary"], range=["square", "diamond"])),
+            size=alt.Size("rows:Q", legend=None, scale=alt.Scale(range=[60, 300])),
+            tooltip=["id:N", "precision:N", "mean:Q", "interval:N", "lower:Q", "upper:Q", "nobs:Q", "rows:Q"],
+        )
+        .add_params(drilldown)
+    )
+
+    return alt.layer(areas, reference, intervals, points).properties(title=effect, width=width)
+
+
+class ForestPlotExplorer:
+    """
+    Interactive forest plots of the improvement statistics with level-of-detail.
+
+    Filtering and aggregation are done with polars before building the charts, so only the displayed rows are sent to
+    the browser. In a notebook, clicking a summary row of the widget expands its precision and clicking it again
+    collapses it.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The consolidated improvement statistics, see `src.data.papers.utils.read_improvement_statistics`.
+    max_rows : int, optional
+        The maximum number of rows shown in detail for an effect, by default MAX_ROWS.
+    """
+
+    def __init__(self, statistics: pl.DataFrame, max_rows: int = MAX_ROWS):
+        self.statistics = statistics
+        self.max_rows = max_rows
+        self.papers = None
+        self.precisions = None
+        self.effects = None
+        self.expanded = set()
+        self._widget = None
+
+    def filter(
+        self,
+        papers: Sequence[str] | None = None,
+        precisions: Sequence[str] | None = None,
+        effects: Sequence[str] | None = None,
+    ) -> "ForestPlotExplorer":
+        """
+        Set the papers, precisions and effects to display. None displays all of them.
+
+        Returns
+        -------
+        ForestPlotExplorer
+            The explorer, to allow chaining.
+        """
+        self.papers, self.precisions, self.effects = papers, precisions, effects
+        self._refresh()
+        return self
+
+    def toggle(self, precision: str) -> "ForestPlotExplorer":
+        """
+        Expand a collapsed precision or collapse an expanded one.
+
+        Returns
+        -------
+        ForestPlotExplorer
+            The explorer, to allow chaining.
+        """
+        self.expanded ^= {precision}
+        self._refresh()
+        return self
+
+    def view(self) -> pl.DataFrame:
+        """
+        Returns the rows currently displayed.
+
+        Returns
+        -------
+        pl.DataFrame
+            The displayed rows, see `level_of_detail`.
+        """
+        statistics = filter_statistics(self.statistics, self.papers, self.precisions, self.effects)
+        return level_of_detail(statistics, self.max_rows, sorted(self.expanded))
+
+    def chart(self) -> alt.VConcatChart:
+        """
+        Returns the forest plots of the displayed effects, one below the other.
+
+        Vega-Lite parameter names must be unique in a chart, so the drilldown parameter of each effect is suffixed with
+        its index.
+
+        Returns
+        -------
+        alt.VConcatChart
+            The forest plots.
+        """
+        view = self.view()
+        return alt.vconcat(
+            *[
+                forest_chart(view, effect, drilldown_param=f"{DRILLDOWN_PARAM}_{index}")
+                for index, effect in enumerate(view.get_column("effect").unique(maintain_order=True))
+            ]
+        )
+
+    def widget(self) -> alt.JupyterChart:
+        """
+        Returns a notebook widget that expands and collapses the precisions when their rows are clicked.
+
+        Returns
+        -------
+        alt.JupyterChart
+            The widget.
+        """
+        self._widget = alt.JupyterChart(self.chart())
+        self._observe_drilldowns()
+        return self._widget
+
+    def _observe_drilldowns(self):
+        # The widget replaces its selections whenever its chart changes, so they are observed again after each refresh
+        selections = self._widget.selections
+        selections.observe(
+            self._on_drilldown, [name for name in selections.trait_names() if name.startswith(DRILLDOWN_PARAM)]
+        )
+
+    def _on_drilldown(self, change):
+        for point in change.new.value:
+            self.toggle(point["precision"])
+
+    def _refresh(self):
+        if self._widget is not None:
+            self._widget.chart = self.chart()
+            self._observe_drilldowns()
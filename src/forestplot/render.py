@@ -0,0 +1,288 @@
+import argparse
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import multiprocessing
+import os
+from pathlib import Path
+import re
+
+import matplotlib
+from matplotlib import pyplot as plt
+from matplotlib.axes import Axes
+import numpy as np
+import polars as pl
+
+from src.config import FIGURES_DIR, ROOT_DIR
+from src.data.papers.utils import read_improvement_statistics
+from src.forestplot.cache import FigureCache, figure_key, styling_fingerprint
+from src.forestplot.collection_utils import draw_ci, draw_intensity_areas, draw_intensity_labels
+from src.forestplot.utils import draw_markers, draw_ref_xline, format_xticks, right_flush_yticklabels
+
+
+@dataclass
+class ForestPlotLayout:
+    """
+    Layout of the forest plots rendered by `render_forest_plots`.
+
+    Attributes
+    ----------
+    figures : dict[str, list[str]], optional
+        Name of each figure and the effects drawn in it, one panel per effect. By default, one figure is rendered for
+        each effect in the statistics.
+    formats : list[str]
+        Formats each figure is saved in.
+    width : float
+        Width of the figures in inches.
+    row_height : float
+        Height in inches of each row of a panel.
+    fontsize : int
+        Font size of the y-tick labels.
+    intensity_areas : bool
+        Whether to shade the intensity areas behind the effects.
+    intensity_labels : bool
+        Whether to write the intensity labels above the intensity areas.
+    style : Path, optional
+        Matplotlib style file applied to the figures.
+    """
+
+    figures: dict[str, list[str]] | None = None
+    formats: list[str] = field(default_factory=lambda: ["pdf"])
+    width: float = 10
+    row_height: float = 0.4
+    fontsize: int = 12
+    intensity_areas: bool = True
+    intensity_labels: bool = True
+    style: Path | None = ROOT_DIR / "figures.mplstyle"
+
+    def get_figures(self, statistics: pl.DataFrame) -> dict[str, list[str]]:
+        """
+        Returns the figures to render for the given statistics.
+
+        Parameters
+        ----------
+        statistics : pl.DataFrame
+            The consolidated improvement statistics.
+
+        Returns
+        -------
+        dict[str, list[str]]
+            Name of each figure and the effects drawn in it.
+        """
+        if self.figures is not None:
+            return self.figures
+
+        return {
+            "forestplot-" + re.sub(r"\W+", "-", effect.lower()): [effect]
+            for effect in statistics.get_column("effect").unique(maintain_order=True)
+        }
+
+
+def label_rows(statistics: pl.DataFrame) -> pl.DataFrame:
+    """
+    Add the y-tick label of each row of the statistics and fill the missing confidence intervals with the mean.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The consolidated improvement statistics.
+
+    Returns
+    -------
+    pl.DataFrame
+        The statistics with the "label" column, sorted by study.
+    """
+    label = pl.format("{} ({})", pl.col("id"), pl.col("key")) if "key" in statistics.columns else pl.col("id")
+    return statistics.with_columns(
+        label.alias("label"),
+        pl.col("lower_ci").cast(pl.Float64).fill_null(pl.col("mean")),
+        pl.col("upper_ci").cast(pl.Float64).fill_null(pl.col("mean")),
+    ).sort("id", "label", descending=True)
+
+
+def draw_panel(data: pl.DataFrame, effect: str, ax: Axes, layout: ForestPlotLayout):
+    """
+    Draw the forest plot of a single effect on the given axis.
+
+    Parameters
+    ----------
+    data : pl.DataFrame
+        The labelled statistics of the effect.
+    effect : str
+        The effect to draw.
+    ax : Axes
+        The axis to draw on.
+    layout : ForestPlotLayout
+        The layout of the plot.
+    """
+    y_max = data.height - 0.5
+
+    draw_ci(data, "mean", "label", "lower_ci", "upper_ci", ax)
+    draw_markers(data, "mean", "label", ax)
+    format_xticks(data, "mean", "lower_ci", "upper_ci", ax)
+    x_min, x_max = ax.get_xlim()
+
+    if layout.intensity_areas:
+        draw_intensity_areas(ax, effect, np.array([-0.5, y_max]), x_min, x_max)
+    if layout.intensity_labels:
+        draw_intensity_labels(ax, effect, y_max, x_min, x_max)
+    draw_ref_xline(ax, y_max, None, None)
+
+    ax.set_xlim(x_min, x_max)
+    ax.set_ylim(-0.5, y_max + 1.5)
+    ax.set_yticks(range(data.height))
+    right_flush_yticklabels(data, "label", False, ax, fontsize=layout.fontsize)
+    ax.set_title(effect)
+
+
+def render_figure(
+    statistics: pl.DataFrame, name: str, effects: list[str], layout: ForestPlotLayout, output_dir: Path
+) -> list[Path]:
+    """
+    Render a figure with one forest plot panel per effect and save it in every format of the layout.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The labelled statistics, see `label_rows`.
+    name : str
+        The file name of the figure, without suffix.
+    effects : list[str]
+        The effects to draw.
+    layout : ForestPlotLayout
+        The layout of the figure.
+    output_dir : Path
+        The directory to save the figure in.
+
+    Returns
+    -------
+    list[Path]
+        The paths of the saved figures.
+    """
+    panels = [statistics.filter(pl.col("effect") == effect) for effect in effects]
+    heights = [max(panel.height, 1) + 2 for panel in panels]
+
+    with plt.style.context(layout.style if layout.style is not None and Path(layout.style).exists() else "default"):
+        fig, axes = plt.subplots(
+            len(effects),
+            1,
+            figsize=(layout.width, layout.row_height * sum(heights)),
+            gridspec_kw={"height_ratios": heights},
+            squeeze=False,
+        )
+        for effect, panel, ax in zip(effects, panels, axes[:, 0], strict=True):
+            if panel.is_empty():
+                ax.set_axis_off()
+                continue
+            draw_panel(panel, effect, ax, layout)
+
+        paths = []
+        for figure_format in layout.formats:
+            path = output_dir / f"{name}.{figure_format}"
+            fig.savefig(path, bbox_inches="tight")
+            paths.append(path)
+        plt.close(fig)
+
+    return paths
+
+
+def _init_worker():
+    matplotlib.use("Agg")
+
+
+def render_forest_plots(
+    statistics: pl.DataFrame,
+    layout: ForestPlotLayout | None = None,
+    output_dir: Path = FIGURES_DIR,
+    max_workers: int | None = None,
+    force: bool = False,
+) -> list[Path]:
+    """
+    Render the stale forest plots of the layout in parallel using the Agg backend.
+
+    Each figure is addressed by the hash of its statistics, the layout and styling, the intensity thresholds and the
+    drawing code, see `src.forestplot.cache`. Figures whose address did not change since they were last rendered in
+    `output_dir` are not rendered again.
+
+    Each figure is rendered in its own worker process, so the backend of the calling process (e.g. a notebook) is
+    left untouched.
+
+    Parameters
+    ----------
+    statistics : pl.DataFrame
+        The consolidated improvement statistics, see `src.data.papers.utils.read_improvement_statistics`.
+    layout : ForestPlotLayout, optional
+        The layout of the figures, by default one figure per effect.
+    output_dir : Path, optional
+        The directory to save the figures in, by default FIGURES_DIR.
+    max_workers : int, optional
+        The maximum number of worker processes, by default the number of CPUs.
+    force : bool, optional
+        Whether to render all the figures even if they are fresh, by default False.
+
+    Returns
+    -------
+    list[Path]
+        The paths of the figures, whether they were rendered or reused.
+    """
+    layout = layout or ForestPlotLayout()
+    statistics = label_rows(statistics)
+    figures = layout.get_figures(statistics)
+
+    os.makedirs(output_dir, exist_ok=True)
+    cache = FigureCache(output_dir)
+    fingerprint = styling_fingerprint(layout)
+
+    paths, stale = {}, {}
+    for name, effects in figures.items():
+        data = statistics.filter(pl.col("effect").is_in(effects))
+        key = figure_key(data, effects, fingerprint)
+        expected_paths = [output_dir / f"{name}.{figure_format}" for figure_format in layout.formats]
+        paths[name] = None if force else cache.get(name, key, expected_paths)
+        if paths[name] is None:
+            stale[name] = (data, effects, key)
+
+    if stale:
+        # Forking a process after polars has started its thread pool can deadlock, so the workers are spawned
+        with ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+        ) as executor:
+            futures = {
+                executor.submit(render_figure, data, name, effects, layout, output_dir): name
+                for name, (data, effects, _) in stale.items()
+            }
+            # The figures rendered before a failure are recorded, so they are not rendered again on the next run
+            try:
+                for future in as_completed(futures):
+                    name = futures[future]
+                    paths[name] = future.result()
+                    cache.put(name, stale[name][2], paths[name])
+            finally:
+                cache.save()
+
+    return [path for figure_paths in paths.values() for path in figure_paths]
+
+
+def main(argv: Sequence[str] | None = None):
+    parser = argparse.ArgumentParser(description="Render the forest plots of the processed improvement statistics.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument(
+        "-f", "--format", dest="formats", nargs="+", default=["pdf"], help="Figure formats (default: pdf)."
+    )
+    parser.add_argument(
+        "--all-precisions",
+        action="store_true",
+        help="Use the statistics of every configuration instead of those aggregated by quantization precision.",
+    )
+    parser.add_argument("--force", action="store_true", help="Render all the figures even if they are up to date.")
+    args = parser.parse_args(argv)
+
+    statistics = read_improvement_statistics(by_quantization_precision=not args.all_precisions)
+    for path in render_forest_plots(
+        statistics, ForestPlotLayout(formats=args.formats), max_workers=args.workers, force=args.force
+    ):
+        print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
+from functools import lru_cache
 from typing import Any, List, Optional, Sequence, Tuple, Union
 
 from matplotlib import pyplot as plt
 from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import get_hinting_flag
+from matplotlib.cbook import is_math_text
+from matplotlib.font_manager import FontProperties, findfont, get_font
 import numpy as np
 import polars as pl
 
@@ -185,9 +189,50 @@ def draw_ref_xline(
     return ax
 
 
+@lru_cache(maxsize=4096)
+def _text_width(text: str, font_path: str, fontsize: float, dpi: float) -> float:
+    # Same measurement as `RendererAgg.get_text_width_height_descent` for plain text
+    font = get_font(font_path)
+    font.clear()
+    font.set_size(fontsize, dpi)
+    font.set_text(text, 0.0, flags=get_hinting_flag())
+    return font.get_width_height()[0] / 64
+
+
+def measure_text_widths(texts: Sequence[str], fontfamily: str, fontsize: float, dpi: float) -> np.ndarray:
+    """
+    Measures the width in pixels of plain texts from the font metrics, without drawing or creating a renderer.
+
+    The widths are cached per text, font file, size and dpi, so repeated labels across panels are measured once.
+
+    Parameters
+    ----------
+    texts : Sequence[str]
+        The texts to measure.
+    fontfamily : str
+        The font family of the texts.
+    fontsize : float
+        The font size of the texts in points.
+    dpi : float
+        The resolution of the figure.
+
+    Returns
+    -------
+    np.ndarray
+        The width of each text in pixels.
+    """
+    prop = FontProperties(family=fontfamily, size=fontsize)
+    font_path = findfont(prop)
+    size = prop.get_size_in_points()
+    return np.array([_text_width(str(text), font_path, size, dpi) for text in texts], dtype=float)
+
+
 def right_flush_yticklabels(data: pl.DataFrame, yticklabel: str, flush: bool, ax: Axes, **kwargs: Any) -> float:
     """Flushes the formatted ytickers to the left. Also returns the amount of max padding in the window width.
 
+    The padding is computed from the font metrics of the labels, see `measure_text_widths`. Labels with math text
+    are measured by the renderer of the figure instead.
+
     Parameters
     ----------
     data : pl.DataFrame
@@ -208,7 +253,7 @@ def right_flush_yticklabels(data: pl.DataFrame, yticklabel: str, flush: bool, ax
     fontfamily = kwargs.get("fontfamily", "monospace")
     fontsize = kwargs.get("fontsize", 12)
 
-    fig = plt.gcf()
+    fig = ax.get_figure()
 
     y_tick_label = data.select(yticklabel).to_numpy().flatten()
     if flush:
@@ -218,10 +263,10 @@ def right_flush_yticklabels(data: pl.DataFrame, yticklabel: str, flush: bool, ax
 
     yax = ax.get_yaxis()
 
-    try:
-        pad = max(T.label.get_window_extent(renderer=fig.canvas.get_renderer()).width for T in yax.majorTicks)
-    except AttributeError:
+    if plt.rcParams["text.usetex"] or any(is_math_text(str(label)) for label in y_tick_label):
         pad = max(T.label1.get_window_extent(renderer=fig.canvas.get_renderer()).width for T in yax.majorTicks)
+    else:
+        pad = measure_text_widths(y_tick_label, fontfamily, fontsize, fig.dpi).max(initial=0)
     if flush:
         yax.set_tick_params(pad=pad)
 
@@ -1,37 +1,222 @@
+import argparse
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import os
+from pathlib import Path
+
+import polars as pl
 
 from src.config import PROCESSED_DATA_DIR
 from src.data.papers.entities import Paper, Papers
 from src.data.papers.knowledge_extraction import KnowledgeExtractor
 
+OUTPUT_FORMATS = ("parquet", "ipc", "json")
 
-def extract_knowledge_from(paper: Paper):
-    data = paper.read_data()
 
-    knowledge_extractor = KnowledgeExtractor(
-        data,
-        paper=paper,
-    )
+def find_paper(identifier: str) -> Paper:
+    """
+    Find a paper by its key, its ID or its name in the `Papers` enum. The search is case-insensitive.
 
-    knowledge_extractor.extract_knowledge()
+    Parameters
+    ----------
+    identifier : str
+        The key (e.g. "paulEnergyEfficientRespiratoryAnomaly2022"), ID (e.g. "S1") or name (e.g. "PAUL") of the paper.
 
-    os.makedirs(PROCESSED_DATA_DIR / paper.KEY, exist_ok=True)
+    Returns
+    -------
+    Paper
+        The paper.
 
-    knowledge_extractor.improvement_metrics.write_parquet(
-        PROCESSED_DATA_DIR / paper.KEY / "improvement_metrics.parquet"
-    )
+    Raises
+    ------
+    ValueError
+        If no paper matches the identifier.
+    """
+    for paper in Papers:
+        if identifier.lower() in (paper.name.lower(), paper.value.KEY.lower(), paper.value.ID.lower()):
+            return paper.value
+    raise ValueError(f"Unknown paper: {identifier}")
+
+
+def write_frame(df: pl.DataFrame, path: Path, formats: Sequence[str]):
+    """
+    Write a DataFrame in each of the given formats. The file suffix is set from the format.
+
+    Parameters
+    ----------
+    df : pl.DataFrame
+        The DataFrame to write.
+    path : Path
+        The path of the file without suffix.
+    formats : Sequence[str]
+        The output formats. Any of "parquet", "ipc" and "json".
+    """
+    for output_format in formats:
+        if output_format == "parquet":
+            df.write_parquet(path.with_suffix(".parquet"))
+        elif output_format == "ipc":
+            df.write_ipc(path.with_suffix(".arrow"))
+        elif output_format == "json":
+            df.write_json(path.with_suffix(".json"))
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+
+def read_improvement_metrics(paper: Paper) -> pl.DataFrame:
+    """
+    Read the improvement metrics previously written for a paper.
+
+    Parameters
+    ----------
+    paper : Paper
+        The paper to read the improvement metrics for.
+
+    Returns
+    -------
+    pl.DataFrame
+        The improvement metrics.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the improvement metrics were not written in parquet or IPC format.
+    """
+    path = PROCESSED_DATA_DIR / paper.KEY / "improvement_metrics"
+    if path.with_suffix(".parquet").exists():
+        return pl.read_parquet(path.with_suffix(".parquet"))
+    if path.with_suffix(".arrow").exists():
+        return pl.read_ipc(path.with_suffix(".arrow"))
+    raise FileNotFoundError(f"No improvement metrics found for {paper.KEY}. Run the extraction without --only-stats.")
+
+
+def extract_knowledge_from(paper: Paper, formats: Sequence[str] = ("parquet",), only_stats: bool = False):
+    """
+    Extract the knowledge from a paper and write it to the processed data directory.
+
+    Parameters
+    ----------
+    paper : Paper
+        The paper to extract the knowledge from.
+    formats : Sequence[str], optional
+        The output formats of the improvement metrics and statistics, by default ("parquet",).
+    only_stats : bool, optional
+        Whether to reuse the improvement metrics written by a previous run instead of reading the paper data and
+        joining the baseline, by default False.
+    """
+    output_dir = PROCESSED_DATA_DIR / paper.KEY
+
+    if only_stats:
+        knowledge_extractor = KnowledgeExtractor.from_improvement_metrics(read_improvement_metrics(paper), paper)
+        knowledge_extractor.compute_overall_effect()
+        knowledge_extractor.compute_effects_by_precision()
+    else:
+        knowledge_extractor = KnowledgeExtractor(paper.read_data(), paper=paper)
+        try:
+            knowledge_extractor.extract_knowledge()
+        except pl.exceptions.ComputeError:
+            # Polars does not report the row of a parsing error, so look for the offending values in the input files
+            paper.validate_input()
+            raise
+
+        os.makedirs(output_dir, exist_ok=True)
+        write_frame(knowledge_extractor.improvement_metrics, output_dir / "improvement_metrics", formats)
 
     statistics = knowledge_extractor.get_improvement_statistics()
-    statistics.write_parquet(PROCESSED_DATA_DIR / paper.KEY / "improvement_statistics.parquet")
+    write_frame(statistics, output_dir / "improvement_statistics", formats)
 
     statistics_by_precision = knowledge_extractor.get_improvement_statistics(by_quantization_precision=True)
-    statistics_by_precision.write_parquet(
-        PROCESSED_DATA_DIR / paper.KEY / "improvement_statistics_by_precision.parquet"
+    write_frame(statistics_by_precision, output_dir / "improvement_statistics_by_precision", formats)
+
+    knowledge_extractor.write_json(output_dir / "effects.json")
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Extract the evidence from the selected papers.")
+    parser.add_argument(
+        "papers",
+        nargs="*",
+        help="Papers to process, given by key, ID (e.g. S1) or name (e.g. PAUL). All papers are processed by default.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of papers processed in parallel, each in its own process (default: 1).",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=None,
+        help="Number of threads used by polars in each process (default: polars' own choice).",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        dest="formats",
+        nargs="+",
+        choices=OUTPUT_FORMATS,
+        default=["parquet"],
+        help="Output formats of the improvement metrics and statistics (default: parquet).",
+    )
+    parser.add_argument(
+        "--only-stats",
+        action="store_true",
+        help="Reuse the improvement metrics of a previous run and only recompute the statistics and effects.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the papers and outputs that would be processed without reading or writing any data.",
     )
 
-    knowledge_extractor.write_json(PROCESSED_DATA_DIR / paper.KEY / "effects.json")
+    args = parser.parse_args(argv)
+    try:
+        args.papers = [find_paper(identifier) for identifier in args.papers] or [paper.value for paper in Papers]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.threads is not None and args.threads < 1:
+        parser.error("--threads must be at least 1")
+
+    return args
+
+
+def main(argv: Sequence[str] | None = None):
+    args = parse_args(argv)
+
+    if args.dry_run:
+        mode = "statistics only" if args.only_stats else "full extraction"
+        print(f"Would process {len(args.papers)} papers ({mode}, formats: {', '.join(args.formats)}):")
+        for paper in args.papers:
+            print(f"  {paper.ID} {paper.AUTHOR} -> {PROCESSED_DATA_DIR / paper.KEY}")
+        return
+
+    if args.threads is not None:
+        # Polars sizes its thread pool on first use, and spawned workers inherit the environment
+        os.environ["POLARS_MAX_THREADS"] = str(args.threads)
+
+    if args.workers == 1:
+        for paper in args.papers:
+            print(f"Extracting knowledge from {paper.AUTHOR}")
+            extract_knowledge_from(paper, args.formats, args.only_stats)
+        return
+
+    # Forking a process after polars has started its thread pool can deadlock, so the workers are spawned
+    with ProcessPoolExecutor(
+        max_workers=min(args.workers, len(args.papers)), mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = {
+            executor.submit(extract_knowledge_from, paper, args.formats, args.only_stats): paper
+            for paper in args.papers
+        }
+        for future in as_completed(futures):
+            future.result()
+            print(f"Extracted knowledge from {futures[future].AUTHOR}")
 
 
-for paper in Papers:
-    print(f"Extracting knowledge from {paper.value.AUTHOR}")
-    extract_knowledge_from(paper.value)
+if __name__ == "__main__":
+    main()